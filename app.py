@@ -5,68 +5,245 @@ SDK日誌分析器 - 主應用程式
 提供網頁界面用於上傳和分析Azure Speech SDK日誌文件
 """
 
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 import os
 import json
-import tempfile
+import time
+import uuid
+import hashlib
+import multiprocessing
 from datetime import datetime
-from collections import OrderedDict
-from log_parser import LogParser
+from functools import partial
+from itertools import islice
+from log_parser import (LogParser, StreamingLogParser, FollowingLogParser, PerformanceMetricsAccumulator,
+                        DEFAULT_LOG_PAGE_LINES, MAX_LOG_PAGE_LINES, parser_from_record)
+from line_index import MISSING, IncrementalLineIndexer
+from line_store import (TeeReader, archive_members, compression_for_filename, decompress_stream,
+                        detect_compression, is_supported_log_name, uncompressed_size, zstd_available)
 from config import Config
+from parse_cache import ParseCache, load_secret
+from parser_cache import ParserCache
+from parse_jobs import ParseJobManager
+from single_flight import SingleFlight
+from fleet import analyze_fleet
+from event_store import EventStore, DEFAULT_QUERY_LIMIT, MAX_QUERY_LIMIT
+from search_index import DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS, MAX_SEARCH_CONTEXT
+from series_downsample import DOWNSAMPLE_MODES, DEFAULT_SERIES_POINTS, MAX_SERIES_POINTS, downsample_indices
 
 
-class SimpleLRUCache:
+# 創建 Flask 應用並載入配置
+app = Flask(__name__)
+app.config.from_object(Config)
+
+# 解析結果磁碟緩存（重新啟動或重複上傳相同內容時免重新解析）
+parse_cache = None
+if app.config['PARSE_CACHE_MAX_MB'] > 0:
+    parse_cache = ParseCache(app.config['PARSE_CACHE_FOLDER'], app.config['PARSE_CACHE_MAX_MB'] * 1024 * 1024,
+                             load_secret(app.config['PARSE_CACHE_SECRET'], app.config['PARSE_CACHE_KEY_FILE']))
+
+# 解析器記憶體緩存（依項目數、記憶體預算及閒置時間淘汰，淘汰的解析器溢出到磁碟解析緩存）；
+# 啟用磁碟緩存時另以共用登錄目錄讓多個 worker 程序載入彼此解析過的檔案
+log_cache = ParserCache(maxsize=app.config['CACHE_MAX_SIZE'],
+                        max_bytes=app.config['CACHE_MAX_MB'] * 1024 * 1024,
+                        ttl_seconds=app.config['CACHE_TTL_SECONDS'],
+                        registry=app.config['PARSER_REGISTRY_FOLDER'] if parse_cache is not None else None,
+                        loader=partial(parser_from_record, cache=parse_cache),
+                        secret=parse_cache.secret if parse_cache is not None else None)
+
+# 串流上傳時每次讀取的位元組數
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 檔案ID使用的內容雜湊（SHA-256 十六進位）字元數
+FILE_ID_HEX_LENGTH = 24
+
+# 追蹤模式的 Server-Sent Events 在沒有更新時送出保持連線註解的間隔（秒）
+FOLLOW_HEARTBEAT_SECONDS = 15
+
+# 串流下載時累積到此大小才送出一個區塊（避免逐行送出）
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 背景解析工作池（非同步上傳）
+parse_jobs = ParseJobManager(max_workers=app.config['PARSE_JOB_WORKERS'])
+
+# 並行上傳相同內容時只解析一次（以檔案ID為鍵）
+upload_parses = SingleFlight()
+
+# 持久化事件儲存（未設定路徑時停用）
+event_store = EventStore(app.config['EVENT_STORE_PATH']) if app.config['EVENT_STORE_PATH'] else None
+
+def cache_parser(file_id, filename, parser):
     """
-    簡單的 LRU (Least Recently Used) 緩存
-    自動管理記憶體使用，限制最多緩存的檔案數量
+    把解析完成的解析器放入記憶體緩存，並在背景把已完成的分析結果寫入事件儲存（啟用時）；
+    完整解析器的批次分析尚未完成時，由 /file/<file_id>/sessions/details 完成後再寫入
     """
-    def __init__(self, maxsize=5):
-        self.cache = OrderedDict()
-        self.maxsize = maxsize
-    
-    def get(self, key):
-        """獲取緩存項，並將其移到最後（表示最近使用）"""
-        if key in self.cache:
-            self.cache.move_to_end(key)
-            return self.cache[key]
+    log_cache[file_id] = parser
+    if event_store is not None:
+        event_store.submit(file_id, filename, parser, parser.completed_session_analysis())
+
+def create_parser(filepath, progress=None, member=None, content_digest=None):
+    """
+    建立解析器並完成會話解析；大型檔案（以解壓後大小判斷）改用串流解析，避免整個檔案的索引常駐記憶體
+    member 為 zip 壓縮檔中的日誌成員，content_digest 為已知的檔案內容 SHA-256
+    """
+    if uncompressed_size(filepath, member) > app.config['STREAMING_THRESHOLD_MB'] * 1024 * 1024:
+        parser = StreamingLogParser(filepath, cache=parse_cache, progress=progress, member=member,
+                                    content_digest=content_digest)
+    else:
+        parser = LogParser(filepath, workers=app.config['PARSE_WORKERS'], cache=parse_cache, progress=progress,
+                           member=member, content_digest=content_digest)
+    parser.get_sessions_summary()
+    return parser
+
+def log_sources(filepath, file_id, filename):
+    """
+    上傳檔案中的日誌來源 [(檔案ID, 顯示名稱, zip 成員)]
+    zip 壓縮檔中的每個日誌成員各自成為一個檔案ID（壓縮檔ID!成員路徑，路徑分隔字元改為底線）
+    """
+    if detect_compression(filepath) != 'zip':
+        return [(file_id, filename, None)]
+    return [
+        (f"{file_id}!{member.replace('/', '_')}", f"{filename}/{member}", member)
+        for member in archive_members(filepath)
+    ]
+
+def content_file_id(content_digest):
+    """
+    以內容雜湊作為檔案ID：內容相同的上傳共用同一個ID（不重新解析），
+    同名但內容不同的檔案各有各的ID（不互相覆蓋）
+    """
+    return content_digest[:FILE_ID_HEX_LENGTH]
+
+def incoming_upload_path(filename):
+    """接收中的上傳暫存路徑（內容雜湊確定前使用，並行上傳同名檔案互不干擾）"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], f".incoming-{uuid.uuid4().hex}-{filename}")
+
+def store_upload(temp_path, file_id, filename):
+    """
+    把接收完畢的暫存檔移到以檔案ID命名的位置（保留副檔名），返回儲存路徑；
+    相同內容已儲存時刪除暫存檔，不覆寫可能正被解析器映射的檔案
+    """
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_id + os.path.splitext(filename)[1].lower())
+    if os.path.exists(filepath):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, filepath)
+    return filepath
+
+def receive_upload(stream, filename):
+    """把上傳內容寫入暫存檔並同時計算 SHA-256，返回 (暫存路徑, 內容雜湊)"""
+    temp_path = incoming_upload_path(filename)
+    digest = hashlib.sha256()
+    try:
+        with open(temp_path, 'wb') as sink:
+            reader = TeeReader(stream, sink, digest)
+            while reader.read(UPLOAD_CHUNK_SIZE):
+                pass
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest()
+
+def cached_upload(filepath, file_id, filename):
+    """內容相同的檔案（zip 的所有成員）都已在緩存中時直接返回各檔案ID的會話列表，不重新解析；否則返回 None"""
+    sources = log_sources(filepath, file_id, filename)
+    if not sources:
         return None
-    
-    def set(self, key, value):
-        """設置緩存項，如果超過容量則移除最舊的項"""
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        self.cache[key] = value
-        
-        # 超過限制時，移除最舊的緩存
-        if len(self.cache) > self.maxsize:
-            oldest = next(iter(self.cache))
-            removed_parser = self.cache.pop(oldest)
-            print(f"[緩存管理] 移除舊緩存: {oldest} (當前緩存: {len(self.cache)}/{self.maxsize})")
-    
-    def __contains__(self, key):
-        return key in self.cache
-    
-    def __getitem__(self, key):
-        return self.get(key)
-    
-    def __setitem__(self, key, value):
-        self.set(key, value)
-    
-    def __len__(self):
-        return len(self.cache)
+    parsers = [log_cache.get(source_id) for source_id, source_name, member in sources]
+    if any(parser is None for parser in parsers):
+        return None
+    print(f"[上傳] 內容與已解析的檔案相同，略過解析: {file_id}")
+    return [
+        {'file_id': source_id, 'filename': source_name, 'sessions': parser.get_sessions_summary()}
+        for (source_id, source_name, member), parser in zip(sources, parsers)
+    ]
 
+def parse_upload(filepath, file_id, filename, content_digest=None):
+    """解析已儲存的上傳檔案（zip 逐一解析各成員），返回各檔案ID的會話列表"""
+    files = []
+    for source_id, source_name, member in log_sources(filepath, file_id, filename):
+        parser = create_parser(filepath, member=member, content_digest=content_digest)
+        cache_parser(source_id, source_name, parser)
+        files.append({
+            'file_id': source_id,
+            'filename': source_name,
+            'sessions': parser.get_sessions_summary()
+        })
+    return files
 
-# 創建 Flask 應用並載入配置
-app = Flask(__name__)
-app.config.from_object(Config)
+def upload_response(files):
+    """上傳成功的回應：第一個檔案的會話列表，以及 zip 壓縮檔中所有日誌成員的列表"""
+    if not files:
+        return jsonify({'success': False, 'error': 'No .txt or .log files found in the archive'}), 400
+    return jsonify({
+        'success': True,
+        **files[0],
+        'files': files,
+        'upload_time': datetime.now().isoformat()
+    })
+
+def unsupported_file_response(filename):
+    """檔案類型不支援時的錯誤回應（支援時返回 None）"""
+    if not is_supported_log_name(filename):
+        return jsonify({'success': False, 'error': 'Only .txt, .log, .gz, .zst and .zip file formats are supported'}), 400
+    if compression_for_filename(filename) == 'zstd' and not zstd_available():
+        return jsonify({'success': False, 'error': "zstd support requires the 'zstandard' package"}), 400
+    return None
+
+def streamed_log_download(lines, download_filename, header=''):
+    """
+    以產生器串流日誌下載（不寫入暫存檔，也不組出完整內容）；各行以換行連接，與一次組出的內容相同
+    沒有任何一行時返回 None
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return None
+
+    def generate():
+        chunk = [header, first]
+        size = len(header) + len(first)
+        for line in lines:
+            chunk.append('\n')
+            chunk.append(line)
+            size += len(line) + 1
+            if size >= DOWNLOAD_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
+    return Response(stream_with_context(generate()), mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename="{download_filename}"'})
+
+def sandboxed_path(path, root):
+    """
+    把用戶端指定的伺服器本機路徑解析為實際路徑（展開符號連結及 ..），
+    未設定 root 或路徑不在 root 目錄之下時返回 None
+    """
+    if not root:
+        return None
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(path)
+    try:
+        if os.path.commonpath([root, resolved]) != root:
+            return None
+    except ValueError:
+        # Windows 上位於不同磁碟機
+        return None
+    return resolved
 
-# 使用 LRU 緩存系統
-log_cache = SimpleLRUCache(maxsize=app.config['CACHE_MAX_SIZE'])
+def missing_file_response(file_id):
+    """檔案不在緩存中的錯誤回應（仍在背景解析時返回 409）"""
+    if parse_jobs.active_job_for(file_id):
+        return jsonify({'success': False, 'error': 'File is still being parsed'}), 409
+    return jsonify({'success': False, 'error': 'File not found or expired'}), 404
 
 @app.route('/')
 def index():
     """主頁面"""
-    return render_template('index.html')
+    return render_template('index.html', max_upload_mb=app.config['MAX_UPLOAD_MB'])
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -80,10 +257,10 @@ def upload_file():
             return jsonify({'success': False, 'error': 'File name is empty'}), 400
 
         # 檢查檔案類型
-        allowed_extensions = ['.txt', '.log']
         filename = file.filename
-        if not any(filename.lower().endswith(ext) for ext in allowed_extensions):
-            return jsonify({'success': False, 'error': 'Only .txt and .log file formats are supported'}), 400
+        unsupported = unsupported_file_response(filename)
+        if unsupported is not None:
+            return unsupported
 
         if file:
             # 確保上傳目錄存在並具有正確權限
@@ -97,11 +274,11 @@ def upload_file():
                     'error': f"Unable to create uploads directory: {str(e)}\n\nPlease check directory permissions or run start.bat to initialize the project."
                 }), 500
                 
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            # 嘗試儲存檔案
+            # 儲存檔案的同時計算內容雜湊，以雜湊作為檔案ID
             try:
-                file.save(filepath)
+                temp_path, content_digest = receive_upload(file.stream, filename)
+                file_id = content_file_id(content_digest)
+                filepath = store_upload(temp_path, file_id, filename)
             except PermissionError as e:
                 return jsonify({
                     'success': False,
@@ -113,40 +290,332 @@ def upload_file():
                     'error': f"Error saving file: {str(e)}"
                 }), 500
 
-            # 使用檔案名作為簡單的ID
-            file_id = filename
-
+            # 相同內容已解析過：直接使用緩存中的解析器
             try:
-                parser = LogParser(filepath)
-                log_cache[file_id] = parser
-                sessions = parser.get_sessions_summary()
+                files = cached_upload(filepath, file_id, filename)
+            except Exception as e:
+                return jsonify({'success': False, 'error': f"Error parsing file: {str(e)}"}), 500
+            if files is not None:
+                return upload_response(files)
 
+            # 非同步模式：立即返回工作ID，解析在背景工作池中執行，進度由 /jobs/<id> 查詢
+            # （zip 壓縮檔的每個日誌成員各有一個工作）
+            if request.args.get('async') == '1':
+                def register_parser(job, parser):
+                    cache_parser(job.file_id, job.filename, parser)
+                
+                try:
+                    sources = log_sources(filepath, file_id, filename)
+                    # 相同內容正在背景解析時沿用該工作，不重複解析
+                    jobs = [
+                        parse_jobs.active_job_for(source_id) or
+                        parse_jobs.submit(source_id, source_name, uncompressed_size(filepath, member),
+                                          lambda progress, member=member: create_parser(filepath, progress, member,
+                                                                                        content_digest),
+                                          register_parser)
+                        for source_id, source_name, member in sources
+                    ]
+                except Exception as e:
+                    return jsonify({'success': False, 'error': f"Error parsing file: {str(e)}"}), 500
+                if not jobs:
+                    return jsonify({'success': False, 'error': 'No .txt or .log files found in the archive'}), 400
                 return jsonify({
-                    'success': True, 
-                    'file_id': file_id,
-                    'filename': filename,
-                    'sessions': sessions,
+                    'success': True,
+                    'job_id': jobs[0].job_id,
+                    'file_id': jobs[0].file_id,
+                    'filename': jobs[0].filename,
+                    'files': [
+                        {'file_id': job.file_id, 'filename': job.filename, 'job_id': job.job_id}
+                        for job in jobs
+                    ],
                     'upload_time': datetime.now().isoformat()
-                })
+                }), 202
+
+            try:
+                return upload_response(upload_parses.do(
+                    file_id, lambda: cached_upload(filepath, file_id, filename)
+                    or parse_upload(filepath, file_id, filename, content_digest)))
             except Exception as e:
                 return jsonify({'success': False, 'error': f"Error parsing file: {str(e)}"}), 500
 
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error uploading file: {str(e)}"}), 500
 
+@app.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    """
+    串流上傳：請求本文即為檔案內容（filename 由查詢參數指定）
+    接收的同時寫入磁碟、計算內容雜湊並建立索引，最後一個位元組到達時會話已解析完成；
+    gzip / zstd 壓縮檔邊接收邊解壓（磁碟上只保存壓縮檔）；zip 需要檔尾的目錄，接收完畢後才逐一解析成員；
+    檔案ID在接收完畢後由內容雜湊決定，接收期間的解析進度以 upload_id 查詢參數（預設為檔名）
+    由 /file/<upload_id>/job 查詢；內容與已解析的檔案相同時沿用緩存中的解析器
+    """
+    try:
+        filename = os.path.basename(request.args.get('filename', ''))
+        if filename == '':
+            return jsonify({'success': False, 'error': 'File name is empty'}), 400
+        
+        unsupported = unsupported_file_response(filename)
+        if unsupported is not None:
+            return unsupported
+        
+        try:
+            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        except Exception as e:
+            return jsonify({'success': False, 'error': f"Unable to create uploads directory: {str(e)}"}), 500
+        
+        upload_id = request.args.get('upload_id') or filename
+        if parse_jobs.active_job_for(upload_id):
+            return jsonify({'success': False, 'error': 'An upload with the same ID is still in progress'}), 409
+        
+        # 內容雜湊確定前寫入暫存檔（並行上傳同名檔案互不干擾）
+        temp_path = incoming_upload_path(filename)
+        
+        content_length = request.content_length or 0
+        if content_length > app.config['MAX_CONTENT_LENGTH']:
+            return too_large(None)
+        compression = compression_for_filename(filename)
+        streaming_limit = app.config['STREAMING_THRESHOLD_MB'] * 1024 * 1024
+        streaming = compression is None and content_length > streaming_limit
+        job = parse_jobs.start(upload_id, filename, content_length)
+        digest = hashlib.sha256()
+        
+        def report(bytes_processed, new_sessions):
+            # 進度一律以接收到的（壓縮）位元組數計算
+            job.report(reader.bytes_read, new_sessions)
+        
+        try:
+            with open(temp_path, 'wb') as sink:
+                reader = TeeReader(request.stream, sink, digest)
+                indexer = None
+                if streaming:
+                    # 大型檔案：串流解析器直接讀取上傳本文
+                    parser = StreamingLogParser(temp_path, cache=parse_cache, progress=report)
+                    parser.parse(stream=reader, digest=digest)
+                elif compression != 'zip':
+                    # gzip / zstd 邊接收邊解壓，解壓內容只保存在記憶體
+                    indexer = IncrementalLineIndexer(keep_buffer=compression is not None)
+                    source = decompress_stream(reader, compression)
+                    reported_sessions = 0
+                    while True:
+                        chunk = source.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        indexer.feed(chunk)
+                        new_sessions = list(islice(indexer.index.session_starts.items(), reported_sessions, None))
+                        reported_sessions += len(new_sessions)
+                        report(reader.bytes_read, [LogParser._session_summary(sid, line) for sid, line in new_sessions])
+                        if indexer.position > streaming_limit:
+                            # 解壓後超過串流門檻：放棄記憶體中的索引，接收完畢後改以串流解析器重新解壓
+                            indexer = None
+                            break
+                # zip 需完整接收後才能讀取成員目錄；解壓結束後的剩餘資料也需完整寫入檔案
+                while reader.read(UPLOAD_CHUNK_SIZE):
+                    report(reader.bytes_read, [])
+            
+            content_digest = digest.hexdigest()
+            file_id = content_file_id(content_digest)
+            filepath = store_upload(temp_path, file_id, filename)
+            
+            # 接收期間已完成的解析無法省略，但內容相同的檔案沿用緩存中的解析器（保留已完成的分析結果）
+            files = cached_upload(filepath, file_id, filename)
+            if files is None:
+                if streaming:
+                    # 串流解析器之後重新串流時讀取儲存後的檔案
+                    parser.filepath = filepath
+                    cache_parser(file_id, filename, parser)
+                    files = [{'file_id': file_id, 'filename': filename, 'sessions': parser.get_sessions_summary()}]
+                elif indexer is not None:
+                    parser = LogParser(filepath, cache=parse_cache, prebuilt_index=indexer.finish(),
+                                       content_digest=content_digest,
+                                       prebuilt_buffer=indexer.buffer() if compression is not None else None)
+                    cache_parser(file_id, filename, parser)
+                    files = [{'file_id': file_id, 'filename': filename, 'sessions': parser.get_sessions_summary()}]
+                else:
+                    files = parse_upload(filepath, file_id, filename, content_digest)
+        except PermissionError as e:
+            job.fail(f"Permission denied when saving file: {str(e)}")
+            return jsonify({'success': False, 'error': f"Permission denied when saving file: {str(e)}"}), 500
+        except Exception as e:
+            job.fail(f"Error parsing file: {str(e)}")
+            return jsonify({'success': False, 'error': f"Error parsing file: {str(e)}"}), 500
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        job.file_id = file_id
+        job.bytes_total = reader.bytes_read
+        job.finish(files[0]['sessions'] if files else [])
+        
+        return upload_response(files)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error uploading file: {str(e)}"}), 500
+
+@app.route('/file/<file_id>/job')
+def get_file_job(file_id):
+    """查詢檔案目前的解析工作（串流上傳時用於在上傳期間顯示已找到的會話）"""
+    try:
+        job = parse_jobs.active_job_for(file_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'No active parsing job for this file'}), 404
+        
+        since = request.args.get('since', 0, type=int)
+        return jsonify({
+            'success': True,
+            'job': job.to_dict(since=max(since, 0))
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error retrieving job status: {str(e)}"}), 500
+
+@app.route('/follow', methods=['POST'])
+def start_follow():
+    """
+    追蹤伺服器本機上持續寫入中的日誌檔案（如 SPEECH-LogFilename 指定的路徑）
+    請求本文為 {"path": 日誌路徑}；更新由 /file/<file_id>/follow 以 Server-Sent Events 推送
+    只接受 FOLLOW_ROOT 目錄之下的檔案（未設定時停用）；檔案ID由解析後的完整路徑決定
+    """
+    try:
+        if not app.config['FOLLOW_ROOT']:
+            return jsonify({'success': False,
+                            'error': 'Following local files is disabled (set SDK_LOG_ANALYZER_FOLLOW_ROOT)'}), 403
+        data = request.get_json(silent=True) or {}
+        requested_path = str(data.get('path', '')).strip()
+        if requested_path == '':
+            return jsonify({'success': False, 'error': 'Log file path is empty'}), 400
+        filepath = sandboxed_path(requested_path, app.config['FOLLOW_ROOT'])
+        if filepath is None:
+            return jsonify({'success': False, 'error': 'Log file is outside the allowed directory'}), 403
+        if not filepath.lower().endswith(('.txt', '.log')):
+            return jsonify({'success': False, 'error': 'Only .txt and .log files can be followed'}), 400
+        if not os.path.isfile(filepath):
+            return jsonify({'success': False, 'error': 'Log file not found'}), 404
+        
+        # 不同目錄下的同名檔案各有各的ID（不互相取代）
+        file_id = f"{hashlib.sha256(filepath.encode('utf-8')).hexdigest()[:FILE_ID_HEX_LENGTH]}@live"
+        previous_parser = log_cache.pop(file_id)
+        if previous_parser is not None:
+            previous_parser.close()
+        
+        parser = FollowingLogParser(filepath)
+        log_cache[file_id] = parser
+        
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'filename': filepath,
+            'sessions': parser.get_sessions_summary(),
+            'upload_time': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error following file: {str(e)}"}), 500
+
+@app.route('/fleet', methods=['POST'])
+def fleet_analysis():
+    """
+    彙總分析伺服器本機上的日誌目錄或 zip 壓縮檔（如從多台裝置收集的日誌）
+    請求本文為 {"path": 目錄或壓縮檔路徑, "workers": 子程序數（可省略，不超過 FLEET_WORKERS）}；
+    只接受 FLEET_ROOT 目錄之下的路徑（未設定時停用）。分析在背景工作池中執行，立即返回工作ID，
+    進度（已完成的日誌數）與依區域、語言及 User-Agent 分組的指標分佈由 /jobs/<id> 查詢
+    """
+    try:
+        if not app.config['FLEET_ROOT']:
+            return jsonify({'success': False,
+                            'error': 'Fleet analysis is disabled (set SDK_LOG_ANALYZER_FLEET_ROOT)'}), 403
+        data = request.get_json(silent=True) or {}
+        requested_path = str(data.get('path', '')).strip()
+        if requested_path == '':
+            return jsonify({'success': False, 'error': 'Log directory or archive path is empty'}), 400
+        path = sandboxed_path(requested_path, app.config['FLEET_ROOT'])
+        if path is None:
+            return jsonify({'success': False, 'error': 'Path is outside the allowed directory'}), 403
+        if not os.path.exists(path):
+            return jsonify({'success': False, 'error': 'Log directory or archive not found'}), 404
+        if os.path.isfile(path) and detect_compression(path) != 'zip':
+            return jsonify({'success': False, 'error': 'Path must be a directory or a .zip archive'}), 400
+        try:
+            requested_workers = int(data.get('workers') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'workers must be an integer'}), 400
+        max_workers = app.config['FLEET_WORKERS'] or os.cpu_count() or 1
+        workers = min(requested_workers, max_workers) if requested_workers > 0 else max_workers
+        
+        def run(job):
+            def progress(done, total):
+                # 進度以已完成的日誌數計算
+                job.bytes_total = total
+                job.report(done, [])
+            started = time.perf_counter()
+            # 工作線程所在的程序有多個線程，子程序以 spawn 啟動
+            fleet = analyze_fleet(path, workers=workers, progress=progress,
+                                  mp_context=multiprocessing.get_context('spawn'))
+            return {'path': path, 'elapsed_seconds': round(time.perf_counter() - started, 2), **fleet}
+        
+        # 同一路徑正在分析時沿用該工作
+        fleet_id = f"fleet-{hashlib.sha256(path.encode('utf-8')).hexdigest()[:FILE_ID_HEX_LENGTH]}"
+        job = parse_jobs.active_job_for(fleet_id) or parse_jobs.submit_task(fleet_id, path, 0, run)
+        return jsonify({'success': True, 'job_id': job.job_id, 'path': path, 'workers': workers}), 202
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error analyzing log fleet: {str(e)}"}), 500
+
+@app.route('/file/<file_id>/follow')
+def follow_file_events(file_id):
+    """
+    Server-Sent Events：定期檢查追蹤中的檔案，有新內容時推送 update 事件
+    （新會話摘要、需重新查詢的會話ID）；檔案不再被追蹤（被移出緩存或重新追蹤）時推送 end 事件並結束
+    """
+    parser = log_cache.get(file_id)
+    if parser is None:
+        return missing_file_response(file_id)
+    if not isinstance(parser, FollowingLogParser):
+        return jsonify({'success': False, 'error': 'File is not in follow mode'}), 400
+    
+    interval = app.config['FOLLOW_POLL_INTERVAL']
+    
+    def events():
+        last_sent = time.monotonic()
+        while log_cache.get(file_id, count=False) is parser:
+            try:
+                update = parser.poll()
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                return
+            if update is not None:
+                yield f"event: update\ndata: {json.dumps(update)}\n\n"
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= FOLLOW_HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(interval)
+        yield "event: end\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/session/<file_id>/<session_id>')
 def get_session_details(file_id, session_id):
-    """獲取特定會話的詳細信息"""
+    """獲取特定會話的詳細信息（series=1 時效能指標附加完整的原始數值序列）"""
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
-        parser = log_cache[file_id]
         details = parser.get_session_details(session_id)
         
         if 'error' in details:
             return jsonify({'success': False, 'error': details['error']}), 404
         
+        # 效能指標預設只包含統計摘要，series=1 時附加完整的原始序列
+        if request.args.get('series') == '1':
+            series = parser.get_session_metric_series(session_id)
+            if 'error' in series:
+                return jsonify({'success': False, 'error': series['error']}), 404
+            details = dict(details)
+            details['performance_metrics'] = {**details['performance_metrics'], **series}
+        
         return jsonify({
             'success': True,
             'session_details': details
@@ -155,14 +624,60 @@ def get_session_details(file_id, session_id):
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error retrieving session details: {str(e)}"}), 500
 
+@app.route('/session/<file_id>/<session_id>/series/<metric>')
+def get_session_series(file_id, session_id, metric):
+    """
+    會話指標的降採樣時間序列（供圖表使用）
+    points: 最多返回的點數（預設 1000，上限 5000）；mode: lttb（保留形狀）或 minmax（每桶保留最小與最大值）
+    """
+    try:
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
+        
+        if metric not in PerformanceMetricsAccumulator.SERIES_KEYS:
+            return jsonify({'success': False, 'error': f'Unknown metric: {metric}'}), 404
+        
+        mode = request.args.get('mode', 'lttb')
+        if mode not in DOWNSAMPLE_MODES:
+            return jsonify({'success': False, 'error': f'Unknown downsampling mode: {mode}'}), 400
+        points = min(max(request.args.get('points', DEFAULT_SERIES_POINTS, type=int), 3), MAX_SERIES_POINTS)
+        
+        arrays = parser.get_session_series_arrays(session_id)
+        if 'error' in arrays:
+            return jsonify({'success': False, 'error': arrays['error']}), 404
+        
+        timestamps, values = arrays[metric]
+        # 所有點都有時間戳時以時間為 X 軸降採樣，否則以序號
+        xs = timestamps if MISSING not in timestamps else range(len(values))
+        indices = downsample_indices(xs, values, points, mode)
+        
+        return jsonify({
+            'success': True,
+            'metric': metric,
+            'mode': mode,
+            'total_points': len(values),
+            'points': [
+                {
+                    'index': i,
+                    'timestamp': timestamps[i] if timestamps[i] != MISSING else None,
+                    'value': values[i]
+                }
+                for i in indices
+            ]
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error retrieving metric series: {str(e)}"}), 500
+
 @app.route('/session/<file_id>/<session_id>/threads')
 def get_session_threads(file_id, session_id):
     """獲取特定會話的線程分析"""
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
-        parser = log_cache[file_id]
         thread_analysis = parser.intelligent_thread_analysis(session_id)
         
         if 'error' in thread_analysis:
@@ -176,76 +691,80 @@ def get_session_threads(file_id, session_id):
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error retrieving thread analysis: {str(e)}"}), 500
 
-@app.route('/download/session/<file_id>/<session_id>')
-def download_session_log(file_id, session_id):
-    """下載完整會話日誌"""
+@app.route('/session/<file_id>/<session_id>/log')
+def get_session_log_page(file_id, session_id):
+    """
+    分頁檢視會話日誌（直接從行索引取出該頁，不需下載完整日誌）
+    from_line: 會話日誌中的起始位置（0-based）；limit: 每頁行數（預設 500，上限 5000）；
+    start_ms / end_ms: 只返回時間戳在此範圍內的行
+    """
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
-        parser = log_cache[file_id]
+        from_line = max(request.args.get('from_line', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', DEFAULT_LOG_PAGE_LINES, type=int), 1), MAX_LOG_PAGE_LINES)
+        start_time = request.args.get('start_ms', type=int)
+        end_time = request.args.get('end_ms', type=int)
         
-        # 獲取會話的完整日誌內容
-        session_log_content = parser.get_session_log_content(session_id)
-        
-        if not session_log_content:
+        page = parser.get_session_log_page(session_id, from_line, limit, start_time, end_time)
+        if not page['total_lines']:
             return jsonify({'success': False, 'error': 'Session log content not found'}), 404
         
-        # 創建臨時檔案
-        temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.log', encoding='utf-8')
-        temp_file.write(session_log_content)
-        temp_file.close()
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'limit': limit,
+            **page
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error retrieving session log: {str(e)}"}), 500
+
+@app.route('/download/session/<file_id>/<session_id>')
+def download_session_log(file_id, session_id):
+    """下載完整會話日誌（逐行串流）"""
+    try:
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
         # 設定下載檔名
         download_filename = f"session_{session_id[:8]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=download_filename,
-            mimetype='text/plain'
-        )
+        response = streamed_log_download(parser.iter_session_log(session_id), download_filename)
+        if response is None:
+            return jsonify({'success': False, 'error': 'Session log content not found'}), 404
+        return response
     
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error downloading session log: {str(e)}"}), 500
 
 @app.route('/download/thread/<file_id>/<session_id>/<thread_id>')
 def download_thread_log(file_id, session_id, thread_id):
-    """下載特定線程的日誌"""
+    """下載特定線程的日誌（逐行串流）"""
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
-        
-        parser = log_cache[file_id]
-        
-        # 獲取線程的完整日誌內容
-        thread_log_content = parser.get_thread_log_content(thread_id)
-        
-        if not thread_log_content:
-            return jsonify({'success': False, 'error': f'Thread {thread_id} log content not found'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
         # 獲取線程名稱
         thread_mapping = parser.get_all_session_threads(session_id)
         thread_name = thread_mapping.get(thread_id, f'Thread_{thread_id}')
         
-        # 創建臨時檔案
-        temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.log', encoding='utf-8')
-        temp_file.write(f"# {thread_name} (ID: {thread_id}) 日誌\n")
-        temp_file.write(f"# 會話: {session_id}\n")
-        temp_file.write(f"# 提取時間: {datetime.now().isoformat()}\n\n")
-        temp_file.write(thread_log_content)
-        temp_file.close()
+        header = (f"# {thread_name} (ID: {thread_id}) 日誌\n"
+                  f"# 會話: {session_id}\n"
+                  f"# 提取時間: {datetime.now().isoformat()}\n\n")
         
         # 設定下載檔名
         safe_thread_name = thread_name.replace(' ', '_').replace('/', '_')
         download_filename = f"{safe_thread_name}_{thread_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=download_filename,
-            mimetype='text/plain'
-        )
+        response = streamed_log_download(parser.iter_thread_log(thread_id), download_filename, header)
+        if response is None:
+            return jsonify({'success': False, 'error': f'Thread {thread_id} log content not found'}), 404
+        return response
     
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error downloading thread log: {str(e)}"}), 500
@@ -254,21 +773,21 @@ def download_thread_log(file_id, session_id, thread_id):
 def get_session_thread_list(file_id, session_id):
     """獲取會話的線程列表（用於下載選項）"""
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
-        parser = log_cache[file_id]
         thread_mapping = parser.get_all_session_threads(session_id)
         
         thread_list = []
         for thread_id, thread_name in thread_mapping.items():
-            # 檢查該線程是否有日誌內容
-            thread_content = parser.get_thread_log_content(thread_id)
-            if thread_content:
+            # 檢查該線程是否有日誌內容（直接由線程倒排索引取得行數）
+            line_count = parser.get_thread_line_count(thread_id)
+            if line_count:
                 thread_list.append({
                     'thread_id': thread_id,
                     'thread_name': thread_name,
-                    'line_count': len(thread_content.split('\n'))
+                    'line_count': line_count
                 })
         
         return jsonify({
@@ -279,14 +798,62 @@ def get_session_thread_list(file_id, session_id):
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error retrieving thread list: {str(e)}"}), 500
 
+@app.route('/file/<file_id>/search')
+def search_file(file_id):
+    """
+    全文搜尋日誌
+    q: 查詢字串；regex=1: 以正則表達式比對；case=1: 區分大小寫；
+    thread / session: 限定線程或會話；start_ms / end_ms: 限定時間範圍；
+    offset / limit: 分頁（每頁預設 100 個結果，上限 1000）；context: 每個結果附帶的前後文行數（上限 10）
+    """
+    try:
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
+        
+        query = request.args.get('q', '')
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing search query'}), 400
+        
+        limit = min(max(request.args.get('limit', DEFAULT_SEARCH_RESULTS, type=int), 1), MAX_SEARCH_RESULTS)
+        context = min(max(request.args.get('context', 0, type=int), 0), MAX_SEARCH_CONTEXT)
+        
+        started = time.perf_counter()
+        try:
+            found = parser.search(
+                query,
+                regex=request.args.get('regex') == '1',
+                case_sensitive=request.args.get('case') == '1',
+                thread_id=request.args.get('thread') or None,
+                session_id=request.args.get('session') or None,
+                start_time=request.args.get('start_ms', type=int),
+                end_time=request.args.get('end_ms', type=int),
+                offset=max(request.args.get('offset', 0, type=int), 0),
+                limit=limit,
+                context=context
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'limit': limit,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            **found
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error searching file: {str(e)}"}), 500
+
 @app.route('/file/<file_id>/sessions')
 def get_file_sessions(file_id):
     """重新獲取檔案的會話列表"""
     try:
-        if file_id not in log_cache:
-            return jsonify({'success': False, 'error': 'File not found or expired'}), 404
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
         
-        parser = log_cache[file_id]
         sessions = parser.get_sessions_summary()
         
         return jsonify({
@@ -298,19 +865,123 @@ def get_file_sessions(file_id):
     except Exception as e:
         return jsonify({'success': False, 'error': f"Error reloading session list: {str(e)}"}), 500
 
+@app.route('/file/<file_id>/sessions/details')
+def get_file_session_details(file_id):
+    """一次獲取檔案中所有會話的詳細信息（批次分析）"""
+    try:
+        parser = log_cache.get(file_id)
+        if parser is None:
+            return missing_file_response(file_id)
+        
+        analyzed = parser.completed_session_analysis() is not None
+        all_details = parser.analyze_all_sessions()
+        if event_store is not None and not analyzed and not isinstance(parser, FollowingLogParser):
+            # 批次分析剛完成：以相同結果更新事件儲存中的指標與事件
+            event_store.submit(file_id, None, parser, all_details)
+        
+        return jsonify({
+            'success': True,
+            'file_id': file_id,
+            'session_details': all_details
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error analyzing sessions: {str(e)}"}), 500
+
+@app.route('/jobs/<job_id>')
+def get_job_status(job_id):
+    """查詢背景解析工作的進度（since 參數：只返回第 since 個之後新找到的會話）"""
+    try:
+        job = parse_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+        
+        since = request.args.get('since', 0, type=int)
+        return jsonify({
+            'success': True,
+            'job': job.to_dict(since=max(since, 0))
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error retrieving job status: {str(e)}"}), 500
+
+@app.route('/store/sessions')
+def query_stored_sessions():
+    """
+    查詢事件儲存中的會話（不需原始日誌仍在緩存中）
+    metric + min / max: 指標範圍（如 metric=turn_start_latency&min=2000）；start_ms / end_ms: 會話開始時間戳範圍；
+    region / language / user_agent / file_id / session_id: 等值條件；limit: 筆數（預設 100，上限 5000）
+    """
+    try:
+        if event_store is None:
+            return jsonify({'success': False, 'error': 'Event store is disabled (set SDK_LOG_ANALYZER_EVENT_STORE)'}), 404
+        
+        filters = {
+            column: request.args[column]
+            for column in ('region', 'language', 'user_agent', 'file_id', 'session_id')
+            if request.args.get(column)
+        }
+        limit = min(max(request.args.get('limit', DEFAULT_QUERY_LIMIT, type=int), 1), MAX_QUERY_LIMIT)
+        try:
+            sessions = event_store.query_sessions(
+                metric=request.args.get('metric') or None,
+                min_value=request.args.get('min', type=float),
+                max_value=request.args.get('max', type=float),
+                start_time=request.args.get('start_ms', type=int),
+                end_time=request.args.get('end_ms', type=int),
+                filters=filters,
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({'success': True, 'count': len(sessions), 'sessions': sessions})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error querying event store: {str(e)}"}), 500
+
+@app.route('/store/events')
+def query_stored_events():
+    """
+    查詢事件儲存中的會話事件（時間線關鍵事件與錯誤）
+    file_id / session_id / thread / event_type: 等值條件；start_ms / end_ms: 時間戳範圍；limit: 筆數
+    """
+    try:
+        if event_store is None:
+            return jsonify({'success': False, 'error': 'Event store is disabled (set SDK_LOG_ANALYZER_EVENT_STORE)'}), 404
+        
+        limit = min(max(request.args.get('limit', DEFAULT_QUERY_LIMIT, type=int), 1), MAX_QUERY_LIMIT)
+        events = event_store.query_events(
+            file_id=request.args.get('file_id') or None,
+            session_id=request.args.get('session_id') or None,
+            thread_id=request.args.get('thread') or None,
+            event_type=request.args.get('event_type') or None,
+            start_time=request.args.get('start_ms', type=int),
+            end_time=request.args.get('end_ms', type=int),
+            limit=limit
+        )
+        
+        return jsonify({'success': True, 'count': len(events), 'events': events})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f"Error querying event store: {str(e)}"}), 500
+
 @app.route('/health')
 def health_check():
     """健康檢查端點"""
     return jsonify({
         'status': 'healthy',
         'cached_files': len(log_cache),
+        'cache': log_cache.stats(),
+        'parse_jobs': len(parse_jobs),
+        'event_store': event_store.stats() if event_store is not None else None,
         'timestamp': datetime.now().isoformat()
     })
 
 @app.errorhandler(413)
 def too_large(e):
     """檔案過大錯誤處理"""
-    return jsonify({'success': False, 'error': 'File size exceeds limit (100MB)'}), 413
+    return jsonify({'success': False, 'error': f"File size exceeds limit ({app.config['MAX_UPLOAD_MB']}MB)"}), 413
 
 @app.errorhandler(404)
 def not_found(e):
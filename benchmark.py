@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 效能基準測試
+以 sample_log.txt 為樣板產生合成日誌，量測解析器熱點路徑的耗時
+
+用法:
+    python benchmark.py metrics [--lines 1000000]
+    python benchmark.py parse [--lines 1000000] [--workers 1,2,4,8] [--file 日誌文件]
+    python benchmark.py patterns [--lines 200000] [--file 日誌文件] [--save 結果.json] [--baseline 結果.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from functools import partial
+
+from log_parser import (LogParser, LOG_PATTERNS, LOG_PATTERN_PREFILTERS, RECOGNITION_CONFIG_PATTERNS,
+                        MAIN_THREAD_ACTIVITY_LITERALS, MAIN_THREAD_ACTIVITY_PATTERN, TIMESTAMP_SEARCH_PATTERN,
+                        STREAMING_OBJECT_ADDRESS_PATTERN, search_log_pattern)
+from line_index import (LineIndex, LINE_PREFIX_PATTERN, SESSION_ID_PATTERN, GUID_TOKEN_PATTERN, HEX_ADDRESS_PATTERN,
+                        MARKER_PATTERN, search_session_id)
+from search_index import TOKEN_PATTERN
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_log.txt')
+
+
+def synthetic_session_lines(line_count):
+    """
+    以樣板日誌循環產生指定行數的單一會話 (行號, 行內容) 序列
+    每一輪的時間戳遞增，使時間序列類指標保持單調
+    """
+    with open(SAMPLE_LOG, 'r', encoding='utf-8') as f:
+        template = [line.strip() for line in f if line.strip()]
+
+    lines = []
+    round_num = 0
+    while len(lines) < line_count:
+        offset = round_num * 5000
+        for line in template:
+            if len(lines) >= line_count:
+                break
+            head, sep, rest = line.partition(']: ')
+            timestamp, ms, tail = rest.partition('ms')
+            if sep and ms and timestamp.isdigit():
+                line = f"{head}{sep}{int(timestamp) + offset}{ms}{tail}"
+            lines.append((len(lines) + 1, line))
+        round_num += 1
+    return lines
+
+
+def timed(func, *args, repeat=3):
+    """執行多次並返回最佳耗時（秒）與最後一次結果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_metrics(args):
+    """_analyze_performance_metrics 單次掃描的吞吐量"""
+    parser = LogParser(SAMPLE_LOG)
+    session_lines = synthetic_session_lines(args.lines)
+
+    elapsed, metrics = timed(parser._analyze_performance_metrics, session_lines, repeat=args.repeat)
+    print(f"metrics: {len(session_lines):,} lines in {elapsed:.3f}s "
+          f"({len(session_lines) / elapsed:,.0f} lines/s)")
+    print(f"  websocket_messages={metrics['websocket_messages']:,} "
+          f"audio_chunks={metrics['audio_chunks']:,} "
+          f"latency_points={metrics['series_stats'].get('recognition_latencies', {}).get('count', 0):,}")
+
+
+def index_fields(index):
+    """索引的所有欄位（用於比對平行與單程序解析的結果）"""
+    return {name: getattr(index, name) for name in vars(LineIndex())}
+
+
+def bench_parse(args):
+    """LogParser 建立索引在不同程序數下的耗時，並驗證結果與單程序完全相同"""
+    temp_path = None
+    filepath = args.file
+    if filepath is None:
+        with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False, encoding='utf-8') as f:
+            for line_num, line in synthetic_session_lines(args.lines):
+                f.write(line + '\n')
+            temp_path = filepath = f.name
+
+    try:
+        size_mb = os.path.getsize(filepath) / 1024 / 1024
+        print(f"parse: {filepath} ({size_mb:.1f} MB, cpu_count={os.cpu_count()})")
+        baseline = None
+        baseline_elapsed = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            parser = None
+
+            def build():
+                nonlocal parser
+                if parser is not None:
+                    parser.close()
+                parser = LogParser(filepath, workers=workers)
+
+            elapsed, _ = timed(build, repeat=args.repeat)
+            fields = index_fields(parser.line_index)
+            if baseline is None:
+                baseline, baseline_elapsed = fields, elapsed
+            identical = fields == baseline
+            print(f"  workers={workers:<3} {elapsed:.3f}s  speedup={baseline_elapsed / elapsed:.2f}x  "
+                  f"lines={len(parser.lines):,}  identical={identical}")
+            parser.close()
+            if not identical:
+                return 1
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+    return 0
+
+
+def pattern_registry():
+    """
+    熱點迴圈中使用的所有預先編譯模式：(名稱, 模式, 實際使用的預篩搜索函式或 None)
+    沒有字面預篩的模式（以字面前綴開頭、每行都會執行或候選行已由索引篩選）只量測正則表達式本身
+    """
+    registry = [(f'LOG_PATTERNS.{name}', pattern,
+                 partial(search_log_pattern, name) if name in LOG_PATTERN_PREFILTERS else None)
+                for name, pattern in LOG_PATTERNS.items()]
+    registry += [(f'config.{section}.{key}', pattern,
+                  lambda line, literal=literal, search=pattern.search: (
+                      "name='" in line and literal in line and search(line)))
+                 for section, key, literal, pattern in RECOGNITION_CONFIG_PATTERNS]
+    registry += [
+        ('SESSION_ID_PATTERN', SESSION_ID_PATTERN, search_session_id),
+        ('MAIN_THREAD_ACTIVITY_PATTERN', MAIN_THREAD_ACTIVITY_PATTERN,
+         lambda line: (any(literal in line.lower() for literal in MAIN_THREAD_ACTIVITY_LITERALS)
+                       and MAIN_THREAD_ACTIVITY_PATTERN.search(line))),
+        ('LINE_PREFIX_PATTERN', LINE_PREFIX_PATTERN, None),
+        ('GUID_TOKEN_PATTERN', GUID_TOKEN_PATTERN, None),
+        ('HEX_ADDRESS_PATTERN', HEX_ADDRESS_PATTERN, None),
+        ('MARKER_PATTERN', MARKER_PATTERN, None),
+        ('TIMESTAMP_SEARCH_PATTERN', TIMESTAMP_SEARCH_PATTERN, None),
+        ('STREAMING_OBJECT_ADDRESS_PATTERN', STREAMING_OBJECT_ADDRESS_PATTERN, None),
+        ('TOKEN_PATTERN', TOKEN_PATTERN, None),
+    ]
+    return registry
+
+
+def bench_pattern(pattern, filtered_search, lines, repeat):
+    """
+    單一模式在所有行上的成本：(正則表達式 µs/行, 預篩搜索 µs/行, 匹配行數, 預篩搜索與正則表達式結果不同的行數)
+    """
+    search = pattern.search
+
+    def scan_raw():
+        return sum(1 for line in lines if search(line))
+
+    def scan_filtered():
+        return sum(1 for line in lines if filtered_search(line))
+
+    raw_elapsed, matches = timed(scan_raw, repeat=repeat)
+    if filtered_search is None:
+        return raw_elapsed / len(lines) * 1e6, None, matches, 0
+    filtered_elapsed, _ = timed(scan_filtered, repeat=repeat)
+    mismatched = sum(1 for line in lines if bool(search(line)) != bool(filtered_search(line)))
+    return raw_elapsed / len(lines) * 1e6, filtered_elapsed / len(lines) * 1e6, matches, mismatched
+
+
+def bench_patterns(args):
+    """
+    各預先編譯模式的逐行成本（含與不含字面預篩），並驗證預篩搜索與正則表達式的結果相同
+    --save 保存結果供之後比較，--baseline 與先前的結果比較，預篩後成本增加超過 --tolerance 時視為退化
+    """
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8', errors='replace') as f:
+            lines = [line.strip() for line in f if line.strip()]
+    else:
+        lines = [line for line_num, line in synthetic_session_lines(args.lines)]
+    print(f"patterns: {len(lines):,} lines")
+    print(f"  {'pattern':<48} {'regex µs':>9} {'filtered µs':>12} {'matches':>9}")
+
+    results = {}
+    failed = False
+    for name, pattern, filtered_search in pattern_registry():
+        raw_us, filtered_us, matches, mismatched = bench_pattern(pattern, filtered_search, lines, args.repeat)
+        results[name] = {'regex_us': raw_us, 'filtered_us': filtered_us, 'matches': matches}
+        filtered = f"{filtered_us:12.3f}" if filtered_us is not None else f"{'-':>12}"
+        print(f"  {name:<48} {raw_us:9.3f} {filtered} {matches:9,}")
+        if mismatched:
+            print(f"    prefilter changed the result of {mismatched:,} lines")
+            failed = True
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            key = 'filtered_us' if result['filtered_us'] is not None else 'regex_us'
+            if previous.get(key) and result[key] > previous[key] * (1 + args.tolerance):
+                print(f"  regression: {name} {previous[key]:.3f} -> {result[key]:.3f} µs/line")
+                failed = True
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+def main():
+    """Main function: parse arguments and run the selected benchmark"""
+    parser = argparse.ArgumentParser(description='SDK Log Analyzer benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    metrics_parser = subparsers.add_parser('metrics', help='performance metric extraction on one synthetic session')
+    metrics_parser.add_argument('--lines', type=int, default=1_000_000)
+    metrics_parser.add_argument('--repeat', type=int, default=3)
+    metrics_parser.set_defaults(func=bench_metrics)
+
+    parse_parser = subparsers.add_parser('parse', help='index build time across worker counts')
+    parse_parser.add_argument('--lines', type=int, default=1_000_000)
+    parse_parser.add_argument('--workers', default='1,2,4,8', help='comma-separated worker counts')
+    parse_parser.add_argument('--file', help='benchmark an existing log file instead of a synthetic one')
+    parse_parser.add_argument('--repeat', type=int, default=1)
+    parse_parser.set_defaults(func=bench_parse)
+
+    patterns_parser = subparsers.add_parser('patterns', help='per-line cost of each precompiled pattern and prefilter')
+    patterns_parser.add_argument('--lines', type=int, default=200_000)
+    patterns_parser.add_argument('--file', help='benchmark the lines of an existing log file instead of a synthetic one')
+    patterns_parser.add_argument('--repeat', type=int, default=3)
+    patterns_parser.add_argument('--save', help='write per-pattern results to a JSON file')
+    patterns_parser.add_argument('--baseline', help='compare against results saved with --save')
+    patterns_parser.add_argument('--tolerance', type=float, default=0.25,
+                                 help='allowed relative slowdown before a pattern counts as a regression')
+    patterns_parser.set_defaults(func=bench_patterns)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
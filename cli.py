@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 命令列批次分析（不需啟動網頁服務）
+對每個日誌的所有會話執行完整的詳細分析與線程分析，以 NDJSON（每行一個 JSON 記錄）輸出到標準輸出
+（每個日誌分析完成後立即輸出並 flush，多個子程序時依完成順序輸出），
+可依指標門檻設定結束碼，供 CI 或排程工作使用；不匯入 Flask，啟動快速
+
+用法:
+    python cli.py 日誌檔案或目錄或zip [...] [--jobs 4] [--fail-if "first_hypothesis_latency>2000"]
+
+結束碼:
+    0  全部成功且未超過門檻
+    1  有會話的指標符合 --fail-if 條件
+    2  參數錯誤（包含 --fail-if 中未知的指標）
+    3  有日誌無法解析（同時超過門檻時仍為 1）
+    141  輸出管道被讀取端提前關閉（如 | head），與 shell 中被 SIGPIPE 終止的慣例一致
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from fleet import collect_sources
+from log_parser import LogParser, PerformanceMetricsAccumulator
+from parse_cache import ParseCache, load_secret
+
+# 結束碼
+EXIT_OK = 0
+EXIT_THRESHOLD = 1
+EXIT_USAGE = 2
+EXIT_PARSE_ERROR = 3
+EXIT_BROKEN_PIPE = 141
+
+# 門檻條件：指標路徑（performance_metrics 中以 . 分隔的鍵）、比較運算子、數值
+THRESHOLD_PATTERN = re.compile(r'^\s*([\w.]+)\s*(<=|>=|==|<|>)\s*(-?\d+(?:\.\d+)?)\s*$')
+THRESHOLD_OPERATORS = {
+    '<': lambda value, limit: value < limit,
+    '<=': lambda value, limit: value <= limit,
+    '>': lambda value, limit: value > limit,
+    '>=': lambda value, limit: value >= limit,
+    '==': lambda value, limit: value == limit
+}
+
+# 解析緩存目錄的預設大小上限（MB）
+DEFAULT_CACHE_MB = 512
+
+
+def parse_threshold(expression: str) -> Tuple[str, str, float]:
+    """解析門檻條件，如 "first_hypothesis_latency>2000" 或 "series_stats.recognition_latencies.p95>=3000" """
+    match = THRESHOLD_PATTERN.match(expression)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid threshold '{expression}' (expected e.g. metric>1000)")
+    return match.group(1), match.group(2), float(match.group(3))
+
+
+def metric_value(metrics: Dict[str, Any], path: str) -> Optional[float]:
+    """依 . 分隔的路徑取出效能指標數值，不存在或不是數值時返回 None"""
+    value = metrics
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def threshold_violations(metrics: Dict[str, Any], thresholds: List[Tuple[str, str, float]]) -> List[Dict[str, Any]]:
+    """會話符合的門檻條件"""
+    violations = []
+    for path, operator, limit in thresholds:
+        value = metric_value(metrics, path)
+        if value is not None and THRESHOLD_OPERATORS[operator](value, limit):
+            violations.append({'metric': path, 'condition': f"{operator}{limit:g}", 'value': value})
+    return violations
+
+
+def analyze_log(filepath: str, member: Optional[str], name: str,
+                thresholds: List[Tuple[str, str, float]], cache: Optional[ParseCache] = None) -> List[Dict[str, Any]]:
+    """
+    分析單一日誌來源的所有會話（可在子程序中執行），返回輸出記錄
+    解析失敗時返回一個 error 記錄
+    """
+    try:
+        parser = LogParser(filepath, cache=cache, member=member)
+    except Exception as e:
+        return [{'type': 'error', 'source': name, 'error': str(e)}]
+
+    try:
+        records = []
+        for session_id, details in parser.analyze_all_sessions().items():
+            if 'error' in details:
+                records.append({'type': 'error', 'source': name, 'session_id': session_id, 'error': details['error']})
+                continue
+            records.append({
+                'type': 'session',
+                'source': name,
+                'session_id': session_id,
+                'details': details,
+                'thread_analysis': parser.intelligent_thread_analysis(session_id),
+                'violations': threshold_violations(details.get('performance_metrics', {}), thresholds)
+            })
+        return records
+    except Exception as e:
+        return [{'type': 'error', 'source': name, 'error': str(e)}]
+    finally:
+        parser.close()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='SDK Log Analyzer batch CLI: full session analysis as NDJSON on stdout')
+    parser.add_argument('paths', nargs='+', help='log files, directories (searched recursively) or .zip archives')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='number of worker processes (one log per worker)')
+    parser.add_argument('--fail-if', action='append', default=[], type=parse_threshold, metavar='METRIC<OP>VALUE',
+                        help='exit with status 1 if any session matches, e.g. "websocket_connection_time>500" '
+                             '(repeatable; nested metrics use dots, e.g. series_stats.queue_times.p95)')
+    parser.add_argument('--pretty', action='store_true', help='indent each record (output is no longer NDJSON)')
+    parser.add_argument('--cache-dir', help='reuse parse results across runs through an on-disk cache')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB, help='on-disk cache size limit in MB')
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """解析參數、分析所有日誌並輸出記錄，返回結束碼"""
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    if args.jobs < 1:
+        arg_parser.error('--jobs must be at least 1')
+    known_metrics = set(PerformanceMetricsAccumulator.metric_paths())
+    for path, operator, limit in args.fail_if:
+        if path not in known_metrics:
+            arg_parser.error(f"unknown metric '{path}' in --fail-if")
+
+    sources = []
+    for path in args.paths:
+        try:
+            sources.extend(collect_sources(path))
+        except Exception as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    cache = None
+    if args.cache_dir:
+        cache = ParseCache(args.cache_dir, args.cache_mb * 1024 * 1024,
+                           load_secret(Config.PARSE_CACHE_SECRET, Config.PARSE_CACHE_KEY_FILE))
+    tasks = [(filepath, member, name, args.fail_if, cache) for filepath, member, name in sources]
+
+    def emit(record):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str, indent=2 if args.pretty else None) + '\n')
+
+    sessions = 0
+    failed = 0
+    violating_sessions = 0
+    # 每個日誌完成後立即輸出其所有記錄並 flush 一次（多個子程序時依完成順序，不等待前面較慢的日誌）
+    futures = []
+    if args.jobs > 1 and len(tasks) > 1:
+        executor = ProcessPoolExecutor(max_workers=min(args.jobs, len(tasks)))
+        futures = [executor.submit(analyze_log, *task) for task in tasks]
+        results = (future.result() for future in as_completed(futures))
+    else:
+        executor = None
+        results = (analyze_log(*task) for task in tasks)
+    try:
+        for records in results:
+            for record in records:
+                if record['type'] == 'session':
+                    sessions += 1
+                    violating_sessions += bool(record['violations'])
+                elif 'session_id' not in record:
+                    failed += 1
+                emit(record)
+            sys.stdout.flush()
+        emit({
+            'type': 'summary',
+            'sources': len(sources),
+            'sessions': sessions,
+            'failed_sources': failed,
+            'violating_sessions': violating_sessions
+        })
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # 讀取端已關閉（如 | head）：把標準輸出導向 devnull，避免直譯器結束時 flush 再次失敗，安靜結束
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_BROKEN_PIPE
+    finally:
+        if executor is not None:
+            # 提前中止（如輸出管道關閉）時取消尚未開始的日誌
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+
+    if violating_sessions:
+        return EXIT_THRESHOLD
+    if failed:
+        return EXIT_PARSE_ERROR
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
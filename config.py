@@ -4,6 +4,8 @@ SDK日誌分析器 - 配置檔案
 統一管理所有設定參數
 """
 
+import os
+
 class Config:
     """應用程式配置類別"""
     
@@ -22,14 +24,56 @@ class Config:
     # ============================================
     # 檔案處理設定
     # ============================================
-    MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB 最大檔案大小
+    # 最大上傳大小（MB），可用環境變數 SDK_LOG_ANALYZER_MAX_UPLOAD_MB 調整
+    MAX_UPLOAD_MB = int(os.environ.get('SDK_LOG_ANALYZER_MAX_UPLOAD_MB', 100))
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_MB * 1024 * 1024
+    # 超過此大小（MB）的檔案改用串流解析（記憶體用量與檔案大小無關），
+    # 可用環境變數 SDK_LOG_ANALYZER_STREAMING_THRESHOLD_MB 調整
+    STREAMING_THRESHOLD_MB = int(os.environ.get('SDK_LOG_ANALYZER_STREAMING_THRESHOLD_MB', 100))
+    # 平行解析的子程序數（1 為單程序），可用環境變數 SDK_LOG_ANALYZER_PARSE_WORKERS 調整；
+    # 小於數 MB 的檔案一律單程序解析
+    PARSE_WORKERS = int(os.environ.get('SDK_LOG_ANALYZER_PARSE_WORKERS', 1))
+    # 背景解析工作池的線程數（非同步上傳），可用環境變數 SDK_LOG_ANALYZER_PARSE_JOB_WORKERS 調整
+    PARSE_JOB_WORKERS = int(os.environ.get('SDK_LOG_ANALYZER_PARSE_JOB_WORKERS', 2))
+    # 多檔案彙總分析的子程序數（0 為 CPU 數），可用環境變數 SDK_LOG_ANALYZER_FLEET_WORKERS 調整
+    FLEET_WORKERS = int(os.environ.get('SDK_LOG_ANALYZER_FLEET_WORKERS', 0))
+    # /fleet 可讀取的伺服器本機目錄（日誌目錄或壓縮檔必須位於此目錄之下），可用環境變數 SDK_LOG_ANALYZER_FLEET_ROOT 設定；
+    # 空字串（預設）停用 /fleet（命令列的 fleet.py 不受影響）
+    FLEET_ROOT = os.environ.get('SDK_LOG_ANALYZER_FLEET_ROOT', '')
+    # 追蹤模式（持續寫入中的日誌檔案）檢查新內容的間隔秒數，可用環境變數 SDK_LOG_ANALYZER_FOLLOW_INTERVAL 調整
+    FOLLOW_POLL_INTERVAL = float(os.environ.get('SDK_LOG_ANALYZER_FOLLOW_INTERVAL', 1.0))
+    # 追蹤模式可讀取的伺服器本機目錄（日誌檔案必須位於此目錄之下），可用環境變數 SDK_LOG_ANALYZER_FOLLOW_ROOT 設定；
+    # 空字串（預設）停用追蹤模式，避免用戶端讀取伺服器上的任意檔案
+    FOLLOW_ROOT = os.environ.get('SDK_LOG_ANALYZER_FOLLOW_ROOT', '')
     UPLOAD_FOLDER = 'uploads'                # 上傳檔案存放目錄
-    ALLOWED_EXTENSIONS = {'.txt', '.log'}    # 允許的檔案副檔名
+    ALLOWED_EXTENSIONS = {'.txt', '.log', '.gz', '.zst', '.zip'}  # 允許的檔案副檔名（.zst 需安裝 zstandard）
     
     # ============================================
     # 緩存設定（記憶體管理）
     # ============================================
     CACHE_MAX_SIZE = 5  # 最多同時緩存 5 個檔案，平衡記憶體與效能
+    # 已解析檔案的記憶體預算（MB，依行偏移、索引及分析結果的近似大小計算，映射的檔案內容不計入，0 為不限制），
+    # 可用環境變數 SDK_LOG_ANALYZER_CACHE_MB 調整；超過時最久未使用的檔案溢出到磁碟解析緩存
+    CACHE_MAX_MB = int(os.environ.get('SDK_LOG_ANALYZER_CACHE_MB', 1024))
+    # 已解析檔案閒置多少秒後移出記憶體（0 為不過期），可用環境變數 SDK_LOG_ANALYZER_CACHE_TTL 調整
+    CACHE_TTL_SECONDS = int(os.environ.get('SDK_LOG_ANALYZER_CACHE_TTL', 0))
+    
+    # 解析結果磁碟緩存（以檔案內容雜湊 + 解析器版本為鍵），目錄總大小上限（MB）
+    # 可用環境變數 SDK_LOG_ANALYZER_PARSE_CACHE_MB 調整，設為 0 停用
+    PARSE_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, '.cache')
+    PARSE_CACHE_MAX_MB = int(os.environ.get('SDK_LOG_ANALYZER_PARSE_CACHE_MB', 512))
+    # 已解析檔案的共用登錄目錄（檔案ID → 從磁碟緩存重新載入的方式），
+    # 讓多個 worker 程序（如 gunicorn -w 4 app:app）都能提供同一份解析結果；停用磁碟緩存時一併停用
+    PARSER_REGISTRY_FOLDER = os.path.join(PARSE_CACHE_FOLDER, 'parsers')
+    # 驗證磁碟緩存及共用登錄記錄的金鑰（同一部署的所有 worker 程序需相同），可用環境變數 SDK_LOG_ANALYZER_CACHE_SECRET 設定；
+    # 未設定時使用 PARSE_CACHE_KEY_FILE 中的金鑰（不存在時自動產生），金鑰檔放在緩存目錄之外
+    PARSE_CACHE_SECRET = os.environ.get('SDK_LOG_ANALYZER_CACHE_SECRET', '')
+    PARSE_CACHE_KEY_FILE = os.environ.get('SDK_LOG_ANALYZER_CACHE_KEY_FILE',
+                                          os.path.join(os.path.expanduser('~'), '.sdk_log_analyzer', 'cache.key'))
+    
+    # 持久化事件儲存（SQLite）的資料庫路徑，解析過的會話指標與事件可跨檔案查詢；
+    # 可用環境變數 SDK_LOG_ANALYZER_EVENT_STORE 設定，空字串（預設）停用
+    EVENT_STORE_PATH = os.environ.get('SDK_LOG_ANALYZER_EVENT_STORE', '')
     
     # ============================================
     # GitHub 資訊（版本檢查用）
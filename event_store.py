@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 持久化事件儲存（SQLite）
+解析完成的檔案把各會話的識別配置、關鍵指標及時間線事件寫入本機 SQLite 資料庫，
+解析器被記憶體緩存淘汰後仍可跨檔案查詢（如「turn_start_latency 超過 2 秒的會話」），
+不必重新上傳或讀取原始日誌；只記錄解析器已完成的分析結果（不為了寫入而另外分析），
+寫入在背景線程中以 executemany 批次執行，資料庫使用 WAL 模式讓查詢與寫入並行
+"""
+
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from fleet import FLEET_DIMENSIONS, FLEET_METRICS
+from line_index import LINE_PREFIX_PATTERN
+from log_parser import StreamingLogParser
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS files (
+        file_id TEXT PRIMARY KEY,
+        filename TEXT,
+        stored_at REAL,
+        session_count INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS sessions (
+        file_id TEXT,
+        session_id TEXT,
+        start_line INTEGER,
+        start_time INTEGER,
+        end_time INTEGER,
+        region TEXT,
+        language TEXT,
+        user_agent TEXT,
+        websocket_connection_time REAL,
+        turn_start_latency REAL,
+        first_hypothesis_latency REAL,
+        max_unacknowledged_audio REAL,
+        error_count INTEGER,
+        stored_at REAL,
+        PRIMARY KEY (file_id, session_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS events (
+        file_id TEXT,
+        session_id TEXT,
+        line_number INTEGER,
+        thread_id TEXT,
+        timestamp INTEGER,
+        event_type TEXT,
+        description TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions (session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_stored_at ON sessions (stored_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions (start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_file_id ON events (file_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_session_id ON events (session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_thread_id ON events (thread_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_events_event_type ON events (event_type)"
+]
+
+SESSION_COLUMNS = ('file_id', 'session_id', 'start_line', 'start_time', 'end_time') + tuple(FLEET_DIMENSIONS) \
+    + FLEET_METRICS + ('error_count', 'stored_at')
+EVENT_COLUMNS = ('file_id', 'session_id', 'line_number', 'thread_id', 'timestamp', 'event_type', 'description')
+
+# 可作為查詢條件的會話欄位（欄位名稱直接組入 SQL，只接受此白名單）
+SESSION_METRIC_FILTERS = FLEET_METRICS
+SESSION_VALUE_FILTERS = tuple(FLEET_DIMENSIONS) + ('file_id', 'session_id')
+
+# 查詢結果的預設及最大筆數
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 5000
+
+
+def _event_rows(file_id: str, session_id: str, details: Dict[str, Any]) -> List[tuple]:
+    """
+    會話時間線的關鍵事件及錯誤行（線程ID與時間戳取自行首）
+    line_number 與會話詳情相同，為該行在會話日誌中的位置
+    """
+    rows = []
+    entries = [(event['line_number'], event['event_type'], event['description'])
+               for event in details.get('timeline', [])]
+    entries += [(error['line_number'], 'error', error['message']) for error in details.get('error_analysis', [])]
+    for line_number, event_type, description in entries:
+        prefix = LINE_PREFIX_PATTERN.match(description.lstrip())
+        thread_id = prefix.group(1) if prefix else None
+        timestamp = int(prefix.group(2)) if prefix and prefix.group(2) else None
+        rows.append((file_id, session_id, line_number, thread_id, timestamp, event_type, description))
+    return rows
+
+
+# 事件儲存的資料表
+TABLES = ('files', 'sessions', 'events')
+
+
+class EventStore:
+    """SQLite 事件儲存（單一連線以鎖保護；寫入由單一背景線程依序執行；各資料表筆數保存在記憶體中）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+            self._counts = {
+                table: self._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES
+            }
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-store')
+
+    def submit(self, file_id: str, filename: Optional[str], parser, analysis: Dict[str, Dict[str, Any]] = None):
+        """在背景線程中記錄解析器的會話（不阻塞上傳請求）"""
+        self._writer.submit(self._record_logged, file_id, filename, parser, analysis)
+
+    def _record_logged(self, file_id: str, filename: Optional[str], parser, analysis: Dict[str, Dict[str, Any]]):
+        try:
+            self.record(file_id, filename, parser, analysis)
+        except Exception as e:
+            print(f"[事件儲存] 無法記錄 {file_id}: {str(e)}")
+
+    def record(self, file_id: str, filename: Optional[str], parser, analysis: Dict[str, Dict[str, Any]] = None):
+        """
+        記錄解析器中所有會話的配置、指標及事件（同一檔案ID的舊資料會被取代，filename 為 None 時沿用已記錄的檔名）
+        analysis 為已完成的分析結果（會話ID → 詳細信息或串流摘要）；完整解析器使用批次詳細分析，
+        串流解析器只有累計摘要，沒有時間線事件；沒有分析結果時只記錄各會話的起始行與時間範圍，
+        識別配置、指標及事件待批次分析完成後再記錄
+        """
+        stored_at = time.time()
+        session_rows = []
+        event_rows = []
+        if analysis is None:
+            streaming = isinstance(parser, StreamingLogParser)
+            analysis = {summary['session_id']: summary if streaming else {} for summary in parser.get_sessions_summary()}
+        for session_id, details in analysis.items():
+            if 'error' in details:
+                continue
+            config = details.get('recognition_config', {})
+            metrics = details.get('performance_metrics', {})
+            if isinstance(parser, StreamingLogParser):
+                # 串流解析器的會話摘要
+                start_line, start_time, end_time = details['start_line'], details['start_time'], details['end_time']
+                error_count = details.get('error_count', 0)
+            else:
+                start_line = parser.line_index.session_starts.get(session_id, -1) + 1
+                start_time, end_time = parser._get_session_time_range(session_id)
+                error_count = len(details['error_analysis']) if 'error_analysis' in details else None
+                event_rows.extend(_event_rows(file_id, session_id, details))
+            session_rows.append(
+                (file_id, session_id, start_line, start_time, end_time)
+                + tuple(get_value(config) for get_value in FLEET_DIMENSIONS.values())
+                + tuple(metrics.get(name) for name in FLEET_METRICS)
+                + (error_count, stored_at)
+            )
+
+        with self._lock, self._connection:
+            connection = self._connection
+            if filename is None:
+                row = connection.execute("SELECT filename FROM files WHERE file_id = ?", (file_id,)).fetchone()
+                filename = row[0] if row is not None else None
+            deleted = {
+                table: connection.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,)).rowcount
+                for table in TABLES
+            }
+            connection.execute("INSERT INTO files (file_id, filename, stored_at, session_count) VALUES (?, ?, ?, ?)",
+                               (file_id, filename, stored_at, len(session_rows)))
+            connection.executemany(
+                f"INSERT INTO sessions ({', '.join(SESSION_COLUMNS)}) VALUES ({', '.join('?' * len(SESSION_COLUMNS))})",
+                session_rows)
+            connection.executemany(
+                f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})",
+                event_rows)
+            for table, inserted in (('files', 1), ('sessions', len(session_rows)), ('events', len(event_rows))):
+                self._counts[table] += inserted - deleted[table]
+        print(f"[事件儲存] 已記錄 {file_id}: {len(session_rows)} 個會話, {len(event_rows)} 個事件")
+
+    def _query(self, sql: str, params: list) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(sql, params)]
+
+    def query_sessions(self, metric: str = None, min_value: float = None, max_value: float = None,
+                       start_time: int = None, end_time: int = None, filters: Dict[str, str] = None,
+                       limit: int = DEFAULT_QUERY_LIMIT) -> List[Dict[str, Any]]:
+        """
+        查詢會話：metric 指標介於 [min_value, max_value]，
+        start_time / end_time 為會話開始時間戳的範圍（與日誌行首的時間戳相同單位，毫秒），
+        filters 為 區域/語言/User-Agent/檔案ID/會話ID 的等值條件；依記錄時間由新到舊排列
+        """
+        clauses = []
+        params = []
+        if metric is not None:
+            if metric not in SESSION_METRIC_FILTERS:
+                raise ValueError(f"Unknown metric: {metric}")
+            if min_value is not None:
+                clauses.append(f"{metric} >= ?")
+                params.append(min_value)
+            if max_value is not None:
+                clauses.append(f"{metric} <= ?")
+                params.append(max_value)
+            if min_value is None and max_value is None:
+                clauses.append(f"{metric} IS NOT NULL")
+        if start_time is not None:
+            clauses.append("start_time >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("start_time <= ?")
+            params.append(end_time)
+        for column, value in (filters or {}).items():
+            if column not in SESSION_VALUE_FILTERS:
+                raise ValueError(f"Unknown filter: {column}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        params.append(limit)
+        return self._query(f"SELECT * FROM sessions {where} ORDER BY stored_at DESC, file_id, start_line LIMIT ?",
+                           params)
+
+    def query_events(self, file_id: str = None, session_id: str = None, thread_id: str = None,
+                     event_type: str = None, start_time: int = None, end_time: int = None,
+                     limit: int = DEFAULT_QUERY_LIMIT) -> List[Dict[str, Any]]:
+        """查詢事件（各條件皆可省略），依檔案、時間戳及行號排列"""
+        clauses = []
+        params = []
+        for column, value in (('file_id', file_id), ('session_id', session_id),
+                              ('thread_id', thread_id), ('event_type', event_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start_time is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("timestamp <= ?")
+            params.append(end_time)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        params.append(limit)
+        return self._query(f"SELECT * FROM events {where} ORDER BY file_id, timestamp, line_number LIMIT ?", params)
+
+    def stats(self) -> Dict[str, int]:
+        """各資料表的筆數（啟動時計算一次，之後隨寫入更新，不查詢資料庫）"""
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 多檔案（裝置群）彙總分析
+把一個目錄或 zip 壓縮檔中的所有日誌分派到子程序平行解析，
+再依區域、語言及 SDK User-Agent 彙總各會話的連線與延遲指標分佈
+"""
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from log_parser import LogParser, StreamingLogParser, RunningStats
+from line_store import archive_members, detect_compression, is_supported_log_name, uncompressed_size
+
+# 彙總的會話指標（取自 performance_metrics）
+FLEET_METRICS = ('websocket_connection_time', 'turn_start_latency',
+                 'first_hypothesis_latency', 'max_unacknowledged_audio')
+
+# 彙總維度 → 從會話識別配置取值的函式
+FLEET_DIMENSIONS = {
+    'region': lambda config: config.get('system', {}).get('region'),
+    'language': lambda config: (config.get('recognition', {}).get('language')
+                                or config.get('recognition', {}).get('auto_detect_languages')),
+    'user_agent': lambda config: config.get('system', {}).get('user_agent')
+}
+
+# 配置中找不到維度值時使用的分組名稱
+UNKNOWN_GROUP = 'unknown'
+
+
+def collect_sources(path: str) -> List[Tuple[str, Optional[str], str]]:
+    """
+    列出目錄（遞迴）或壓縮檔中的日誌來源 [(檔案路徑, zip 成員, 顯示名稱)]
+    zip 壓縮檔展開為其中的各個日誌成員
+    """
+    if os.path.isdir(path):
+        filepaths = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            filepaths.extend(os.path.join(root, name) for name in sorted(files) if is_supported_log_name(name))
+    else:
+        filepaths = [path]
+
+    sources = []
+    for filepath in filepaths:
+        name = os.path.relpath(filepath, path) if filepath != path else os.path.basename(filepath)
+        if detect_compression(filepath) == 'zip':
+            sources.extend((filepath, member, f"{name}/{member}") for member in archive_members(filepath))
+        else:
+            sources.append((filepath, None, name))
+    return sources
+
+
+def analyze_source(filepath: str, member: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    解析單一日誌來源（在子程序中執行），返回各會話的維度值與指標
+    只傳回彙總所需的少量欄位，避免在程序間傳遞完整的分析結果；
+    解壓後超過串流門檻的來源與上傳相同改用串流解析，避免整個檔案的索引常駐子程序的記憶體
+    """
+    if uncompressed_size(filepath, member) > Config.STREAMING_THRESHOLD_MB * 1024 * 1024:
+        parser = StreamingLogParser(filepath, member=member)
+    else:
+        parser = LogParser(filepath, member=member)
+    try:
+        sessions = []
+        for session_id, details in parser.analyze_all_sessions().items():
+            if 'error' in details:
+                continue
+            config = details.get('recognition_config', {})
+            metrics = details.get('performance_metrics', {})
+            sessions.append({
+                'session_id': session_id,
+                'dimensions': {name: get_value(config) for name, get_value in FLEET_DIMENSIONS.items()},
+                'metrics': {name: metrics.get(name) for name in FLEET_METRICS}
+            })
+        return sessions
+    finally:
+        parser.close()
+
+
+class FleetAggregator:
+    """以可合併的累計統計彙總各會話指標（整體及各維度分組）"""
+
+    def __init__(self):
+        self.files = 0
+        self.sessions = 0
+        self.failed = []
+        self.overall = self._new_group()
+        self.groups = {name: {} for name in FLEET_DIMENSIONS}
+
+    @staticmethod
+    def _new_group() -> Dict[str, Any]:
+        return {'sessions': 0, 'metrics': {name: RunningStats() for name in FLEET_METRICS}}
+
+    @staticmethod
+    def _add_to_group(group: Dict[str, Any], metrics: Dict[str, Any]):
+        group['sessions'] += 1
+        for name, value in metrics.items():
+            if value is not None:
+                group['metrics'][name].add(value)
+
+    def add_source(self, name: str, sessions: List[Dict[str, Any]]):
+        self.files += 1
+        for session in sessions:
+            self.sessions += 1
+            self._add_to_group(self.overall, session['metrics'])
+            for dimension, value in session['dimensions'].items():
+                groups = self.groups[dimension]
+                key = value or UNKNOWN_GROUP
+                if key not in groups:
+                    groups[key] = self._new_group()
+                self._add_to_group(groups[key], session['metrics'])
+
+    def add_failure(self, name: str, error: str):
+        self.failed.append({'source': name, 'error': error})
+
+    @staticmethod
+    def _group_result(group: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'sessions': group['sessions'],
+            'metrics': {name: stats.summary() for name, stats in group['metrics'].items()}
+        }
+
+    def result(self) -> Dict[str, Any]:
+        """彙總結果；各維度的分組依會話數由多到少排列"""
+        result = {
+            'files': self.files,
+            'sessions': self.sessions,
+            'failed': sorted(self.failed, key=lambda failure: failure['source']),
+            'overall': self._group_result(self.overall)
+        }
+        for dimension, groups in self.groups.items():
+            ordered = sorted(groups.items(), key=lambda item: (-item[1]['sessions'], item[0]))
+            result[f'by_{dimension}'] = {key: self._group_result(group) for key, group in ordered}
+        return result
+
+
+def analyze_fleet(path: str, workers: int = None,
+                  progress: Callable[[int, int], None] = None, mp_context=None) -> Dict[str, Any]:
+    """
+    平行解析目錄或壓縮檔中的所有日誌並彙總指標分佈
+    workers 為子程序數（預設為 CPU 數，1 時在目前程序中依序解析）；
+    提供 progress 時先以 (0, 來源總數) 呼叫，之後每完成一個來源以 (已完成數, 來源總數) 呼叫；
+    mp_context 為子程序的啟動方式（如在多線程的網頁服務中使用 spawn，避免 fork 複製其他線程持有的鎖）
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到路徑: {path}")
+    sources = collect_sources(path)
+    aggregator = FleetAggregator()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources) or 1))
+    if progress is not None:
+        progress(0, len(sources))
+
+    def record(name, future_result):
+        try:
+            aggregator.add_source(name, future_result())
+        except Exception as e:
+            print(f"[彙總分析] {name} 解析失敗: {str(e)}")
+            aggregator.add_failure(name, str(e))
+        if progress is not None:
+            progress(aggregator.files + len(aggregator.failed), len(sources))
+
+    if workers == 1:
+        for filepath, member, name in sources:
+            record(name, lambda: analyze_source(filepath, member))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            futures = {
+                executor.submit(analyze_source, filepath, member): name
+                for filepath, member, name in sources
+            }
+            for future in as_completed(futures):
+                record(futures[future], future.result)
+
+    return aggregator.result()
+
+
+if __name__ == "__main__":
+    import sys
+    args = sys.argv[1:]
+    if args:
+        workers = int(args[1]) if len(args) > 1 else None
+        print(json.dumps(analyze_fleet(args[0], workers), ensure_ascii=False, indent=2))
+    else:
+        print("用法: python fleet.py <日誌目錄或 zip 壓縮檔> [子程序數]")
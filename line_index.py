@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 行索引
+單次掃描將每一行拆解為 (線程ID, 時間戳, 來源位置, 訊息偏移) 並以欄位陣列保存，
+同時建立 線程ID → 行號、會話ID → 行號 的倒排索引，
+供 LogParser 的各項分析直接查詢，避免對原始字串重複執行正則表達式
+"""
+
+import re
+import mmap
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from line_store import MappedLines, decode_line
+
+# Azure SDK 行首格式：[線程ID]: 時間戳ms SPX_等級:  來源檔案:行號 訊息
+LINE_PREFIX_PATTERN = re.compile(r'\[(\d+)\]:(?:\s*(\d+)ms(?:\s+SPX_[A-Z_]+:\s*([\w.]+:\d+)\s+)?)?')
+
+# 會話ID宣告（與 LogParser.session_id_pattern 相同）
+SESSION_ID_PATTERN = re.compile(r"SessionId:\s*([a-f0-9\-]{32,36})", re.IGNORECASE)
+
+# SESSION_ID_PATTERN 的字面預篩（模式忽略大小寫，以小寫的行比對）
+SESSION_ID_LITERAL = 'sessionid:'
+
+# 行中出現的 GUID 形式識別碼（含或不含連字號），用於建立會話倒排索引
+GUID_TOKEN_PATTERN = re.compile(
+    r'(?<![0-9A-Za-z\-])([0-9A-Fa-f]{8}(?:-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}|[0-9A-Fa-f]{32})(?![0-9A-Za-z\-])'
+)
+
+# 十六進位記憶體地址（如 this=0x0000026AA40A6068，部分 SDK 版本輸出為 0x0x...），
+# 建立索引時正規化為小寫、單一 0x 前綴
+HEX_ADDRESS_PATTERN = re.compile(r'(?<![0-9A-Za-z])0[xX](?:0[xX])?([0-9A-Fa-f]+)')
+
+# 線程關聯分析用到的關鍵事件（字面字串），建立索引時記錄其所在行號，
+# 讓分析方法只需檢查少數候選行，而不必逐行解碼整個檔案
+LINE_MARKERS = {
+    'session_started': 'Firing SessionStarted event',
+    'background_thread_started': 'Started thread Background with ID',
+    'user_thread_started': 'Started thread User with ID',
+    'audio_pump_start': 'CSpxAudioPump::StartPump()',
+    'audio_pump_thread_started': 'AudioPump THREAD started!',
+    'audio_pump_get_format': 'PumpThread(): getting format from reader...',
+    'gstreamer_push_data': 'PushDataToPipeline:',
+    'gstreamer_new_pad': 'Received new pad',
+    'gstreamer_oggdemux': 'oggdemux',
+    'speech_region_property': "name='SPEECH-Region'",
+}
+MARKER_PATTERN = re.compile('|'.join(re.escape(literal) for literal in LINE_MARKERS.values()))
+
+# 欄位陣列中表示「無此欄位」的值
+MISSING = -1
+
+# 建立索引時每處理多少行回報一次進度
+PROGRESS_INTERVAL_LINES = 16384
+
+# 估算記憶體用量時每個字典/列表項目（鍵字串、物件標頭及雜湊表槽位）的近似位元組數
+CONTAINER_ENTRY_BYTES = 100
+
+
+def search_session_id(line: str):
+    """搜索會話ID宣告；不含 SESSION_ID_LITERAL 的行（絕大多數）不執行忽略大小寫的正則表達式"""
+    if SESSION_ID_LITERAL not in line.lower():
+        return None
+    return SESSION_ID_PATTERN.search(line)
+
+
+def array_bytes(values: array) -> int:
+    """陣列資料的位元組數"""
+    return values.itemsize * len(values)
+
+
+class LineIndex:
+    """
+    日誌行的欄位式索引
+    每一行對應各欄位陣列中的同一個位置（0-based 行號）：
+    - thread_ids: 線程ID在 thread_table 中的編碼
+    - timestamps: 毫秒時間戳（僅當行首同時具有線程ID與時間戳時）
+    - sources: 來源位置（如 web_socket.cpp:540）在 source_table 中的編碼
+    - message_offsets: 訊息本文在原始行中的起始位置
+    
+    倒排索引（行號皆為 0-based 且遞增）：
+    - thread_lines: 線程編碼 → 該線程所有行的行號
+    - guid_lines: GUID 識別碼 → 包含該識別碼的行號
+    - session_starts: 會話ID → 第一次以 "SessionId:" 出現的行號（保持出現順序）
+    - marker_lines: LINE_MARKERS 名稱 → 包含該字面字串的行號
+    - address_first_lines: 正規化記憶體地址 → {線程編碼: 該線程第一次出現此地址的行號}
+    """
+
+    def __init__(self):
+        self.thread_ids = array('i')
+        self.timestamps = array('q')
+        self.sources = array('i')
+        self.message_offsets = array('I')
+
+        # 字串表（以編碼取代重複字串）
+        self.thread_table = []
+        self.source_table = []
+        self._thread_codes = {}
+        self._source_codes = {}
+
+        # 每個線程第一次出現（帶時間戳）的行號
+        self.thread_first_line = {}
+
+        # 倒排索引
+        self.thread_lines = {}
+        self.guid_lines = {}
+        self.session_starts = {}
+        self.marker_lines = {name: array('I') for name in LINE_MARKERS}
+        self._marker_postings = {literal: self.marker_lines[name] for name, literal in LINE_MARKERS.items()}
+        self.address_first_lines = {}
+
+    @classmethod
+    def build(cls, lines: Iterable[str], progress: Callable[['LineIndex'], None] = None) -> 'LineIndex':
+        """從行序列建立索引；提供 progress 時每處理 PROGRESS_INTERVAL_LINES 行以目前的索引呼叫一次"""
+        index = cls()
+        if progress is None:
+            for line in lines:
+                index.add_line(line)
+            return index
+
+        for line_num, line in enumerate(lines, 1):
+            index.add_line(line)
+            if line_num % PROGRESS_INTERVAL_LINES == 0:
+                progress(index)
+        return index
+
+    @classmethod
+    def merge(cls, shards: List['LineIndex']) -> 'LineIndex':
+        """
+        依行順序合併多個分片索引（各分片的行號從 0 起算）
+        線程/來源編碼依第一次出現順序重新編碼，結果與對整個檔案單次建立的索引完全相同
+        """
+        index = cls()
+        for shard in shards:
+            index._extend(shard)
+        return index
+
+    def _extend(self, shard: 'LineIndex'):
+        """把分片索引附加到目前索引之後"""
+        base = len(self)
+        thread_map = [self._intern_thread(thread_id) for thread_id in shard.thread_table]
+        source_map = [self._intern_source(source) for source in shard.source_table]
+
+        self.thread_ids.extend(_remap_codes(shard.thread_ids, thread_map))
+        self.sources.extend(_remap_codes(shard.sources, source_map))
+        self.timestamps.extend(shard.timestamps)
+        self.message_offsets.extend(shard.message_offsets)
+
+        for code, line_num in shard.thread_first_line.items():
+            self.thread_first_line.setdefault(thread_map[code], base + line_num)
+        for code, postings in shard.thread_lines.items():
+            self.thread_lines[thread_map[code]].extend(_shift_postings(postings, base))
+        for token, postings in shard.guid_lines.items():
+            target = self.guid_lines.get(token)
+            if target is None:
+                target = self.guid_lines[token] = array('I')
+            target.extend(_shift_postings(postings, base))
+        for session_id, line_num in shard.session_starts.items():
+            self.session_starts.setdefault(session_id, base + line_num)
+        for name, postings in shard.marker_lines.items():
+            self.marker_lines[name].extend(_shift_postings(postings, base))
+        for address, first_lines in shard.address_first_lines.items():
+            target = self.address_first_lines.setdefault(address, {})
+            for code, line_num in first_lines.items():
+                target.setdefault(thread_map[code], base + line_num)
+
+    def __len__(self):
+        return len(self.thread_ids)
+
+    def memory_size(self) -> int:
+        """近似常駐位元組數（欄位陣列、倒排索引陣列及字串表/字典項目）"""
+        size = sum(array_bytes(column) for column in (self.thread_ids, self.timestamps,
+                                                      self.sources, self.message_offsets))
+        for postings in (self.thread_lines, self.guid_lines, self.marker_lines):
+            size += sum(array_bytes(lines) for lines in postings.values())
+        entries = (len(self.thread_table) + len(self.source_table) + len(self.thread_first_line)
+                   + len(self.thread_lines) + len(self.guid_lines) + len(self.session_starts)
+                   + sum(len(first_lines) + 1 for first_lines in self.address_first_lines.values()))
+        return size + entries * CONTAINER_ENTRY_BYTES
+
+    def add_line(self, line: str):
+        """解析一行並附加到欄位陣列與倒排索引"""
+        line_num = len(self.thread_ids)
+        self._index_sessions(line, line_num)
+        for marker in MARKER_PATTERN.findall(line):
+            postings = self._marker_postings[marker]
+            if not postings or postings[-1] != line_num:
+                postings.append(line_num)
+
+        stripped = line.lstrip()
+        match = LINE_PREFIX_PATTERN.match(stripped)
+
+        if not match:
+            self.thread_ids.append(MISSING)
+            self.timestamps.append(MISSING)
+            self.sources.append(MISSING)
+            self.message_offsets.append(0)
+            return
+
+        thread_code = self._intern_thread(match.group(1))
+        timestamp = match.group(2)
+        source = match.group(3)
+
+        self.thread_ids.append(thread_code)
+        self.thread_lines[thread_code].append(line_num)
+        if '0x' in line or '0X' in line:
+            self._index_addresses(line, thread_code, line_num)
+        if timestamp is not None:
+            self.timestamps.append(int(timestamp))
+            if thread_code not in self.thread_first_line:
+                self.thread_first_line[thread_code] = line_num
+        else:
+            self.timestamps.append(MISSING)
+        self.sources.append(self._intern_source(source) if source else MISSING)
+        self.message_offsets.append(len(line) - len(stripped) + match.end())
+
+    def _index_sessions(self, line: str, line_num: int):
+        """記錄會話宣告與行中出現的 GUID 識別碼"""
+        for token in set(GUID_TOKEN_PATTERN.findall(line)):
+            postings = self.guid_lines.get(token)
+            if postings is None:
+                postings = self.guid_lines[token] = array('I')
+            postings.append(line_num)
+
+        session_match = search_session_id(line)
+        if session_match and session_match.group(1) not in self.session_starts:
+            self.session_starts[session_match.group(1)] = line_num
+
+    def _index_addresses(self, line: str, thread_code: int, line_num: int):
+        """記錄行中每個記憶體地址在該線程第一次出現的行號"""
+        for digits in HEX_ADDRESS_PATTERN.findall(line):
+            first_lines = self.address_first_lines.get('0x' + digits.lower())
+            if first_lines is None:
+                first_lines = self.address_first_lines['0x' + digits.lower()] = {}
+            if thread_code not in first_lines:
+                first_lines[thread_code] = line_num
+
+    def _intern_thread(self, thread_id: str) -> int:
+        code = self._thread_codes.get(thread_id)
+        if code is None:
+            code = len(self.thread_table)
+            self._thread_codes[thread_id] = code
+            self.thread_table.append(thread_id)
+            self.thread_lines[code] = array('I')
+        return code
+
+    def _intern_source(self, source: str) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = len(self.source_table)
+            self._source_codes[source] = code
+            self.source_table.append(source)
+        return code
+
+    def thread_code(self, thread_id) -> int:
+        """取得線程ID的編碼，不存在時返回 MISSING"""
+        if thread_id is None:
+            return MISSING
+        return self._thread_codes.get(str(thread_id), MISSING)
+
+    def thread_id(self, line_num: int) -> Optional[str]:
+        """取得指定行（0-based）的線程ID"""
+        code = self.thread_ids[line_num]
+        return self.thread_table[code] if code != MISSING else None
+
+    def timestamp(self, line_num: int) -> Optional[int]:
+        """取得指定行（0-based）的時間戳"""
+        value = self.timestamps[line_num]
+        return value if value != MISSING else None
+
+    def source(self, line_num: int) -> Optional[str]:
+        """取得指定行（0-based）的來源位置"""
+        code = self.sources[line_num]
+        return self.source_table[code] if code != MISSING else None
+
+    def lines_for_thread(self, thread_id) -> array:
+        """取得指定線程的所有行號（0-based），線程不存在時返回空陣列"""
+        code = self.thread_code(thread_id)
+        return self.thread_lines[code] if code != MISSING else array('I')
+
+    def lines_for_guid(self, token: str) -> Optional[array]:
+        """取得包含指定 GUID 的所有行號（0-based），未被索引時返回 None"""
+        return self.guid_lines.get(token)
+
+    def lines_with_marker(self, name: str) -> array:
+        """取得包含指定關鍵事件（LINE_MARKERS 名稱）的所有行號（0-based）"""
+        return self.marker_lines[name]
+
+    def first_address_line(self, address: str, exclude_thread_code: int = MISSING) -> Optional[int]:
+        """
+        取得記憶體地址第一次出現在（排除指定線程以外的）任一線程的行號（0-based）
+        地址的大小寫及 0x0x 前綴會先正規化，找不到時返回 None
+        """
+        match = HEX_ADDRESS_PATTERN.fullmatch(address.strip())
+        if not match:
+            return None
+        first_lines = self.address_first_lines.get('0x' + match.group(1).lower(), {})
+        candidates = [line_num for code, line_num in first_lines.items() if code != exclude_thread_code]
+        return min(candidates) if candidates else None
+
+    def session_ids(self) -> List[str]:
+        """依第一次出現順序返回所有會話ID"""
+        return list(self.session_starts)
+
+    def first_appearances(self) -> Dict[str, int]:
+        """每個線程第一次出現（帶時間戳）的行號（0-based）"""
+        return {self.thread_table[code]: line_num for code, line_num in self.thread_first_line.items()}
+
+
+class IncrementalLineIndexer:
+    """
+    把任意切割的位元組區塊逐步切成行並加入索引（邊接收上傳內容邊建立索引）
+    finish() 返回的行偏移陣列及索引與對完整檔案執行 MappedLines.open + LineIndex.build 的結果相同；
+    keep_buffer 為 True 時同時保留所有區塊，供沒有原始檔可映射的來源（如解壓後的內容）使用
+    """
+
+    def __init__(self, keep_buffer: bool = False):
+        self.index = LineIndex()
+        self.offsets = array('Q')
+        self.position = 0
+        self._pending = b''
+        self._chunks = [] if keep_buffer else None
+
+    def feed(self, chunk: bytes):
+        """加入一個位元組區塊，處理其中所有完整的行"""
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+        data = self._pending + chunk if self._pending else chunk
+        start = 0
+        find = data.find
+        while True:
+            newline = find(b'\n', start)
+            if newline == -1:
+                break
+            self._add_line(data[start:newline + 1])
+            start = newline + 1
+        self._pending = data[start:]
+
+    def _add_line(self, raw: bytes):
+        self.offsets.append(self.position)
+        self.position += len(raw)
+        self.index.add_line(decode_line(raw))
+
+    def finish(self) -> Tuple[array, LineIndex]:
+        """處理最後一行（沒有結尾換行時）並返回 (行偏移陣列, 索引)"""
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = b''
+        self.offsets.append(self.position)
+        return self.offsets, self.index
+
+    def buffer(self) -> bytes:
+        """已加入的全部內容（僅 keep_buffer=True 時可用）"""
+        if self._chunks is None:
+            raise ValueError("IncrementalLineIndexer 未保留區塊內容")
+        return b''.join(self._chunks)
+
+
+def _remap_codes(codes: array, mapping: List[int]) -> array:
+    """把分片的字串表編碼轉換為合併後的編碼（MISSING 保持不變）"""
+    if all(code == target for code, target in enumerate(mapping)):
+        return codes
+    return array(codes.typecode, [mapping[code] if code != MISSING else MISSING for code in codes])
+
+
+def _shift_postings(postings: array, base: int) -> array:
+    """把分片的行號加上分片起始行號"""
+    if not base:
+        return postings
+    return array(postings.typecode, [base + line_num for line_num in postings])
+
+
+def index_file_range(filepath: str, start: int, end: int) -> Tuple[array, 'LineIndex']:
+    """
+    索引檔案中 [start, end) 位元組範圍（範圍需切在行邊界上）
+    供 ProcessPoolExecutor 的子程序呼叫，返回該範圍的行偏移陣列與分片索引
+    """
+    with open(filepath, 'rb') as handle:
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offsets = MappedLines.scan_offsets(buffer, start, end)
+            index = LineIndex.build(MappedLines(buffer, offsets))
+        finally:
+            buffer.close()
+    return offsets, index
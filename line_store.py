@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 行儲存
+以記憶體映射（mmap）方式開啟日誌檔案，只保存每行的位元組偏移陣列，
+需要時才解碼單行內容，取代 readlines() 造成的大量字串物件；
+壓縮日誌（gzip / zstd / zip）以串流方式解壓，不在磁碟上產生解壓後的副本
+"""
+
+import os
+import gzip
+import mmap
+import struct
+import zipfile
+from array import array
+from functools import lru_cache
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 日誌檔案副檔名（zip 壓縮檔中只解析這些成員）
+LOG_EXTENSIONS = ('.txt', '.log')
+
+# 壓縮格式的副檔名及檔頭特徵
+COMPRESSED_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd', '.zip': 'zip'}
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'PK\x03\x04', 'zip'),
+    (b'PK\x05\x06', 'zip'),  # 空的 zip
+)
+
+# 一次讀取的解壓後位元組數
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+
+
+def decode_line(raw: bytes) -> str:
+    """解碼單行位元組內容，\r\n 正規化為 \n"""
+    if raw.endswith(b'\r\n'):
+        raw = raw[:-2] + b'\n'
+    return raw.decode('utf-8', errors='ignore')
+
+
+def iter_stream_lines(stream: BinaryIO, chunk_size: int = 1024 * 1024) -> Iterator[Tuple[str, int]]:
+    """
+    以固定大小的區塊讀取二進位串流，逐行產生 (行內容, 原始位元組數)
+    行內容與 MappedLines 一致；記憶體用量只取決於區塊大小與最長的一行
+    """
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        data = pending + chunk if pending else chunk
+        start = 0
+        find = data.find
+        while True:
+            newline = find(b'\n', start)
+            if newline == -1:
+                break
+            yield decode_line(data[start:newline + 1]), newline + 1 - start
+            start = newline + 1
+        pending = data[start:]
+    if pending:
+        yield decode_line(pending), len(pending)
+
+
+class TeeReader:
+    """
+    讀取來源串流的同時把內容寫入目標檔案並更新雜湊
+    （上傳時一次讀取即可同時完成存檔、計算內容雜湊與解析）
+    """
+
+    def __init__(self, source: BinaryIO, sink: BinaryIO, digest=None):
+        self.source = source
+        self.sink = sink
+        self.digest = digest
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        if chunk:
+            self.sink.write(chunk)
+            if self.digest is not None:
+                self.digest.update(chunk)
+            self.bytes_read += len(chunk)
+        return chunk
+
+
+def compression_for_filename(filename: str) -> Optional[str]:
+    """依副檔名判斷壓縮格式，非壓縮檔返回 None"""
+    lower = filename.lower()
+    for extension, compression in COMPRESSED_EXTENSIONS.items():
+        if lower.endswith(extension):
+            return compression
+    return None
+
+
+def is_supported_log_name(filename: str) -> bool:
+    """檔名是否為可解析的日誌（.txt / .log 或 gzip / zstd / zip 壓縮檔）"""
+    return filename.lower().endswith(LOG_EXTENSIONS) or compression_for_filename(filename) is not None
+
+
+def detect_compression(filepath: str) -> Optional[str]:
+    """依檔頭特徵判斷檔案的壓縮格式，純文字檔返回 None"""
+    with open(filepath, 'rb') as f:
+        header = f.read(4)
+    for magic, compression in COMPRESSION_MAGIC:
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def zstd_available() -> bool:
+    """是否已安裝 zstd 解壓所需的 zstandard 套件（選用相依套件）"""
+    return zstandard is not None
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise Exception("zstd 壓縮檔需要安裝 zstandard 套件 (pip install zstandard)")
+
+
+def decompress_stream(stream: BinaryIO, compression: Optional[str]) -> BinaryIO:
+    """
+    把壓縮的二進位串流包裝為解壓後的串流（只支援可循序解壓的 gzip / zstd）
+    來源只需支援 read()，可直接包裝上傳中的請求本文
+    """
+    if compression is None:
+        return stream
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == 'zstd':
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True, closefd=False)
+    raise ValueError(f"無法循序解壓 {compression} 格式")
+
+
+def archive_members(filepath: str) -> List[str]:
+    """zip 壓縮檔中的日誌成員（依壓縮檔內順序，略過目錄及 macOS 的附加資料）"""
+    with zipfile.ZipFile(filepath) as archive:
+        return [
+            info.filename for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith('__MACOSX/')
+            and info.filename.lower().endswith(LOG_EXTENSIONS)
+        ]
+
+
+def open_log_stream(filepath: str, member: str = None) -> BinaryIO:
+    """
+    以解壓後的內容開啟日誌（二進位串流，需由呼叫端關閉）
+    純文字檔直接開啟；gzip / zstd 邊讀邊解壓；zip 需以 member 指定成員
+    """
+    compression = detect_compression(filepath)
+    if compression == 'zip':
+        if member is None:
+            raise ValueError("zip 壓縮檔需指定成員名稱")
+        # ZipFile 關閉後成員串流仍持有檔案參考，直到串流關閉
+        with zipfile.ZipFile(filepath) as archive:
+            return archive.open(member)
+    if compression == 'gzip':
+        return gzip.open(filepath, 'rb')
+    if compression == 'zstd':
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), read_across_frames=True)
+    return open(filepath, 'rb')
+
+
+def uncompressed_size(filepath: str, member: str = None) -> int:
+    """
+    日誌解壓後的大小（用於選擇解析方式及進度顯示）
+    gzip 取檔尾記錄的大小，但該欄位只有 32 位元（超過 4GB 時溢位），小於壓縮檔本身時改為串流解壓計算；
+    zstd 的 frame 未記錄大小時同樣串流解壓計算（只計數，不保存內容）
+    """
+    compression = detect_compression(filepath)
+    if compression == 'zip':
+        with zipfile.ZipFile(filepath) as archive:
+            return archive.getinfo(member).file_size
+    if compression == 'gzip':
+        with open(filepath, 'rb') as f:
+            f.seek(-4, 2)
+            size = struct.unpack('<I', f.read(4))[0]
+        if size >= os.path.getsize(filepath):
+            return size
+        return _decompressed_length(filepath, member, *_file_version(filepath))
+    if compression == 'zstd':
+        _require_zstandard()
+        with open(filepath, 'rb') as f:
+            size = zstandard.frame_content_size(f.read(18))
+        if size >= 0:
+            return size
+        return _decompressed_length(filepath, member, *_file_version(filepath))
+    return os.path.getsize(filepath)
+
+
+def _file_version(filepath: str) -> Tuple[int, int]:
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+@lru_cache(maxsize=256)
+def _decompressed_length(filepath: str, member: Optional[str], size: int, mtime_ns: int) -> int:
+    """
+    串流解壓整個檔案計算解壓後的位元組數（記憶體用量固定）；
+    以檔案大小及修改時間為鍵保存結果，同一檔案選擇解析方式及建立串流解析器時只解壓一次
+    """
+    total = 0
+    with open_log_stream(filepath, member) as stream:
+        while True:
+            chunk = stream.read(DECOMPRESS_CHUNK_SIZE)
+            if not chunk:
+                return total
+            total += len(chunk)
+
+
+def split_line_ranges(buffer, parts: int) -> List[Tuple[int, int]]:
+    """把緩衝區切成約 parts 等份的 [start, end) 位元組範圍，切點都落在行邊界"""
+    size = len(buffer)
+    ranges = []
+    start = 0
+    for part in range(1, parts):
+        if start >= size:
+            break
+        newline = buffer.find(b'\n', max(start, size * part // parts))
+        if newline == -1:
+            break
+        ranges.append((start, newline + 1))
+        start = newline + 1
+    if start < size or not ranges:
+        ranges.append((start, size))
+    return ranges
+
+
+class MappedLines:
+    """
+    唯讀、可隨機存取的日誌行序列
+    行為與 readlines() 的結果一致：每行保留結尾的換行字元，
+    Windows 的 \r\n 換行會正規化為 \n
+    """
+
+    def __init__(self, buffer, offsets: array, handle=None):
+        self._buffer = buffer
+        self._handle = handle
+        # offsets[i] 為第 i 行的起始位置，offsets[-1] 為資料結尾
+        self.offsets = offsets
+
+    @classmethod
+    def open(cls, filepath: str, offsets: array = None) -> 'MappedLines':
+        """以 mmap 開啟檔案並建立行偏移陣列（已知偏移陣列時直接使用）"""
+        handle = open(filepath, 'rb')
+        try:
+            if handle.seek(0, 2) == 0:
+                # 空檔案無法 mmap
+                handle.close()
+                return cls(b'', array('Q', [0]))
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            handle.close()
+            raise
+        return cls(buffer, offsets if offsets is not None else cls.scan_offsets(buffer), handle)
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, offsets: array = None) -> 'MappedLines':
+        """把（解壓後的）串流讀入記憶體並建立行偏移陣列（已知偏移陣列時直接使用）"""
+        chunks = []
+        while True:
+            chunk = stream.read(DECOMPRESS_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        buffer = b''.join(chunks)
+        return cls(buffer, offsets if offsets is not None else cls.scan_offsets(buffer))
+
+    def reopen_appended(self, filepath: str) -> 'MappedLines':
+        """
+        重新映射內容已附加的同一個檔案，保留既有行偏移，只掃描目前最後一行之後的內容
+        （結尾不完整的行不列入，等下次附加後再處理）
+        """
+        handle = open(filepath, 'rb')
+        try:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            handle.close()
+            raise
+        offsets = array('Q', self.offsets[:-1])
+        offsets.extend(self.scan_offsets(buffer, self.size))
+        return MappedLines(buffer, offsets, handle).drop_partial_line()
+
+    def drop_partial_line(self) -> 'MappedLines':
+        """去掉結尾沒有換行字元的不完整行（追蹤寫入中的檔案時使用）"""
+        if len(self) and self._buffer[self.offsets[-1] - 1:self.offsets[-1]] != b'\n':
+            self.offsets.pop()
+        return self
+
+    @staticmethod
+    def scan_offsets(buffer, start: int = 0, end: int = None) -> array:
+        """掃描換行字元，返回 [start, end) 範圍內每行的起始位置及結尾位置"""
+        if end is None:
+            end = len(buffer)
+        offsets = array('Q')
+        position = start
+        find = buffer.find
+        while position < end:
+            offsets.append(position)
+            newline = find(b'\n', position, end)
+            if newline == -1:
+                position = end
+                break
+            position = newline + 1
+        offsets.append(position)
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, line_num: int) -> str:
+        return decode_line(self._buffer[self.offsets[line_num]:self.offsets[line_num + 1]])
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            return [self._decode(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('line index out of range')
+        return self._decode(item)
+
+    def __iter__(self) -> Iterator[str]:
+        for line_num in range(len(self)):
+            yield self._decode(line_num)
+
+    @property
+    def size(self) -> int:
+        """資料總位元組數"""
+        return self.offsets[-1]
+
+    @property
+    def buffer_size(self) -> int:
+        """映射的位元組數（包含未列入行偏移的不完整結尾）"""
+        return len(self._buffer)
+
+    def memory_size(self) -> int:
+        """
+        近似常駐位元組數：行偏移陣列，加上解壓在記憶體中的內容
+        （mmap 的檔案頁面由作業系統的頁面快取管理，記憶體不足時可直接丟棄，不計入）
+        """
+        size = self.offsets.itemsize * len(self.offsets)
+        if not isinstance(self._buffer, mmap.mmap):
+            size += self.buffer_size
+        return size
+
+    def close(self):
+        """釋放 mmap 及檔案控制代碼"""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
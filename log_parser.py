@@ -5,173 +5,954 @@ SDK日誌分析器
 專門用於解析Azure Speech SDK日誌，提取會話資訊和效能指標
 """
 
+import os
 import re
 import json
+import math
+import mmap
+import threading
+from array import array
+from collections import deque
+from functools import wraps
+from itertools import islice
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from line_index import (LineIndex, MISSING, SESSION_ID_PATTERN, LINE_PREFIX_PATTERN, GUID_TOKEN_PATTERN,
+                        PROGRESS_INTERVAL_LINES, IncrementalLineIndexer, index_file_range, search_session_id)
+from search_index import (TokenIndex, DEFAULT_SEARCH_RESULTS, compile_search, match_spans, query_fragments,
+                          search_lines)
+from single_flight import SingleFlight
+from line_store import (MappedLines, DECOMPRESS_CHUNK_SIZE, archive_members, detect_compression,
+                        iter_stream_lines, open_log_stream, split_line_ranges, uncompressed_size)
+
+# Azure Speech SDK 正則表達式模式（模組層級預先編譯，所有解析器共用）
+LOG_PATTERNS = {
+    # 時間戳和線程ID模式 - Azure SDK 格式
+    'azure_timestamp': re.compile(r'\[(\d+)\]:\s*(\d+)ms\s+SPX_[A-Z_]+:\s*[\w_.]+:\d+\s+(.+)'),
+    
+    # 會話ID識別
+    'session_started': re.compile(r'Firing SessionStarted event: SessionId:\s*([a-f0-9\-]{32,36})', re.IGNORECASE),
+    'session_id_generic': re.compile(r'SessionId:\s*([a-f0-9\-]{32,36})', re.IGNORECASE),
+    
+    # AudioStreamSession 地址模式
+    'audio_stream_session': re.compile(r'\[((?:0x)?[A-F0-9]{8,16})\]CSpxAudioStreamSession', re.IGNORECASE),
+    
+    # 線程識別模式
+    'main_thread': re.compile(r'Started main thread with ID \[(\d+)ll\]'),
+    'thread_started': re.compile(r'Started thread (\w+) with ID \[(\d+)ll\]'),
+    'background_thread': re.compile(r'\[(.*?)\]'),
+    'user_thread': re.compile(r'Started thread User with ID \[(\d+)ll\]'),
+    'audiopump_thread': re.compile(r'AudioPump THREAD started!'),
+    
+    # 狀態變遷模式
+    'state_change': re.compile(r'TryChangeState: recoKind/sessionState: (\d+)/(\d+) => (\d+)/(\d+)'),
+    'adapter_state': re.compile(r'TryChangeState: audioState/uspState: (\d+)/(\d+) => (\d+)/(\d+)'),
+    
+    # WebSocket 連接和通信（簡化匹配）
+    'websocket_start': re.compile(r'Start to open websocket'),
+    'websocket_opened': re.compile(r'Opening websocket completed|OnWebSocketOpened'),
+    'websocket_closed': re.compile(r'OnWebSocketClosed'),
+    'websocket_send': re.compile(r'Web socket sending message'),
+    'websocket_send_complete': re.compile(r'Web socket send message completed'),
+    'websocket_message_received': re.compile(r'USP message received'),
+    
+    # 音頻處理相關（簡化匹配）
+    'write_buffer': re.compile(r'WriteBuffer:'),
+    'audio_chunk_received': re.compile(r'Received audio chunk:'),
+    'read_frame_duration': re.compile(r'read frame duration:\s*(\d+)\s*ms'),
+    'audio_pump_read': re.compile(r'Read: totalBytesRead=(\d+)'),
+    'audio_end_detected': re.compile(r'Read: End of stream detected|read ZERO \(0\) bytes'),
+    
+    # 效能指標詳細提取
+    'unacknowledged_audio': re.compile(r'unacknowledgedAudioDuration\s*=\s*(\d+)\s*msec'),
+    'upload_rate': re.compile(r'Web socket upload rate.*?(\d+\.?\d*)\s*KB/s'),
+    'recognition_latency': re.compile(r"name='RESULT-RecognitionLatencyMs';\s*value='(\d+)'"),
+    'time_in_queue': re.compile(r'TimeInQueue:\s*(\d+)ms'),
+    'turn_start_ts': re.compile(r'TS:(\d+)\s+Response Message: path: turn\.start'),
+    'first_hypothesis_ts': re.compile(r'TS:(\d+)\s+Response Message: path: speech\.hypothesis'),
+    
+    # 語音識別事件
+    'turn_start': re.compile(r'path:\s*turn\.start'),
+    'turn_end': re.compile(r'path:\s*turn\.end'),
+    'speech_start_detected': re.compile(r'path:\s*speech\.startDetected'),
+    'speech_end_detected': re.compile(r'path:\s*speech\.endDetected'),
+    'speech_hypothesis': re.compile(r'path:\s*speech\.hypothesis|Response:\s*Speech\.Hypothesis\s+message', re.IGNORECASE),
+    'speech_phrase': re.compile(r'path:\s*speech\.phrase|Response:\s*Speech\.Phrase\s+message', re.IGNORECASE),
+    
+    # 文本提取（簡化為更可靠的模式）
+    'recognition_text': re.compile(r'Text:\s+(.+?)(?:\s*$)', re.IGNORECASE),
+    'recognition_status': re.compile(r'RecognitionStatus:\s*(\w+)'),
+    'confidence_score': re.compile(r'Confidence:\s*(\d+\.?\d*)'),
+    'duration_info': re.compile(r'Duration:\s*(\d+)'),
+    'offset_info': re.compile(r'Offset:\s*(\d+)'),
+    
+    # 應用程式控制
+    'start_recognition': re.compile(r'StartRecognitionAsync'),
+    'stop_recognition': re.compile(r'StopRecognitionAsync'),
+    
+    # 錯誤和異常
+    'error_message': re.compile(r'ERROR|EXCEPTION|Failed|Error'),
+}
+
+# LOG_PATTERNS 的字面預篩：模式能匹配的行必定包含其中一個字串（忽略大小寫的模式以小寫字串比對小寫的行），
+# 熱點迴圈先以 in 檢查，不含任何字串的行（絕大多數）不執行正則表達式。
+# 以區分大小寫的字面字串開頭的模式不需要預篩（re 本身即以字面前綴快速掃描，預篩只會增加開銷），
+# 只有忽略大小寫或以多選一開頭的模式列在此處；各模式的成本以 `python benchmark.py patterns` 量測
+LOG_PATTERN_LITERALS = {
+    'session_started': ('firing sessionstarted event: sessionid:',),
+    'session_id_generic': ('sessionid:',),
+    'audio_end_detected': ('Read: End of stream detected', 'read ZERO (0) bytes'),
+    'speech_hypothesis': ('speech.hypothesis',),
+    'speech_phrase': ('speech.phrase',),
+    'recognition_text': ('text:',),
+    'error_message': ('ERROR', 'EXCEPTION', 'Failed', 'Error'),
+}
+
+# 名稱 → (必要字面字串, 是否以小寫行比對)
+LOG_PATTERN_PREFILTERS = {
+    name: (literals, bool(LOG_PATTERNS[name].flags & re.IGNORECASE))
+    for name, literals in LOG_PATTERN_LITERALS.items()
+}
+
+
+def search_log_pattern(name: str, line: str, lowered: str = None):
+    """
+    以字面預篩後執行 LOG_PATTERNS[name].search，預篩不通過時返回 None（沒有預篩的模式直接搜索）
+    lowered 為呼叫端已計算的 line.lower()（同一行檢查多個忽略大小寫的模式時只需轉換一次）
+    """
+    prefilter = LOG_PATTERN_PREFILTERS.get(name)
+    if prefilter is None:
+        return LOG_PATTERNS[name].search(line)
+    literals, ignore_case = prefilter
+    if ignore_case:
+        text = line.lower() if lowered is None else lowered
+    else:
+        text = line
+    for literal in literals:
+        if literal in text:
+            return LOG_PATTERNS[name].search(line)
+    return None
+
+
+# 識別配置屬性：(配置區塊, 欄位, 屬性名稱字面字串, 模式)，依序套用，每個欄位只取第一個值
+RECOGNITION_CONFIG_PATTERNS = [
+    (section, key, f"name='{prop}';", re.compile(rf"name='{re.escape(prop)}';\s*value='({value})'"))
+    for section, key, prop, value in [
+        # 音頻設置
+        ('audio', 'sample_rate', 'AudioConfig_SampleRateForCapture', r'\d+'),
+        ('audio', 'bits_per_sample', 'AudioConfig_BitsPerSampleForCapture', r'\d+'),
+        ('audio', 'channels', 'AudioConfig_NumberOfChannelsForCapture', r'\d+'),
+        # 識別設置
+        ('recognition', 'mode', 'SPEECH-RecoMode', r'\w+'),
+        ('recognition', 'language', 'SPEECH-RecoLanguage', r"[^']+"),
+        ('recognition', 'auto_detect_languages', 'Auto-Detect-Source-Languages', r"[^']+"),
+        ('recognition', 'language_id_mode', 'SPEECH-LanguageIdMode', r'\w+'),
+        ('recognition', 'segmentation_timeout', 'SPEECH-SegmentationSilenceTimeoutMs', r'\d+'),
+        # 系統設置
+        ('system', 'buffer_size', 'SPEECH-MaxBufferSizeMs', r'\d+'),
+        ('system', 'region', 'SPEECH-Region', r"[^']+"),
+        ('system', 'connection_url', 'SPEECH-ConnectionUrl', r"[^']+"),
+        ('system', 'user_agent', 'HttpHeader#User-agent', r"[^']+"),
+    ]
+]
+
+def update_recognition_config(config: Dict[str, Dict[str, str]], line: str):
+    """把行中的識別配置屬性填入 config（每個欄位只取第一個值；屬性都以 name='...' 輸出，其他行直接跳過）"""
+    if "name='" not in line:
+        return
+    for section, key, literal, pattern in RECOGNITION_CONFIG_PATTERNS:
+        if key not in config[section] and literal in line:
+            match = pattern.search(line)
+            if match:
+                config[section][key] = match.group(1)
+
+
+# 線程關聯分析的模式（候選行已由 LINE_MARKERS 篩選）
+SESSION_AUDIO_STREAM_PATTERN = re.compile(r'\[([A-F0-9x]{10,18})\]CSpxAudioStreamSession::FireSessionStartedEvent',
+                                          re.IGNORECASE)
+BACKGROUND_THREAD_STARTED_PATTERN = re.compile(r'Started thread Background with ID \[(\d+)ll\]', re.IGNORECASE)
+USER_THREAD_STARTED_PATTERN = re.compile(r'Started thread User with ID \[(\d+)ll\]', re.IGNORECASE)
+REGION_PROPERTY_ADDRESS_PATTERN = re.compile(
+    r"named_properties\.h:479\s+ISpxNamedProperties::GetStringValue:\s+this=(0x(?:0x)?[0-9a-fA-F]+).*?name='SPEECH-Region'",
+    re.IGNORECASE
+)
+AUDIO_PUMP_START_PATTERN = re.compile(r'\[([A-F0-9x]{10,18})\]CSpxAudioPump::StartPump\(\)', re.IGNORECASE)
+
+# 音頻線程啟動事件：(LINE_MARKERS 名稱, 模式)，依序嘗試
+AUDIO_PUMP_THREAD_PATTERNS = [
+    ('audio_pump_thread_started', re.compile(r'\*\*\* AudioPump THREAD started! \*\*\*', re.IGNORECASE)),
+    ('audio_pump_get_format', re.compile(r'PumpThread\(\): getting format from reader...', re.IGNORECASE))
+]
+
+# GStreamer 線程事件：(LINE_MARKERS 名稱, 模式)，依序嘗試
+GSTREAMER_THREAD_PATTERNS = [
+    ('gstreamer_push_data', re.compile(r'base_gstreamer\.cpp:\d+ PushDataToPipeline:', re.IGNORECASE)),
+    ('gstreamer_new_pad', re.compile(r'opus_decoder\.cpp:\d+ Received new pad', re.IGNORECASE)),
+    ('gstreamer_oggdemux', re.compile(r'oggdemux', re.IGNORECASE))
+]
+
+# 在 kickoff 線程附近判斷主應用線程的 SDK 活動（任一出現即計一次），及其字面預篩（以小寫的行比對）
+MAIN_THREAD_ACTIVITY_PATTERN = re.compile(
+    r'StartRecognitionAsync|SpeechConfig|AudioConfig|CreateRecognizer|main\s*\(|WinMain|Application',
+    re.IGNORECASE
+)
+MAIN_THREAD_ACTIVITY_LITERALS = ('startrecognitionasync', 'speechconfig', 'audioconfig', 'createrecognizer',
+                                 'main', 'application')
+
+# 行內時間戳（非錨定搜索），用於指標與時間線
+TIMESTAMP_SEARCH_PATTERN = re.compile(r'\[(\d+)\]:\s*(\d+)ms')
+
+# 線程分析結果中代表會話相關線程的欄位
+SESSION_THREAD_KEYS = ['main_thread', 'kickoff_thread', 'background_thread',
+                       'user_thread', 'audio_thread', 'gstreamer_thread']
+
+# 判斷線程是否在會話期間活躍的 Speech SDK 關鍵字
+SDK_KEYWORDS = [
+    'SPX_', 'CognitiveSpeech', 'AudioConfig', 'SpeechConfig', 
+    'RecognitionResult', 'StartRecognition', 'StopRecognition',
+    'WebSocket', 'speech.', 'turn.', 'AudioInputStream',
+    'CSpx', 'ISpx', 'speechsdk'
+]
+
+# 增強搜索中判斷行是否與 SDK 相關的模式
+SDK_ACTIVITY_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in [
+        r'SPX_[A-Z_]+',
+        r'CognitiveSpeech',
+        r'speech\.[a-zA-Z]+',
+        r'turn\.[a-zA-Z]+',
+        r'RecognitionResult',
+        r'AudioConfig',
+        r'SpeechConfig',
+        r'WebSocket',
+        r'StartRecognition',
+        r'StopRecognition'
+    ]
+]
+
+# 批次分析時以時間桶（毫秒）將行分派到會話時間窗口
+SESSION_WINDOW_BUCKET_MS = 10000
+
+# 解析器版本：行索引或分析結果格式改變時需遞增，使舊的磁碟緩存失效
+PARSER_VERSION = '4'
+
+# 平行解析時每個分片的最小位元組數（太小的檔案分片反而更慢）
+PARALLEL_MIN_SHARD_BYTES = 4 * 1024 * 1024
+
+# 串流模式：子線程啟動事件名稱 → 線程摘要欄位
+STREAMING_THREAD_ROLES = {'Background': 'background_thread', 'User': 'user_thread'}
+
+# 串流模式：每處理多少行檢查一次閒置會話
+STREAMING_IDLE_CHECK_INTERVAL = 1024
+
+# 串流模式：行首的 SDK 物件地址（如 [0000026AA1CCE730]CSpxAudioPump::...），用於把工作線程綁定到會話
+STREAMING_OBJECT_ADDRESS_PATTERN = re.compile(r'\[((?:0x)?[0-9A-Fa-f]{8,16})\](CSpx\w+)')
+
+# 串流模式：會話開始前出現的 "Started thread" 事件最多保留筆數
+STREAMING_PENDING_THREADS = 1024
+
+# 追蹤模式：新行的時間戳落在既有會話結束後此範圍內時，該會話的分析需要重新計算
+# （與 analyze_all_sessions 擴展時間窗口的寬度相同）
+FOLLOW_SESSION_WINDOW_MS = 30000
+
+# 分位數草圖的相對誤差與最多桶數（超過時合併最小的桶，只影響最低的分位數）
+QUANTILE_SKETCH_ACCURACY = 0.01
+QUANTILE_SKETCH_MAX_BUCKETS = 2048
+
+# 指標序列摘要輸出的分位數
+SUMMARY_QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+# 分頁檢視日誌時每頁的預設及最大行數
+DEFAULT_LOG_PAGE_LINES = 500
+MAX_LOG_PAGE_LINES = 5000
+
+# 估算記憶體用量時每個分析結果（備忘錄項目、會話分析及摘要）的近似位元組數（巢狀字典不逐一計算）
+ANALYSIS_ENTRY_BYTES = 16 * 1024
+
+
+class QuantileSketch:
+    """
+    可合併的分位數草圖（對數分桶，與 DDSketch 相同的做法）
+    每個正值落在 ceil(log_gamma(x)) 桶中，估計值的相對誤差不超過 relative_accuracy；
+    桶數只與數值範圍的對數有關，與數值個數無關，兩個草圖相加桶計數即可合併
+    """
+    
+    def __init__(self, relative_accuracy: float = QUANTILE_SKETCH_ACCURACY,
+                 max_buckets: int = QUANTILE_SKETCH_MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.zero_count = 0  # 小於等於 0 的數值
+        self.count = 0
+    
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+    
+    def _collapse(self):
+        """把最小的兩個桶合併為一個，使桶數維持在上限內"""
+        lowest, second = sorted(self.buckets)[:2]
+        self.buckets[second] += self.buckets.pop(lowest)
+    
+    def merge(self, other: 'QuantileSketch'):
+        """合併另一個（相同精度的）草圖"""
+        if other.gamma != self.gamma:
+            raise ValueError('無法合併不同精度的分位數草圖')
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for key, bucket_count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + bucket_count
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """估計第 q 分位數（0 ≤ q ≤ 1），沒有數值時返回 None"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # 桶 (gamma^(k-1), gamma^k] 的代表值，相對誤差不超過 relative_accuracy
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class RunningStats:
+    """數值序列的累計統計（count/sum/min/max 及分位數草圖），記憶體用量與數值個數無關，可合併"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = QuantileSketch()
+    
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.sketch.add(value)
+    
+    def merge(self, other: 'RunningStats'):
+        """合併另一段序列的統計（如平行解析的各分片、多個會話）"""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+    
+    def mean(self, ndigits):
+        return round(self.total / self.count, ndigits)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """估計第 q 分位數（限制在實際的最小值與最大值之間）"""
+        estimate = self.sketch.quantile(q)
+        if estimate is None:
+            return None
+        return min(max(estimate, self.minimum), self.maximum)
+    
+    def summary(self) -> Dict[str, Any]:
+        """統計摘要：count/sum/min/max/mean 及 p50/p95/p99（分位數為相對誤差 1% 內的估計值）"""
+        summary = {
+            'count': self.count,
+            'sum': round(self.total, 2),
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.mean(2) if self.count else None
+        }
+        for name, q in SUMMARY_QUANTILES:
+            estimate = self.quantile(q)
+            summary[name] = round(estimate, 2) if estimate is not None else None
+        return summary
+
+
+class PerformanceMetricsAccumulator:
+    """
+    效能指標的增量累加器
+    逐行餵入會話日誌，隨時可取得與 LogParser._analyze_performance_metrics 相同格式的結果；
+    各數值序列只保存累計統計與分位數草圖（series_stats），記憶體用量與會話長度無關；
+    keep_series=True 時另外以緊湊陣列保留每個數值及其所在行的時間戳（圖表與明確要求的原始序列使用）
+    """
+    
+    # 原始數值序列的欄位名稱
+    SERIES_KEYS = ['upload_rates', 'recognition_latencies', 'queue_times',
+                   'unacknowledged_audio_durations', 'frame_durations']
+    
+    # 原始序列數值陣列的型別（上傳速率為浮點數，其餘為整數毫秒）
+    SERIES_TYPECODES = {'upload_rates': 'd'}
+    
+    def __init__(self, keep_series: bool = False):
+        self.keep_series = keep_series
+        self.websocket_messages = 0
+        self.audio_chunks = 0
+        self.websocket_connection_time = None
+        self.turn_start_latency = None
+        self.first_hypothesis_latency = None
+        self.first_recognition_service_latency = None  # 首個識別服務延遲
+        
+        self.stats = {key: RunningStats() for key in self.SERIES_KEYS}
+        # 欄位名稱 → (時間戳陣列, 數值陣列)，行沒有時間戳時記為 MISSING
+        self.series = {
+            key: (array('q'), array(self.SERIES_TYPECODES.get(key, 'q'))) for key in self.SERIES_KEYS
+        } if keep_series else None
+        
+        self._websocket_start_time = None
+    
+    def _record(self, key: str, value, line: str):
+        self.stats[key].add(value)
+        if self.keep_series:
+            timestamps, values = self.series[key]
+            timestamp_match = TIMESTAMP_SEARCH_PATTERN.search(line)
+            timestamps.append(int(timestamp_match.group(2)) if timestamp_match else MISSING)
+            values.append(value)
+    
+    def add_line(self, line: str):
+        """處理一行日誌"""
+        # 每個指標先以字面關鍵字（對應正則表達式的必要條件）分類，
+        # 命中時才執行該指標的擷取器，所有指標與延遲時間序列在同一次掃描中完成
+        patterns = LOG_PATTERNS
+        
+        # WebSocket 連接時間計算
+        if 'Start to open websocket' in line:
+            timestamp_match = TIMESTAMP_SEARCH_PATTERN.search(line)
+            if timestamp_match:
+                self._websocket_start_time = int(timestamp_match.group(2))
+        
+        if 'Opening websocket completed' in line or 'OnWebSocketOpened' in line:
+            timestamp_match = TIMESTAMP_SEARCH_PATTERN.search(line)
+            if timestamp_match:
+                websocket_opened_time = int(timestamp_match.group(2))
+                if self._websocket_start_time is not None:
+                    self.websocket_connection_time = websocket_opened_time - self._websocket_start_time
+        
+        # WebSocket 消息計數
+        if 'Web socket sending message' in line:
+            self.websocket_messages += 1
+            
+            # 提取隊列時間
+            queue_match = patterns['time_in_queue'].search(line)
+            if queue_match:
+                self._record('queue_times', int(queue_match.group(1)), line)
+        
+        # 音頻塊計數
+        if 'Received audio chunk:' in line:
+            self.audio_chunks += 1
+        
+        # 未確認音頻持續時間
+        if 'unacknowledgedAudioDuration' in line:
+            unack_match = patterns['unacknowledged_audio'].search(line)
+            if unack_match:
+                self._record('unacknowledged_audio_durations', int(unack_match.group(1)), line)
+        
+        # 音頻幀持續時間
+        if 'read frame duration:' in line:
+            frame_match = patterns['read_frame_duration'].search(line)
+            if frame_match:
+                self._record('frame_durations', int(frame_match.group(1)), line)
+        
+        # 上傳速率
+        if 'Web socket upload rate' in line:
+            upload_match = patterns['upload_rate'].search(line)
+            if upload_match:
+                self._record('upload_rates', float(upload_match.group(1)), line)
+        
+        if 'Response Message: path: ' in line:
+            # Turn Start 延遲
+            if self.turn_start_latency is None:
+                turn_start_match = patterns['turn_start_ts'].search(line)
+                if turn_start_match:
+                    self.turn_start_latency = int(turn_start_match.group(1))
+            
+            # 首個假設延遲
+            if self.first_hypothesis_latency is None:
+                first_hyp_match = patterns['first_hypothesis_ts'].search(line)
+                if first_hyp_match:
+                    self.first_hypothesis_latency = int(first_hyp_match.group(1))
+        
+        # 識別延遲 - 第一個作為首個識別服務延遲，同時建立延遲時間序列（用於繪圖）
+        if "name='RESULT-RecognitionLatencyMs'" in line:
+            latency_match = patterns['recognition_latency'].search(line)
+            if latency_match:
+                latency_value = int(latency_match.group(1))
+                if self.first_recognition_service_latency is None:
+                    self.first_recognition_service_latency = latency_value
+                self._record('recognition_latencies', latency_value, line)
+    
+    def result(self) -> Dict[str, Any]:
+        """取得目前的指標結果"""
+        metrics = {
+            'websocket_messages': self.websocket_messages,
+            'audio_chunks': self.audio_chunks,
+        }
+        metrics.update({
+            'websocket_connection_time': self.websocket_connection_time,
+            'turn_start_latency': self.turn_start_latency,
+            'first_hypothesis_latency': self.first_hypothesis_latency,
+            'first_recognition_service_latency': self.first_recognition_service_latency
+        })
+        
+        # 計算統計值
+        stats = self.stats
+        if stats['upload_rates'].count:
+            metrics['avg_upload_rate'] = stats['upload_rates'].mean(2)
+        
+        if stats['recognition_latencies'].count:
+            metrics['avg_recognition_latency'] = stats['recognition_latencies'].mean(0)
+            metrics['min_recognition_latency'] = stats['recognition_latencies'].minimum
+            metrics['max_recognition_latency'] = stats['recognition_latencies'].maximum
+        
+        if stats['queue_times'].count:
+            metrics['avg_queue_time'] = stats['queue_times'].mean(0)
+            metrics['max_queue_time'] = stats['queue_times'].maximum
+        
+        if stats['unacknowledged_audio_durations'].count:
+            metrics['max_unacknowledged_audio'] = stats['unacknowledged_audio_durations'].maximum
+        
+        if stats['frame_durations'].count:
+            metrics['min_frame_duration'] = stats['frame_durations'].minimum
+            metrics['max_frame_duration'] = stats['frame_durations'].maximum
+            metrics['avg_frame_duration'] = stats['frame_durations'].mean(0)
+        
+        # 各數值序列的統計摘要（取代原始序列）
+        metrics['series_stats'] = {key: stats[key].summary() for key in self.SERIES_KEYS if stats[key].count}
+        
+        return metrics
+    
+    @classmethod
+    def metric_paths(cls) -> List[str]:
+        """result() 中所有可能出現的指標路徑（巢狀指標以 . 分隔，如 series_stats.queue_times.p95），供驗證指標名稱"""
+        accumulator = cls()
+        for stats in accumulator.stats.values():
+            stats.add(0)
+        paths = []
+        pending = [('', accumulator.result())]
+        while pending:
+            prefix, metrics = pending.pop()
+            for key, value in metrics.items():
+                if isinstance(value, dict):
+                    pending.append((f"{prefix}{key}.", value))
+                else:
+                    paths.append(prefix + key)
+        return sorted(paths)
+    
+    def series_arrays(self) -> Dict[str, tuple]:
+        """各序列的 (時間戳陣列, 數值陣列)（僅 keep_series=True 時可用）"""
+        return self.series
+
+
 class LogParser:
     """統一的SDK日誌解析器類別"""
     
-    def __init__(self, filepath):
-        """初始化解析器"""
+    def __init__(self, filepath, workers: int = 1, cache=None, progress=None,
+                 prebuilt_index: tuple = None, content_digest: str = None,
+                 member: str = None, prebuilt_buffer: bytes = None, cache_key: str = None):
+        """
+        初始化解析器
+        workers > 1 時把檔案依行邊界切成多個位元組範圍，以多個子程序平行建立索引後依行順序合併，
+        結果與單程序解析完全相同；
+        提供 cache（ParseCache）時，內容相同的檔案直接載入先前保存的索引與會話分析結果；
+        提供 progress 時，解析期間定期以 (已處理位元組數, 新發現的會話摘要列表) 呼叫；
+        prebuilt_index 為已建立好的 (行偏移陣列, LineIndex)（如上傳時邊接收邊建立），
+        content_digest 為已知的檔案內容 SHA-256，兩者皆可省去重新讀取檔案；
+        gzip / zstd / zip 壓縮檔（zip 以 member 指定成員）邊解壓邊建立索引，解壓內容只保存在記憶體，
+        prebuilt_buffer 為已解壓的內容（搭配 prebuilt_index 使用）；
+        cache_key 為已知的磁碟緩存鍵（如 spill() 返回的重新載入記錄），省去計算內容雜湊
+        """
         self.filepath = filepath
-        self.lines = self._read_lines()
+        self.member = member
+        self.compression = detect_compression(filepath)
+        self._progress = progress
+        self._reported_sessions = 0
+        self._cache = cache
+        self._cache_key = None
+        self._session_analysis = None
+        
+        # 分析結果備忘錄：(分析名稱, 會話ID) → 結果，同一檔案的各個路由共用；
+        # 並行請求同一項分析時只計算一次
+        self._memo = {}
+        self._flight = SingleFlight()
+        
+        # 全文搜尋的詞彙索引（第一次搜尋時建立）
+        self._token_index = None
+        self._token_index_lock = threading.Lock()
+        
+        cached = None
+        if cache is not None:
+            self._cache_key = cache_key or cache.key_for(filepath, PARSER_VERSION, content_digest, member)
+            cached = cache.load(self._cache_key)
+        
+        # 單次掃描建立行索引（線程ID、時間戳、來源位置）及線程/會話倒排索引，供所有分析方法查詢
+        if cached is not None:
+            self.lines = self._read_lines(cached['offsets'])
+            self.line_index = cached['line_index']
+            self._session_analysis = cached['session_analysis']
+        elif prebuilt_index is not None:
+            self.lines = self._read_lines(prebuilt_index[0], prebuilt_buffer)
+            self.line_index = prebuilt_index[1]
+        elif self.compression is not None:
+            self.lines, self.line_index = self._build_index_decompressing()
+        elif workers > 1 and os.path.getsize(filepath) >= 2 * PARALLEL_MIN_SHARD_BYTES:
+            self.lines, self.line_index = self._build_index_parallel(workers)
+        else:
+            self.lines = self._read_lines()
+            self.line_index = LineIndex.build(self.lines, progress=self._report_progress if progress else None)
+        
+        if cache is not None and cached is None:
+            self._store_cache()
+        self._report_progress(self.line_index)
         
         # 基本模式
-        self.session_id_pattern = re.compile(r"SessionId:\s*([a-f0-9\-]{32,36})", re.IGNORECASE)
+        self.session_id_pattern = SESSION_ID_PATTERN
         
         # Azure Speech SDK 正則表達式模式
-        self.patterns = {
-            # 時間戳和線程ID模式 - Azure SDK 格式
-            'azure_timestamp': re.compile(r'\[(\d+)\]:\s*(\d+)ms\s+SPX_[A-Z_]+:\s*[\w_.]+:\d+\s+(.+)'),
-            
-            # 會話ID識別
-            'session_started': re.compile(r'Firing SessionStarted event: SessionId:\s*([a-f0-9\-]{32,36})', re.IGNORECASE),
-            'session_id_generic': re.compile(r'SessionId:\s*([a-f0-9\-]{32,36})', re.IGNORECASE),
-            
-            # AudioStreamSession 地址模式
-            'audio_stream_session': re.compile(r'\[((?:0x)?[A-F0-9]{8,16})\]CSpxAudioStreamSession', re.IGNORECASE),
-            
-            # 線程識別模式
-            'main_thread': re.compile(r'Started main thread with ID \[(\d+)ll\]'),
-            'thread_started': re.compile(r'Started thread (\w+) with ID \[(\d+)ll\]'),
-            'background_thread': re.compile(r'\[(.*?)\]'),
-            'user_thread': re.compile(r'Started thread User with ID \[(\d+)ll\]'),
-            'audiopump_thread': re.compile(r'AudioPump THREAD started!'),
-            
-            # 狀態變遷模式
-            'state_change': re.compile(r'TryChangeState: recoKind/sessionState: (\d+)/(\d+) => (\d+)/(\d+)'),
-            'adapter_state': re.compile(r'TryChangeState: audioState/uspState: (\d+)/(\d+) => (\d+)/(\d+)'),
-            
-            # WebSocket 連接和通信（簡化匹配）
-            'websocket_start': re.compile(r'Start to open websocket'),
-            'websocket_opened': re.compile(r'Opening websocket completed|OnWebSocketOpened'),
-            'websocket_closed': re.compile(r'OnWebSocketClosed'),
-            'websocket_send': re.compile(r'Web socket sending message'),
-            'websocket_send_complete': re.compile(r'Web socket send message completed'),
-            'websocket_message_received': re.compile(r'USP message received'),
-            
-            # 音頻處理相關（簡化匹配）
-            'write_buffer': re.compile(r'WriteBuffer:'),
-            'audio_chunk_received': re.compile(r'Received audio chunk:'),
-            'read_frame_duration': re.compile(r'read frame duration:\s*(\d+)\s*ms'),
-            'audio_pump_read': re.compile(r'Read: totalBytesRead=(\d+)'),
-            'audio_end_detected': re.compile(r'Read: End of stream detected|read ZERO \(0\) bytes'),
-            
-            # 效能指標詳細提取
-            'unacknowledged_audio': re.compile(r'unacknowledgedAudioDuration\s*=\s*(\d+)\s*msec'),
-            'upload_rate': re.compile(r'Web socket upload rate.*?(\d+\.?\d*)\s*KB/s'),
-            'recognition_latency': re.compile(r"name='RESULT-RecognitionLatencyMs';\s*value='(\d+)'"),
-            'time_in_queue': re.compile(r'TimeInQueue:\s*(\d+)ms'),
-            'turn_start_ts': re.compile(r'TS:(\d+)\s+Response Message: path: turn\.start'),
-            'first_hypothesis_ts': re.compile(r'TS:(\d+)\s+Response Message: path: speech\.hypothesis'),
-            
-            # 語音識別事件
-            'turn_start': re.compile(r'path:\s*turn\.start'),
-            'turn_end': re.compile(r'path:\s*turn\.end'),
-            'speech_start_detected': re.compile(r'path:\s*speech\.startDetected'),
-            'speech_end_detected': re.compile(r'path:\s*speech\.endDetected'),
-            'speech_hypothesis': re.compile(r'path:\s*speech\.hypothesis|Response:\s*Speech\.Hypothesis\s+message', re.IGNORECASE),
-            'speech_phrase': re.compile(r'path:\s*speech\.phrase|Response:\s*Speech\.Phrase\s+message', re.IGNORECASE),
-            
-            # 文本提取（簡化為更可靠的模式）
-            'recognition_text': re.compile(r'Text:\s+(.+?)(?:\s*$)', re.IGNORECASE),
-            'recognition_status': re.compile(r'RecognitionStatus:\s*(\w+)'),
-            'confidence_score': re.compile(r'Confidence:\s*(\d+\.?\d*)'),
-            'duration_info': re.compile(r'Duration:\s*(\d+)'),
-            'offset_info': re.compile(r'Offset:\s*(\d+)'),
-            
-            # 應用程式控制
-            'start_recognition': re.compile(r'StartRecognitionAsync'),
-            'stop_recognition': re.compile(r'StopRecognitionAsync'),
-            
-            # 錯誤和異常
-            'error_message': re.compile(r'ERROR|EXCEPTION|Failed|Error'),
-        }
+        self.patterns = LOG_PATTERNS
 
-    def _read_lines(self):
-        """讀取檔案內容"""
+    def _read_lines(self, offsets: array = None, buffer: bytes = None):
+        """
+        以記憶體映射開啟檔案（僅保存行偏移，逐行按需解碼）
+        壓縮檔則解壓到記憶體中；已提供解壓後內容時直接使用
+        """
+        if buffer is not None:
+            return MappedLines(buffer, offsets if offsets is not None else MappedLines.scan_offsets(buffer))
         try:
-            with open(self.filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.readlines()
+            if self.compression is not None:
+                with open_log_stream(self.filepath, self.member) as stream:
+                    return MappedLines.from_stream(stream, offsets)
+            return MappedLines.open(self.filepath, offsets)
+        except Exception as e:
+            raise Exception(f"無法讀取檔案 {self.filepath}: {str(e)}")
+    
+    def _build_index_decompressing(self) -> tuple:
+        """串流解壓壓縮檔，解壓出的區塊直接送入索引（單次解壓，不寫出解壓後的檔案）"""
+        indexer = IncrementalLineIndexer(keep_buffer=True)
+        try:
+            with open_log_stream(self.filepath, self.member) as stream:
+                while True:
+                    chunk = stream.read(DECOMPRESS_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    indexer.feed(chunk)
+                    self._report_progress(indexer.index, indexer.position)
         except Exception as e:
             raise Exception(f"無法讀取檔案 {self.filepath}: {str(e)}")
+        offsets, line_index = indexer.finish()
+        return MappedLines(indexer.buffer(), offsets), line_index
+    
+    def _build_index_parallel(self, workers: int) -> tuple:
+        """以多個子程序分別索引檔案的各個位元組範圍，再依行順序合併"""
+        shard_count = min(workers, max(1, os.path.getsize(self.filepath) // PARALLEL_MIN_SHARD_BYTES))
+        with open(self.filepath, 'rb') as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                ranges = split_line_ranges(buffer, shard_count)
+        
+        # 只在平行解析時匯入（multiprocessing 的匯入成本較高，網頁服務與串流模式不需要）
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(index_file_range, self.filepath, start, end) for start, end in ranges]
+            shards = [future.result() for future in futures]
+        
+        # 各分片的偏移陣列首尾相接（去掉與下一分片起點重複的結尾位置）
+        offsets = array('Q')
+        for shard_offsets, shard_index in shards:
+            offsets.extend(shard_offsets[:-1])
+        offsets.append(shards[-1][0][-1])
+        
+        return self._read_lines(offsets), LineIndex.merge([shard_index for shard_offsets, shard_index in shards])
+    
+    def _report_progress(self, line_index: LineIndex, bytes_processed: int = None):
+        """回報目前的解析進度及上次回報之後新發現的會話"""
+        if self._progress is None:
+            return
+        if bytes_processed is None:
+            lines_done = len(line_index)
+            bytes_processed = self.lines.offsets[lines_done] if lines_done < len(self.lines.offsets) else self.lines.size
+        new_sessions = [
+            self._session_summary(session_id, line_num)
+            for session_id, line_num in islice(line_index.session_starts.items(), self._reported_sessions, None)
+        ]
+        self._reported_sessions += len(new_sessions)
+        self._progress(bytes_processed, new_sessions)
+    
+    def _store_cache(self):
+        """把行偏移、行索引及已完成的會話分析寫入磁碟緩存"""
+        if self._cache is None:
+            return
+        self._cache.store(self._cache_key, {
+            'offsets': self.lines.offsets,
+            'line_index': self.line_index,
+            'session_analysis': self._session_analysis
+        })
+    
+    def _memoized(self, name: str, session_id: Optional[str], compute):
+        """返回備忘錄中的結果，不存在時計算並保存（其他線程正在計算同一項時等待其結果）"""
+        key = (name, session_id)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        
+        def compute_once():
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+        return self._flight.do(key, compute_once)
+    
+    def invalidate_memo(self, session_id: str = None):
+        """
+        清除備忘錄中的分析結果
+        指定 session_id 時只清除該會話的結果（以及全檔案層級的結果），否則全部清除
+        """
+        if session_id is None:
+            self._memo.clear()
+            self._session_analysis = None
+            return
+        for key in [key for key in self._memo if key[1] in (session_id, None)]:
+            del self._memo[key]
+        if self._session_analysis is not None:
+            self._session_analysis.pop(session_id, None)
+    
+    def close(self):
+        """釋放檔案映射（之後不可再使用此解析器）"""
+        self.lines.close()
+    
+    def memory_size(self) -> int:
+        """近似常駐位元組數（行偏移、行索引、詞彙索引及分析結果，不含映射的檔案內容），供記憶體緩存依預算淘汰"""
+        size = self.lines.memory_size() + self.line_index.memory_size()
+        if self._token_index is not None:
+            size += self._token_index.memory_size()
+        analysis_entries = len(self._memo) + len(self._session_analysis or ())
+        return size + analysis_entries * ANALYSIS_ENTRY_BYTES
+    
+    def spill(self) -> Optional[Dict[str, Any]]:
+        """
+        確保行偏移、行索引及會話分析已寫入磁碟緩存，返回之後從緩存重新建立解析器的記錄
+        （只含可序列化為 JSON 的資料，由 parser_from_record() 重新建立）；沒有磁碟緩存時返回 None
+        """
+        if self._cache is None:
+            return None
+        if not self._cache.contains(self._cache_key):
+            self._store_cache()
+        return {'kind': 'log', 'filepath': self.filepath, 'member': self.member, 'cache_key': self._cache_key}
+    
+    def _marker_lines(self, lines, *marker_names):
+        """依行號順序產生包含指定關鍵事件的 (1-based 行號, 行內容)"""
+        line_nums = set()
+        for name in marker_names:
+            line_nums.update(self.line_index.lines_with_marker(name))
+        for i in sorted(line_nums):
+            yield i + 1, lines[i]
 
     def get_sessions_summary(self):
         """獲取會話摘要列表"""
-        sessions = {}
-        for i, line in enumerate(self.lines):
-            match = self.session_id_pattern.search(line)
-            if match:
-                session_id = match.group(1)
-                if session_id not in sessions:
-                    sessions[session_id] = {
-                        'session_id': session_id,
-                        'start_line': i + 1,  # 1-based line number
-                        'has_detailed_analysis': True
-                    }
-        
-        return list(sessions.values())
+        return [
+            self._session_summary(session_id, line_index)
+            for session_id, line_index in self.line_index.session_starts.items()
+        ]
+    
+    @staticmethod
+    def _session_summary(session_id: str, line_index: int) -> Dict[str, Any]:
+        return {
+            'session_id': session_id,
+            'start_line': line_index + 1,  # 1-based line number
+            'has_detailed_analysis': True
+        }
+    
+    def _session_line_numbers(self, session_id: str) -> List[int]:
+        """獲取包含會話ID的所有行號（0-based，遞增）"""
+        postings = self.line_index.lines_for_guid(session_id)
+        if postings is not None:
+            return postings
+        # 非 GUID 格式的識別碼不在倒排索引中，回退到逐行搜索
+        return [i for i, line in enumerate(self.lines) if session_id in line]
 
     def get_session_details(self, session_id: str) -> Dict[str, Any]:
         """獲取特定會話的詳細信息"""
+        if self._session_analysis is not None and session_id in self._session_analysis:
+            return self._session_analysis[session_id]
+        return self._memoized('session_details', session_id, lambda: self._analyze_session_details(session_id))
+
+    def _analyze_session_details(self, session_id: str) -> Dict[str, Any]:
+        """分析特定會話的詳細信息（未經備忘錄）"""
         try:
             # 使用完整的會話日誌內容（包括所有相關線程）
-            full_session_log = self.get_session_log_content(session_id)
-            
-            # 將日誌內容轉換為 (line_num, line) 格式
-            session_lines = []
-            for i, line in enumerate(full_session_log.split('\n'), 1):
-                if line.strip():
-                    session_lines.append((i, line.strip()))
-            
-            if not session_lines:
-                return {'error': f'找不到會話 {session_id} 的詳細信息'}
-            
-            # print(f"[DEBUG] Extracted {len(session_lines)} lines for session {session_id}")
-            
-            # 分析會話詳細信息
-            perf_metrics = self._analyze_performance_metrics(session_lines)
-            
-            # 調試日誌：打印提取的指標（已註解，減少終端輸出）
-            # print(f"[DEBUG] Session {session_id} metrics:")
-            # print(f"  - websocket_messages: {perf_metrics.get('websocket_messages', 'N/A')}")
-            # print(f"  - audio_chunks: {perf_metrics.get('audio_chunks', 'N/A')}")
-            # print(f"  - websocket_connection_time: {perf_metrics.get('websocket_connection_time', 'N/A')}")
-            # print(f"  - turn_start_latency: {perf_metrics.get('turn_start_latency', 'N/A')}")
-            # print(f"  - first_hypothesis_latency: {perf_metrics.get('first_hypothesis_latency', 'N/A')}")
-            # print(f"  - max_unacknowledged_audio: {perf_metrics.get('max_unacknowledged_audio', 'N/A')}")
-            
-            # 使用簡單方式獲取基本資訊（從包含 SessionId 的行）
-            simple_session_lines = self._extract_session_lines(session_id)
-            
-            # 提取識別配置信息
-            recognition_config = self._extract_recognition_config(session_lines)
-            
-            details = {
-                'session_id': session_id,
-                'basic_info': self._analyze_basic_info(simple_session_lines) if simple_session_lines else {},
-                'recognition_config': recognition_config,  # 新增：識別配置
-                'performance_metrics': perf_metrics,
-                'recognition_results': self._analyze_recognition_results(session_lines),
-                'error_analysis': self._analyze_errors(session_lines),
-                'timeline': self._build_timeline(session_lines)
-            }
-            
-            return details
+            return self._build_session_details(session_id, self._session_content_line_nums(session_id))
         except Exception as e:
-            print(f"[ERROR] Failed to analyze session details: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {'error': f'分析會話詳細信息時發生錯誤: {str(e)}'}
+            return self._session_details_error(e)
+
+    def analyze_all_sessions(self) -> Dict[str, Dict[str, Any]]:
+        """
+        批次分析檔案中的所有會話，返回 會話ID → 詳細信息（與 get_session_details 相同格式）
+        線程分析只做一次，並以線性掃描將每一行分派到各會話的時間窗口，
+        避免逐一呼叫 get_session_details 時對每個會話重複掃描整個檔案；
+        結果會保存下來（啟用磁碟緩存時一併寫入緩存）；並行呼叫時只分析一次
+        """
+        session_analysis = self._session_analysis
+        if session_analysis is not None:
+            return session_analysis
+        return self._flight.do(('all_sessions', None), self._analyze_all_sessions)
+    
+    def completed_session_analysis(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """已完成的批次會話分析（由磁碟緩存載入或先前執行過 analyze_all_sessions），尚未分析時返回 None（不觸發分析）"""
+        return self._session_analysis
+    
+    def _analyze_all_sessions(self) -> Dict[str, Dict[str, Any]]:
+        if self._session_analysis is not None:
+            return self._session_analysis
+        
+        session_ids = self.line_index.session_ids()
+        thread_ids = self.line_index.thread_ids
+        thread_analysis = self.intelligent_thread_analysis()
+        time_ranges = {sid: self._get_session_time_range(sid) for sid in session_ids}
+        
+        # 步驟1: 一次掃描統計所有會話擴展時間窗口內的線程活動
+        extended_windows = {
+            sid: (start_time - 30000, end_time + 30000)
+            for sid, (start_time, end_time) in time_ranges.items() if start_time is not None
+        }
+        thread_activity = {sid: {} for sid in extended_windows}
+        for i, session_candidates in self._route_lines_to_windows(extended_windows):
+            if self._has_sdk_keyword(self.lines[i]):
+                thread_code = thread_ids[i]
+                for sid in session_candidates:
+                    activity = thread_activity[sid]
+                    activity[thread_code] = activity.get(thread_code, 0) + 1
+        
+        # 步驟2: 由倒排索引收集各會話的日誌行，行數不足的會話改用增強搜索
+        content_line_nums = {}
+        fallback_sessions = []
+        for sid in session_ids:
+            try:
+                if 'error' in thread_analysis:
+                    fallback_sessions.append(sid)
+                    continue
+                related_thread_ids = self._related_thread_ids(self._thread_summary_for(thread_analysis, sid))
+                related_thread_ids.update(self._active_threads(thread_activity.get(sid, {})))
+                line_nums = self._collect_session_line_nums(sid, related_thread_ids, *time_ranges[sid])
+                if line_nums is None:
+                    fallback_sessions.append(sid)
+                else:
+                    content_line_nums[sid] = line_nums
+            except Exception:
+                fallback_sessions.append(sid)
+        
+        # 步驟3: 一次掃描完成所有回退會話的增強搜索
+        scopes = {sid: self._enhanced_session_scope(sid) for sid in fallback_sessions}
+        enhanced_windows = {sid: scope[1] for sid, scope in scopes.items() if scope[1] is not None}
+        session_line_sets = {sid: set(scopes[sid][0]) for sid in enhanced_windows}
+        additional_line_nums = {sid: [] for sid in enhanced_windows}
+        for i, session_candidates in self._route_lines_to_windows(enhanced_windows):
+            sdk_related = None
+            for sid in session_candidates:
+                if i in session_line_sets[sid]:
+                    continue
+                if thread_ids[i] in scopes[sid][2]:
+                    additional_line_nums[sid].append(i)
+                    continue
+                if sdk_related is None:
+                    sdk_related = self._has_sdk_pattern(self.lines[i])
+                if sdk_related:
+                    additional_line_nums[sid].append(i)
+        
+        for sid in fallback_sessions:
+            session_line_nums, window, _ = scopes[sid]
+            if window is None:
+                content_line_nums[sid] = session_line_nums
+            else:
+                content_line_nums[sid] = self._merge_enhanced_line_nums(session_line_nums, additional_line_nums[sid])
+        
+        # 步驟4: 各會話的指標、識別結果、錯誤與時間線
+        all_details = {}
+        for sid in session_ids:
+            try:
+                all_details[sid] = self._build_session_details(sid, content_line_nums[sid])
+            except Exception as e:
+                all_details[sid] = self._session_details_error(e)
+        
+        self._session_analysis = all_details
+        self._store_cache()
+        return all_details
+
+    def _build_session_details(self, session_id: str, line_nums: List[int]) -> Dict[str, Any]:
+        """由會話日誌行號建立詳細信息"""
+        # 將日誌內容轉換為 (line_num, line) 格式，行號為會話日誌中的位置
+        session_lines = []
+        for i, line_index in enumerate(line_nums, 1):
+            line = self.lines[line_index].strip()
+            if line:
+                session_lines.append((i, line))
+        
+        return self._details_from_session_lines(session_id, session_lines, self._extract_session_lines(session_id))
+
+    def _details_from_session_lines(self, session_id: str, session_lines: List[tuple],
+                                    simple_session_lines: List[tuple]) -> Dict[str, Any]:
+        """由會話日誌的 (行號, 行內容) 及包含會話ID的行建立詳細信息"""
+        if not session_lines:
+            return {'error': f'找不到會話 {session_id} 的詳細信息'}
+        
+        # print(f"[DEBUG] Extracted {len(session_lines)} lines for session {session_id}")
+        
+        # 分析會話詳細信息
+        perf_metrics = self._analyze_performance_metrics(session_lines)
+        
+        # 調試日誌：打印提取的指標（已註解，減少終端輸出）
+        # print(f"[DEBUG] Session {session_id} metrics:")
+        # print(f"  - websocket_messages: {perf_metrics.get('websocket_messages', 'N/A')}")
+        # print(f"  - audio_chunks: {perf_metrics.get('audio_chunks', 'N/A')}")
+        # print(f"  - websocket_connection_time: {perf_metrics.get('websocket_connection_time', 'N/A')}")
+        # print(f"  - turn_start_latency: {perf_metrics.get('turn_start_latency', 'N/A')}")
+        # print(f"  - first_hypothesis_latency: {perf_metrics.get('first_hypothesis_latency', 'N/A')}")
+        # print(f"  - max_unacknowledged_audio: {perf_metrics.get('max_unacknowledged_audio', 'N/A')}")
+        
+        # 提取識別配置信息
+        recognition_config = self._extract_recognition_config(session_lines)
+        
+        details = {
+            'session_id': session_id,
+            'basic_info': self._analyze_basic_info(simple_session_lines) if simple_session_lines else {},
+            'recognition_config': recognition_config,  # 新增：識別配置
+            'performance_metrics': perf_metrics,
+            'recognition_results': self._analyze_recognition_results(session_lines),
+            'error_analysis': self._analyze_errors(session_lines),
+            'timeline': self._build_timeline(session_lines)
+        }
+        
+        return details
+
+    def _session_details_error(self, error: Exception) -> Dict[str, Any]:
+        """記錄並返回會話分析錯誤"""
+        print(f"[ERROR] Failed to analyze session details: {str(error)}")
+        import traceback
+        traceback.print_exc()
+        return {'error': f'分析會話詳細信息時發生錯誤: {str(error)}'}
 
     def intelligent_thread_analysis(self, session_id: str = None) -> Dict[str, Any]:
         """
         智能線程分析 - 精確鎖定會話並識別所有相關線程
+        結果依會話保存在備忘錄中，會話詳情、線程分析及線程下載等路由共用同一份結果
         """
+        return self._memoized('thread_analysis', session_id, lambda: self._analyze_threads(session_id))
+
+    def _analyze_threads(self, session_id: str = None) -> Dict[str, Any]:
+        """執行智能線程分析（未經備忘錄）"""
         try:
-            log_content = '\n'.join(self.lines)
             lines = self.lines
             results = {}
             
@@ -209,11 +990,7 @@ class LogParser:
 
     def _extract_session_lines(self, session_id: str) -> List[tuple]:
         """提取特定會話的所有相關行"""
-        session_lines = []
-        for i, line in enumerate(self.lines):
-            if session_id in line:
-                session_lines.append((i + 1, line.strip()))
-        return session_lines
+        return [(i + 1, self.lines[i].strip()) for i in self._session_line_numbers(session_id)]
 
     def _analyze_basic_info(self, session_lines: List[tuple]) -> Dict[str, Any]:
         """分析基本會話信息"""
@@ -223,7 +1000,7 @@ class LogParser:
         
         # 從行中提取 session_id
         for line_num, line in session_lines:
-            match = self.session_id_pattern.search(line)
+            match = search_session_id(line)
             if match:
                 info['session_id'] = match.group(1)
                 break
@@ -238,228 +1015,62 @@ class LogParser:
             'system': {}
         }
         
-        # 配置提取模式
-        config_patterns = {
-            # 音頻設置
-            'sample_rate': re.compile(r"name='AudioConfig_SampleRateForCapture';\s*value='(\d+)'"),
-            'bits_per_sample': re.compile(r"name='AudioConfig_BitsPerSampleForCapture';\s*value='(\d+)'"),
-            'channels': re.compile(r"name='AudioConfig_NumberOfChannelsForCapture';\s*value='(\d+)'"),
-            
-            # 識別設置
-            'reco_mode': re.compile(r"name='SPEECH-RecoMode';\s*value='(\w+)'"),
-            'reco_language': re.compile(r"name='SPEECH-RecoLanguage';\s*value='([^']+)'"),
-            'auto_detect_languages': re.compile(r"name='Auto-Detect-Source-Languages';\s*value='([^']+)'"),
-            'language_id_mode': re.compile(r"name='SPEECH-LanguageIdMode';\s*value='(\w+)'"),
-            'segmentation_timeout': re.compile(r"name='SPEECH-SegmentationSilenceTimeoutMs';\s*value='(\d+)'"),
-            
-            # 系統設置
-            'buffer_size': re.compile(r"name='SPEECH-MaxBufferSizeMs';\s*value='(\d+)'"),
-            'region': re.compile(r"name='SPEECH-Region';\s*value='([^']+)'"),
-            'connection_url': re.compile(r"name='SPEECH-ConnectionUrl';\s*value='([^']+)'"),
-            'user_agent': re.compile(r"name='HttpHeader#User-agent';\s*value='([^']+)'"),
-        }
-        
         # 提取配置值
         for line_num, line in session_lines:
-            # 音頻設置
-            if 'sample_rate' not in config['audio']:
-                match = config_patterns['sample_rate'].search(line)
-                if match:
-                    config['audio']['sample_rate'] = match.group(1)
-            
-            if 'bits_per_sample' not in config['audio']:
-                match = config_patterns['bits_per_sample'].search(line)
-                if match:
-                    config['audio']['bits_per_sample'] = match.group(1)
-            
-            if 'channels' not in config['audio']:
-                match = config_patterns['channels'].search(line)
-                if match:
-                    config['audio']['channels'] = match.group(1)
-            
-            # 識別設置
-            if 'mode' not in config['recognition']:
-                match = config_patterns['reco_mode'].search(line)
-                if match:
-                    config['recognition']['mode'] = match.group(1)
-            
-            if 'language' not in config['recognition']:
-                match = config_patterns['reco_language'].search(line)
-                if match:
-                    config['recognition']['language'] = match.group(1)
-            
-            if 'auto_detect_languages' not in config['recognition']:
-                match = config_patterns['auto_detect_languages'].search(line)
-                if match:
-                    config['recognition']['auto_detect_languages'] = match.group(1)
-            
-            if 'language_id_mode' not in config['recognition']:
-                match = config_patterns['language_id_mode'].search(line)
-                if match:
-                    config['recognition']['language_id_mode'] = match.group(1)
-            
-            if 'segmentation_timeout' not in config['recognition']:
-                match = config_patterns['segmentation_timeout'].search(line)
-                if match:
-                    config['recognition']['segmentation_timeout'] = match.group(1)
-            
-            # 系統設置
-            if 'buffer_size' not in config['system']:
-                match = config_patterns['buffer_size'].search(line)
-                if match:
-                    config['system']['buffer_size'] = match.group(1)
-            
-            if 'region' not in config['system']:
-                match = config_patterns['region'].search(line)
-                if match:
-                    config['system']['region'] = match.group(1)
-            
-            if 'connection_url' not in config['system']:
-                match = config_patterns['connection_url'].search(line)
-                if match:
-                    config['system']['connection_url'] = match.group(1)
-            
-            if 'user_agent' not in config['system']:
-                match = config_patterns['user_agent'].search(line)
-                if match:
-                    config['system']['user_agent'] = match.group(1)
-        
+            update_recognition_config(config, line)
+
         return config
 
     def _analyze_performance_metrics(self, session_lines: List[tuple]) -> Dict[str, Any]:
         """分析效能指標（增強版）"""
-        metrics = {
-            'websocket_messages': 0,
-            'audio_chunks': 0,
-            'upload_rates': [],
-            'recognition_latencies': [],
-            'queue_times': [],
-            'unacknowledged_audio_durations': [],
-            'frame_durations': [],
-            'websocket_connection_time': None,
-            'turn_start_latency': None,
-            'first_hypothesis_latency': None,
-            'first_recognition_service_latency': None  # 新增：首個識別服務延遲
-        }
-        
-        websocket_start_time = None
-        websocket_opened_time = None
-        first_recognition_latency_found = False  # 標記是否已找到第一個識別延遲
-        
+        accumulator = PerformanceMetricsAccumulator()
         for line_num, line in session_lines:
-            # WebSocket 連接時間計算
-            if self.patterns['websocket_start'].search(line):
-                timestamp_match = re.search(r'\[(\d+)\]:\s*(\d+)ms', line)
-                if timestamp_match:
-                    websocket_start_time = int(timestamp_match.group(2))
-            
-            if self.patterns['websocket_opened'].search(line):
-                timestamp_match = re.search(r'\[(\d+)\]:\s*(\d+)ms', line)
-                if timestamp_match:
-                    websocket_opened_time = int(timestamp_match.group(2))
-                    if websocket_start_time is not None:
-                        metrics['websocket_connection_time'] = websocket_opened_time - websocket_start_time
-            
-            # WebSocket 消息計數
-            if self.patterns['websocket_send'].search(line):
-                metrics['websocket_messages'] += 1
-                
-                # 提取隊列時間
-                queue_match = self.patterns['time_in_queue'].search(line)
-                if queue_match:
-                    metrics['queue_times'].append(int(queue_match.group(1)))
-            
-            # 音頻塊計數
-            if self.patterns['audio_chunk_received'].search(line):
-                metrics['audio_chunks'] += 1
-            
-            # 未確認音頻持續時間
-            unack_match = self.patterns['unacknowledged_audio'].search(line)
-            if unack_match:
-                metrics['unacknowledged_audio_durations'].append(int(unack_match.group(1)))
-            
-            # 音頻幀持續時間
-            frame_match = self.patterns['read_frame_duration'].search(line)
-            if frame_match:
-                metrics['frame_durations'].append(int(frame_match.group(1)))
-            
-            # 上傳速率
-            upload_match = self.patterns['upload_rate'].search(line)
-            if upload_match:
-                metrics['upload_rates'].append(float(upload_match.group(1)))
-            
-            # Turn Start 延遲
-            if metrics['turn_start_latency'] is None:
-                turn_start_match = self.patterns['turn_start_ts'].search(line)
-                if turn_start_match:
-                    metrics['turn_start_latency'] = int(turn_start_match.group(1))
-            
-            # 首個假設延遲
-            if metrics['first_hypothesis_latency'] is None:
-                first_hyp_match = self.patterns['first_hypothesis_ts'].search(line)
-                if first_hyp_match:
-                    metrics['first_hypothesis_latency'] = int(first_hyp_match.group(1))
-            
-            # 識別延遲 - 提取第一個作為首個識別服務延遲
-            latency_match = self.patterns['recognition_latency'].search(line)
-            if latency_match:
-                latency_value = int(latency_match.group(1))
-                metrics['recognition_latencies'].append(latency_value)
-                # 只記錄第一個識別延遲作為服務延遲
-                if not first_recognition_latency_found:
-                    metrics['first_recognition_service_latency'] = latency_value
-                    first_recognition_latency_found = True
-        
-        # 計算統計值
-        if metrics['upload_rates']:
-            metrics['avg_upload_rate'] = round(sum(metrics['upload_rates']) / len(metrics['upload_rates']), 2)
-        
-        if metrics['recognition_latencies']:
-            metrics['avg_recognition_latency'] = round(sum(metrics['recognition_latencies']) / len(metrics['recognition_latencies']), 0)
-            metrics['min_recognition_latency'] = min(metrics['recognition_latencies'])
-            metrics['max_recognition_latency'] = max(metrics['recognition_latencies'])
-            
-            # 新增：建立延遲時間序列（用於繪圖）
-            metrics['latency_timeline'] = []
-            latency_index = 0
-            for line_num, line in session_lines:
-                latency_match = self.patterns['recognition_latency'].search(line)
-                if latency_match:
-                    latency_value = int(latency_match.group(1))
-                    # 提取時間戳
-                    timestamp_match = re.search(r'\[(\d+)\]:\s*(\d+)ms', line)
-                    timestamp = int(timestamp_match.group(2)) if timestamp_match else None
-                    
-                    metrics['latency_timeline'].append({
-                        'index': latency_index,
-                        'timestamp': timestamp,
-                        'latency': latency_value
-                    })
-                    latency_index += 1
-        
-        if metrics['queue_times']:
-            metrics['avg_queue_time'] = round(sum(metrics['queue_times']) / len(metrics['queue_times']), 0)
-            metrics['max_queue_time'] = max(metrics['queue_times'])
-        
-        if metrics['unacknowledged_audio_durations']:
-            metrics['max_unacknowledged_audio'] = max(metrics['unacknowledged_audio_durations'])
-        
-        if metrics['frame_durations']:
-            metrics['min_frame_duration'] = min(metrics['frame_durations'])
-            metrics['max_frame_duration'] = max(metrics['frame_durations'])
-            metrics['avg_frame_duration'] = round(sum(metrics['frame_durations']) / len(metrics['frame_durations']), 0)
-        
-        return metrics
+            accumulator.add_line(line)
+        return accumulator.result()
+    
+    def get_session_series_arrays(self, session_id: str) -> Dict[str, Any]:
+        """
+        會話各效能指標的 (時間戳陣列, 數值陣列)，供圖表降採樣使用
+        第一次要求時由會話日誌計算，以緊湊陣列保存在備忘錄中（會話詳情只包含統計摘要）
+        """
+        return self._memoized('metric_series', session_id, lambda: self._compute_series_arrays(session_id))
+    
+    def _compute_series_arrays(self, session_id: str) -> Dict[str, Any]:
+        accumulator = PerformanceMetricsAccumulator(keep_series=True)
+        found = False
+        for line in self._session_content_lines(session_id):
+            line = line.strip()
+            if line:
+                accumulator.add_line(line)
+                found = True
+        if not found:
+            return {'error': f'找不到會話 {session_id} 的詳細信息'}
+        return accumulator.series_arrays()
+    
+    def get_session_metric_series(self, session_id: str) -> Dict[str, Any]:
+        """會話各效能指標的完整原始序列及識別延遲時間線（只在明確要求時使用）"""
+        arrays = self.get_session_series_arrays(session_id)
+        if 'error' in arrays:
+            return arrays
+        series = {key: list(values) for key, (timestamps, values) in arrays.items()}
+        latency_timestamps, latencies = arrays['recognition_latencies']
+        series['latency_timeline'] = [
+            {'index': i, 'timestamp': timestamp if timestamp != MISSING else None, 'latency': latency}
+            for i, (timestamp, latency) in enumerate(zip(latency_timestamps, latencies))
+        ]
+        return series
 
     def _analyze_recognition_results(self, session_lines: List[tuple]) -> List[Dict[str, Any]]:
         """分析語音識別結果"""
         results = []
         
         for line_num, line in session_lines:
-            # 檢查是否為語音識別結果
-            if self.patterns['speech_phrase'].search(line) or self.patterns['speech_hypothesis'].search(line):
+            # 檢查是否為語音識別結果（三個模式都忽略大小寫，共用同一個小寫行預篩）
+            lowered = line.lower()
+            if (search_log_pattern('speech_phrase', line, lowered)
+                    or search_log_pattern('speech_hypothesis', line, lowered)):
                 # 提取文本 - 只有當行中包含 Text: 時才處理
-                text_match = self.patterns['recognition_text'].search(line)
+                text_match = search_log_pattern('recognition_text', line, lowered)
                 if not text_match:
                     # 如果沒有文本，跳過這一行
                     continue
@@ -495,7 +1106,7 @@ class LogParser:
         errors = []
         
         for line_num, line in session_lines:
-            if self.patterns['error_message'].search(line):
+            if search_log_pattern('error_message', line):
                 errors.append({
                     'line_number': line_num,
                     'message': line[:200] + '...' if len(line) > 200 else line
@@ -507,23 +1118,23 @@ class LogParser:
         """建構會話時間線"""
         timeline = []
         
-        # 關鍵事件模式
+        # 關鍵事件 → LOG_PATTERNS 名稱
         key_events = {
-            'session_start': self.patterns['session_started'],
-            'websocket_open': self.patterns['websocket_opened'],
-            'speech_start': self.patterns['speech_start_detected'],
-            'speech_end': self.patterns['speech_end_detected'],
-            'turn_start': self.patterns['turn_start'],
-            'turn_end': self.patterns['turn_end'],
-            'websocket_close': self.patterns['websocket_closed']
+            'session_start': 'session_started',
+            'websocket_open': 'websocket_opened',
+            'speech_start': 'speech_start_detected',
+            'speech_end': 'speech_end_detected',
+            'turn_start': 'turn_start',
+            'turn_end': 'turn_end',
+            'websocket_close': 'websocket_closed'
         }
         
         for line_num, line in session_lines:
-            timestamp_match = re.search(r'\[(\d+)\]:\s*(\d+)ms', line)
-            timestamp = int(timestamp_match.group(2)) if timestamp_match else None
-            
-            for event_type, pattern in key_events.items():
-                if pattern.search(line):
+            for event_type, pattern_name in key_events.items():
+                if search_log_pattern(pattern_name, line):
+                    # 只有關鍵事件行才需要時間戳
+                    timestamp_match = TIMESTAMP_SEARCH_PATTERN.search(line)
+                    timestamp = int(timestamp_match.group(2)) if timestamp_match else None
                     timeline.append({
                         'line_number': line_num,
                         'timestamp': timestamp,
@@ -540,20 +1151,15 @@ class LogParser:
         """找到核心標識符"""
         identifiers = {}
         
-        session_started_pattern = re.compile(r'Firing SessionStarted event: SessionId:\s*([a-f0-9\-]{32,36})', re.IGNORECASE)
-        audio_stream_pattern = re.compile(r'\[([A-F0-9x]{10,18})\]CSpxAudioStreamSession::FireSessionStartedEvent', re.IGNORECASE)
-        thread_id_pattern = re.compile(r'^\[(\d+)\]:', re.IGNORECASE)
-        
-        for line_num, line in enumerate(lines, 1):
-            session_match = session_started_pattern.search(line)
+        for line_num, line in self._marker_lines(lines, 'session_started'):
+            session_match = self.patterns['session_started'].search(line)
             if session_match:
                 session_id = session_match.group(1)
                 
-                audio_match = audio_stream_pattern.search(line)
+                audio_match = SESSION_AUDIO_STREAM_PATTERN.search(line)
                 audio_address = audio_match.group(1) if audio_match else None
                 
-                thread_match = thread_id_pattern.search(line.strip())
-                background_thread_id = thread_match.group(1) if thread_match else None
+                background_thread_id = self.line_index.thread_id(line_num - 1)
                 
                 identifiers[session_id] = {
                     'session_id': session_id,
@@ -589,15 +1195,12 @@ class LogParser:
         parent_threads = {}
         
         # 查找後台啟動線程
-        background_start_pattern = re.compile(rf'Started thread Background with ID \[{background_thread_id}ll\]', re.IGNORECASE)
-        thread_id_pattern = re.compile(r'^\[(\d+)\]:', re.IGNORECASE)
-        
         kickoff_line_num = None
-        for line_num, line in enumerate(lines, 1):
-            if background_start_pattern.search(line):
-                thread_match = thread_id_pattern.search(line.strip())
-                if thread_match:
-                    kickoff_thread_id = thread_match.group(1)
+        for line_num, line in self._marker_lines(lines, 'background_thread_started'):
+            if any(match.group(1) == background_thread_id
+                   for match in BACKGROUND_THREAD_STARTED_PATTERN.finditer(line)):
+                kickoff_thread_id = self.line_index.thread_id(line_num - 1)
+                if kickoff_thread_id is not None:
                     parent_threads['kickoff_thread'] = kickoff_thread_id
                     parent_threads['kickoff_discovery_line'] = line_num
                     parent_threads['kickoff_raw_line'] = line.strip()
@@ -639,22 +1242,18 @@ class LogParser:
         3. 在整個日誌中找到這個記憶體地址第一次出現的地方
         4. 那一行的 thread id 就是 main thread
         """
-        # 模式：提取 background thread 中帶有 SPEECH-Region 的 GetStringValue 記憶體地址
+        # REGION_PROPERTY_ADDRESS_PATTERN：提取 background thread 中帶有 SPEECH-Region 的 GetStringValue 記憶體地址
         # 匹配格式如：this=0x0x007f9b94183400; name='SPEECH-Region'
-        get_string_pattern = re.compile(
-            r"named_properties\.h:479\s+ISpxNamedProperties::GetStringValue:\s+this=(0x(?:0x)?[0-9a-fA-F]+).*?name='SPEECH-Region'", 
-            re.IGNORECASE
-        )
-        
-        thread_id_pattern = re.compile(r'^\[(\d+)\]:', re.IGNORECASE)
+        thread_ids = self.line_index.thread_ids
+        background_code = self.line_index.thread_code(background_thread_id)
         
         # 步驟1: 在 background thread 中找到帶有 SPEECH-Region 的 GetStringValue 記憶體地址
         background_memory_addresses = []
         
-        for line_num, line in enumerate(lines, 1):
+        for line_num, line in self._marker_lines(lines, 'speech_region_property'):
             # 確保這一行屬於 background thread
-            if f'[{background_thread_id}]' in line:
-                match = get_string_pattern.search(line)
+            if background_code != MISSING and thread_ids[line_num - 1] == background_code:
+                match = REGION_PROPERTY_ADDRESS_PATTERN.search(line)
                 if match:
                     memory_addr = match.group(1)
                     background_memory_addresses.append((memory_addr, line_num))
@@ -664,64 +1263,16 @@ class LogParser:
             # print(f"[DEBUG] 在 background thread [{background_thread_id}] 中未找到 SPEECH-Region 的 GetStringValue 記憶體地址")
             return None
         
-        # 步驟2: 對每個記憶體地址，在整個日誌中找到第一次出現的位置
+        # 步驟2: 由地址索引查詢每個記憶體地址第一次出現在其他線程的位置，該線程即為 main thread
         for memory_addr, bg_line_num in background_memory_addresses:
-            # 建立多種可能的記憶體地址格式來匹配
-            # 處理 0x0x 和 0x 兩種格式
-            addr_patterns = set()
-            
-            # 原始格式
-            addr_patterns.add(memory_addr)
-            addr_patterns.add(memory_addr.lower())
-            addr_patterns.add(memory_addr.upper())
-            
-            # 如果是 0x0x 格式，也嘗試 0x 格式
-            if '0x0x' in memory_addr.lower():
-                simple_addr = memory_addr.replace('0x0x', '0x', 1).replace('0X0X', '0X', 1)
-                addr_patterns.add(simple_addr)
-                addr_patterns.add(simple_addr.lower())
-                addr_patterns.add(simple_addr.upper())
-            # 如果是 0x 格式，也嘗試 0x0x 格式
-            elif memory_addr.lower().startswith('0x') and not memory_addr.lower().startswith('0x0x'):
-                double_addr = memory_addr.replace('0x', '0x0x', 1).replace('0X', '0X0X', 1)
-                addr_patterns.add(double_addr)
-                addr_patterns.add(double_addr.lower())
-                addr_patterns.add(double_addr.upper())
-            
-            first_occurrence = None
-            first_line_num = float('inf')
-            
-            for line_num, line in enumerate(lines, 1):
-                # 跳過 background thread 自己的行
-                if line_num == bg_line_num:
-                    continue
-                
-                # 檢查這一行是否包含該記憶體地址
-                line_contains_addr = False
-                for addr_pattern in addr_patterns:
-                    if addr_pattern in line:
-                        line_contains_addr = True
-                        break
-                
-                if line_contains_addr and line_num < first_line_num:
-                    # 提取 thread id
-                    thread_match = thread_id_pattern.search(line.strip())
-                    if thread_match:
-                        thread_id = thread_match.group(1)
-                        # 確保不是 background thread 本身
-                        if thread_id != background_thread_id:
-                            first_occurrence = {
-                                'thread_id': thread_id,
-                                'line_num': line_num,
-                                'raw_line': line.strip()
-                            }
-                            first_line_num = line_num
-                            # print(f"[DEBUG] 記憶體地址 {memory_addr} 第一次出現在第 {line_num} 行，thread id: {thread_id}")
-            
-            # 如果找到第一次出現，返回該 thread 作為 main thread
-            if first_occurrence:
-                # print(f"[DEBUG] 確定 main thread: {first_occurrence['thread_id']}")
-                return first_occurrence
+            first_line = self.line_index.first_address_line(memory_addr, exclude_thread_code=background_code)
+            if first_line is not None:
+                # print(f"[DEBUG] 確定 main thread: {self.line_index.thread_id(first_line)}")
+                return {
+                    'thread_id': self.line_index.thread_id(first_line),
+                    'line_num': first_line + 1,
+                    'raw_line': lines[first_line].strip()
+                }
         
         # print(f"[DEBUG] 未找到記憶體地址的第一次出現")
         return None
@@ -737,70 +1288,54 @@ class LogParser:
         end_line = min(len(lines), kickoff_line_num + search_range)
         
         thread_activity = {}
-        timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
-        
-        # 搜索包含主要SDK活動的線程
-        main_patterns = [
-            r'StartRecognitionAsync',
-            r'SpeechConfig',
-            r'AudioConfig', 
-            r'CreateRecognizer',
-            r'main\s*\(',
-            r'WinMain',
-            r'Application'
-        ]
+        timestamps = self.line_index.timestamps
         
+        # 搜索包含主要SDK活動（MAIN_THREAD_ACTIVITY_PATTERN）的線程
         for i in range(start_line - 1, end_line):
             if i < len(lines):
                 line = lines[i]
-                thread_match = timestamp_pattern.match(line.strip())
-                if thread_match:
-                    thread_id = thread_match.group(1)
+                if timestamps[i] != MISSING:
+                    thread_id = self.line_index.thread_id(i)
                     if thread_id != background_thread_id:  # 不是背景線程
-                        for pattern in main_patterns:
-                            if re.search(pattern, line, re.IGNORECASE):
-                                if thread_id not in thread_activity:
-                                    thread_activity[thread_id] = 0
-                                thread_activity[thread_id] += 1
-                                break
+                        lowered = line.lower()
+                        if (any(literal in lowered for literal in MAIN_THREAD_ACTIVITY_LITERALS)
+                                and MAIN_THREAD_ACTIVITY_PATTERN.search(line)):
+                            if thread_id not in thread_activity:
+                                thread_activity[thread_id] = 0
+                            thread_activity[thread_id] += 1
         
         # 選擇活動度最高的線程
         if thread_activity:
             best_thread = max(thread_activity, key=thread_activity.get)
             # 找到這個線程的第一次出現
-            for i, line in enumerate(lines, 1):
-                if f'[{best_thread}]' in line:
-                    return {
-                        'thread_id': best_thread,
-                        'line_num': i,
-                        'raw_line': line.strip()
-                    }
+            best_thread_lines = self.line_index.lines_for_thread(best_thread)
+            if best_thread_lines:
+                i = best_thread_lines[0]
+                return {
+                    'thread_id': best_thread,
+                    'line_num': i + 1,
+                    'raw_line': lines[i].strip()
+                }
         
         return None
     
     def _find_main_thread_by_patterns(self, lines: List[str], background_thread_id: str, kickoff_line_num: int) -> Dict[str, Any]:
         """通過常見模式找主線程"""
-        timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
-        
-        # 最後的策略：找到最早開始且不是背景線程的線程
-        thread_first_appearance = {}
-        
-        for line_num, line in enumerate(lines, 1):
-            thread_match = timestamp_pattern.match(line.strip())
-            if thread_match:
-                thread_id = thread_match.group(1)
-                if (thread_id != background_thread_id and 
-                    thread_id not in thread_first_appearance):
-                    thread_first_appearance[thread_id] = (line_num, line.strip())
+        # 最後的策略：找到最早開始且不是背景線程的線程（索引已記錄每個線程第一次出現的行）
+        thread_first_appearance = {
+            thread_id: line_index
+            for thread_id, line_index in self.line_index.first_appearances().items()
+            if thread_id != background_thread_id
+        }
         
         # 選擇最早出現的線程（通常是主線程）
         if thread_first_appearance:
-            earliest_thread = min(thread_first_appearance, key=lambda x: thread_first_appearance[x][0])
-            line_num, raw_line = thread_first_appearance[earliest_thread]
+            earliest_thread = min(thread_first_appearance, key=thread_first_appearance.get)
+            line_index = thread_first_appearance[earliest_thread]
             return {
                 'thread_id': earliest_thread,
-                'line_num': line_num,
-                'raw_line': raw_line
+                'line_num': line_index + 1,
+                'raw_line': lines[line_index].strip()
             }
         
         return None
@@ -810,12 +1345,12 @@ class LogParser:
         child_threads = {}
         
         # 查找事件分發線程
-        user_thread_pattern = re.compile(r'Started thread User with ID \[(\d+)ll\]', re.IGNORECASE)
-        thread_id_pattern = re.compile(r'^\[(\d+)\]:', re.IGNORECASE)
+        thread_ids = self.line_index.thread_ids
+        background_code = self.line_index.thread_code(background_thread_id)
         
-        for line_num, line in enumerate(lines, 1):
-            if f'[{background_thread_id}]' in line and user_thread_pattern.search(line):
-                user_match = user_thread_pattern.search(line)
+        for line_num, line in self._marker_lines(lines, 'user_thread_started'):
+            if background_code != MISSING and thread_ids[line_num - 1] == background_code:
+                user_match = USER_THREAD_STARTED_PATTERN.search(line)
                 if user_match:
                     user_thread_id = user_match.group(1)
                     child_threads['user_thread'] = user_thread_id
@@ -828,18 +1363,11 @@ class LogParser:
         child_threads.update(audio_pump_threads)
 
         # 查找 GStreamer 線程
-        gstreamer_patterns = [
-            r'base_gstreamer\.cpp:\d+ PushDataToPipeline:',
-            r'opus_decoder\.cpp:\d+ Received new pad',
-            r'oggdemux'
-        ]
-        for pattern in gstreamer_patterns:
-            gstreamer_re = re.compile(pattern, re.IGNORECASE)
-            for line_num, line in enumerate(lines, 1):
+        for marker_name, gstreamer_re in GSTREAMER_THREAD_PATTERNS:
+            for line_num, line in self._marker_lines(lines, marker_name):
                 if gstreamer_re.search(line):
-                    thread_id_match = thread_id_pattern.search(line.strip())
-                    if thread_id_match:
-                        gstreamer_thread_id = thread_id_match.group(1)
+                    gstreamer_thread_id = self.line_index.thread_id(line_num - 1)
+                    if gstreamer_thread_id is not None:
                         child_threads['gstreamer_thread'] = gstreamer_thread_id
                         child_threads['gstreamer_thread_line'] = line_num
                         child_threads['gstreamer_thread_raw'] = line.strip()
@@ -855,11 +1383,12 @@ class LogParser:
         pump_address = None
         
         # 步驟1: 找到 CSpxAudioPump::StartPump() 的內存地址
-        pump_start_pattern = re.compile(r'\[([A-F0-9x]{10,18})\]CSpxAudioPump::StartPump\(\)', re.IGNORECASE)
+        thread_ids = self.line_index.thread_ids
+        background_code = self.line_index.thread_code(background_thread_id)
         
-        for line_num, line in enumerate(lines, 1):
-            if f'[{background_thread_id}]' in line:
-                pump_match = pump_start_pattern.search(line)
+        for line_num, line in self._marker_lines(lines, 'audio_pump_start'):
+            if background_code != MISSING and thread_ids[line_num - 1] == background_code:
+                pump_match = AUDIO_PUMP_START_PATTERN.search(line)
                 if pump_match:
                     pump_address = pump_match.group(1)
                     audio_threads['pump_address'] = pump_address
@@ -868,18 +1397,11 @@ class LogParser:
         
         # 步驟2: 用泵地址找到 AudioPump THREAD started!
         if pump_address:
-            thread_id_pattern = re.compile(r'^\[(\d+)\]:', re.IGNORECASE)
-            event_patterns = [
-                r'\*\*\* AudioPump THREAD started! \*\*\*',
-                r'PumpThread\(\): getting format from reader...'
-            ]
-            for event_pattern in event_patterns:
-                event_re = re.compile(event_pattern, re.IGNORECASE)
-                for line_num, line in enumerate(lines, 1):
+            for marker_name, event_re in AUDIO_PUMP_THREAD_PATTERNS:
+                for line_num, line in self._marker_lines(lines, marker_name):
                     if pump_address in line and event_re.search(line):
-                        thread_match = thread_id_pattern.search(line.strip())
-                        if thread_match:
-                            audio_thread_id = thread_match.group(1)
+                        audio_thread_id = self.line_index.thread_id(line_num - 1)
+                        if audio_thread_id is not None:
                             audio_threads['audio_thread'] = audio_thread_id
                             audio_threads['audio_discovery_line'] = line_num
                             audio_threads['audio_raw_line'] = line.strip()
@@ -891,24 +1413,151 @@ class LogParser:
 
     def get_session_log_content(self, session_id: str) -> str:
         """獲取特定會話的完整日誌內容"""
+        return '\n'.join(line.rstrip() for line in self._session_content_lines(session_id))
+    
+    def _session_content_lines(self, session_id: str):
+        """依序產生會話完整日誌的每一行"""
+        for i in self._session_content_line_nums(session_id):
+            yield self.lines[i]
+    
+    def iter_session_log(self, session_id: str):
+        """逐行產生會話日誌（已去除行尾空白），供串流下載使用，不需組出完整內容"""
+        for line in self._session_content_lines(session_id):
+            yield line.rstrip()
+    
+    def get_session_log_page(self, session_id: str, from_line: int = 0, limit: int = DEFAULT_LOG_PAGE_LINES,
+                             start_time: Optional[int] = None, end_time: Optional[int] = None) -> Dict[str, Any]:
+        """
+        會話日誌的一頁：直接從行索引取出第 from_line 行（0-based，會話日誌中的位置）起最多 limit 行
+        start_time / end_time（毫秒）限制時間範圍：會話日誌已按時間戳排序，以二分搜尋定位範圍的起訖位置
+        next_from_line 為下一頁的起始位置，已到結尾時為 None
+        """
+        line_nums = self._session_content_line_nums(session_id)
+        first, last = 0, len(line_nums)
+        if start_time is not None:
+            first = self._bisect_line_nums(line_nums, start_time, first, last, inclusive=False)
+        if end_time is not None:
+            last = self._bisect_line_nums(line_nums, end_time, first, last, inclusive=True)
+        
+        start = max(from_line, first)
+        end = max(min(start + limit, last), start)
+        timestamps = self.line_index.timestamps
+        return {
+            'total_lines': len(line_nums),
+            'from_line': start,
+            'next_from_line': end if end < last else None,
+            'lines': [
+                self._log_page_entry(position, i + 1, self.lines[i], timestamps[i])
+                for position, i in enumerate(line_nums[start:end], start)
+            ]
+        }
+    
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               thread_id: str = None, session_id: str = None,
+               start_time: Optional[int] = None, end_time: Optional[int] = None,
+               offset: int = 0, limit: int = DEFAULT_SEARCH_RESULTS, context: int = 0) -> Dict[str, Any]:
+        """
+        全文搜尋（字面字串或正則表達式，預設不分大小寫）
+        可限定線程、會話（會話完整日誌的行）及時間範圍（毫秒）；結果依行號排序，
+        返回第 offset 個起最多 limit 個匹配，各附前後 context 行；
+        候選行取自詞彙索引，只有無法從查詢取出詞彙時才逐行掃描
+        查詢無效時拋出 ValueError
+        """
+        pattern = compile_search(query, regex, case_sensitive)
+        candidates = self._search_index().candidates(query_fragments(query, regex))
+        
+        # 限定範圍：線程或會話的行號
+        scope = None
+        if thread_id is not None:
+            scope = set(self.line_index.lines_for_thread(thread_id))
+        if session_id is not None:
+            session_lines = set(self._session_content_line_nums(session_id))
+            scope = session_lines if scope is None else scope & session_lines
+        if candidates is None:
+            candidates = sorted(scope) if scope is not None else range(len(self.lines))
+            scope = None
+        
+        timestamps = self.line_index.timestamps
+        
+        def accept(i):
+            if scope is not None and i not in scope:
+                return False
+            if start_time is not None or end_time is not None:
+                line_time = timestamps[i]
+                if line_time == MISSING:
+                    return False
+                if (start_time is not None and line_time < start_time) or (end_time is not None and line_time > end_time):
+                    return False
+            return True
+        
+        matches = search_lines(candidates, self.lines.__getitem__, pattern, accept)
+        return {
+            'total_matches': len(matches),
+            'offset': offset,
+            'results': [self._search_result(i, pattern, context) for i in matches[offset:offset + limit]]
+        }
+    
+    def _search_index(self) -> TokenIndex:
+        """詞彙索引（第一次搜尋時掃描所有行建立，之後重複使用）"""
+        with self._token_index_lock:
+            if self._token_index is None:
+                self._token_index = TokenIndex.build(self.lines)
+            return self._token_index
+    
+    def _search_result(self, line_num: int, pattern, context: int) -> Dict[str, Any]:
+        """一個搜尋結果：行號、線程、時間戳、內容、匹配位置及前後文"""
+        text = self.lines[line_num].rstrip()
+        before = range(max(line_num - context, 0), line_num)
+        after = range(line_num + 1, min(line_num + 1 + context, len(self.lines)))
+        return {
+            'line_number': line_num + 1,
+            'thread_id': self.line_index.thread_id(line_num),
+            'timestamp': self.line_index.timestamp(line_num),
+            'text': text,
+            'spans': match_spans(pattern, text),
+            'before': [{'line_number': i + 1, 'text': self.lines[i].rstrip()} for i in before],
+            'after': [{'line_number': i + 1, 'text': self.lines[i].rstrip()} for i in after]
+        }
+    
+    @staticmethod
+    def _log_page_entry(position: int, line_number: int, line: str, timestamp: int) -> Dict[str, Any]:
+        """分頁日誌中的一行：會話日誌中的位置、檔案中的 1-based 行號、時間戳及內容"""
+        return {
+            'index': position,
+            'line_number': line_number,
+            'timestamp': timestamp if timestamp != MISSING else None,
+            'text': line.rstrip()
+        }
+    
+    def _bisect_line_nums(self, line_nums: List[int], timestamp: int, lo: int, hi: int, inclusive: bool) -> int:
+        """
+        在按時間戳排序的行號列表中二分搜尋：inclusive 為 False 時返回第一個時間戳 >= timestamp 的位置，
+        為 True 時返回第一個時間戳 > timestamp 的位置（無時間戳的行排序鍵為 0）
+        """
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = self._timestamp_sort_key(line_nums[mid])
+            if key < timestamp or (inclusive and key == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def _session_content_line_nums(self, session_id: str) -> List[int]:
+        """獲取特定會話完整日誌的行號（0-based，已按時間戳排序；結果保存在備忘錄中）"""
+        return self._memoized('session_content', session_id, lambda: self._compute_session_content_line_nums(session_id))
+    
+    def _compute_session_content_line_nums(self, session_id: str) -> List[int]:
+        """收集特定會話完整日誌的行號（未經備忘錄）"""
         try:
             # 步驟1: 獲取會話的線程分析
             thread_analysis = self.intelligent_thread_analysis(session_id)
             if 'error' in thread_analysis:
                 # 如果線程分析失敗，回退到增強搜索
-                return self._enhanced_session_search(session_id)
+                return self._enhanced_session_line_nums(session_id)
             
             # 步驟2: 收集所有相關的線程ID
-            thread_summary = thread_analysis.get('thread_summary', {})
-            related_thread_ids = set()
-            
-            # 收集所有線程ID
-            thread_keys = ['main_thread', 'kickoff_thread', 'background_thread', 
-                          'user_thread', 'audio_thread', 'gstreamer_thread']
-            
-            for thread_key in thread_keys:
-                if thread_key in thread_summary and thread_summary[thread_key]:
-                    related_thread_ids.add(str(thread_summary[thread_key]))
+            related_thread_ids = self._related_thread_ids(thread_analysis.get('thread_summary', {}))
             
             # 步驟3: 找到會話的時間範圍
             session_start_time, session_end_time = self._get_session_time_range(session_id)
@@ -918,61 +1567,97 @@ class LogParser:
             related_thread_ids.update(additional_thread_ids)
             
             # 步驟5: 提取完整的會話日誌
-            session_lines = []
-            timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
-            
-            for i, line in enumerate(self.lines):
-                line_stripped = line.rstrip()
-                
-                # 方法1: 直接包含SessionId的行
-                if session_id in line_stripped:
-                    session_lines.append(line_stripped)
-                    continue
-                
-                # 方法2: 屬於相關線程的行
-                thread_match = timestamp_pattern.match(line_stripped)
-                if thread_match:
-                    thread_id = thread_match.group(1)
-                    line_time = int(thread_match.group(2))
-                    
-                    # 檢查是否為相關線程且在時間範圍內
-                    if (thread_id in related_thread_ids and
-                        session_start_time is not None and 
-                        session_end_time is not None and
-                        session_start_time - 10000 <= line_time <= session_end_time + 10000):  # 擴大時間緩衝到10秒
-                        session_lines.append(line_stripped)
+            session_line_nums = self._collect_session_line_nums(session_id, related_thread_ids, session_start_time, session_end_time)
             
             # 如果沒找到足夠的日誌，回退到增強搜索
-            if len(session_lines) < 50:
-                return self._enhanced_session_search(session_id)
-            
-            # 按時間戳排序（如果有的話）
-            session_lines.sort(key=lambda x: self._extract_timestamp(x) or 0)
+            if session_line_nums is None:
+                return self._enhanced_session_line_nums(session_id)
             
-            return '\n'.join(session_lines)
+            return session_line_nums
             
         except Exception as e:
             # 如果發生任何錯誤，回退到增強搜索
-            return self._enhanced_session_search(session_id)
+            return self._enhanced_session_line_nums(session_id)
+    
+    def _related_thread_ids(self, thread_summary: Dict[str, Any]) -> set:
+        """從線程分析摘要收集所有相關線程ID"""
+        related_thread_ids = set()
+        for thread_key in SESSION_THREAD_KEYS:
+            if thread_key in thread_summary and thread_summary[thread_key]:
+                related_thread_ids.add(str(thread_summary[thread_key]))
+        return related_thread_ids
+    
+    def _thread_summary_for(self, thread_analysis: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+        """從全檔案的線程分析取出與 intelligent_thread_analysis(session_id) 相同的 thread_summary"""
+        session_threads = thread_analysis.get('session_threads', {})
+        if session_id in session_threads:
+            return session_threads[session_id]
+        # 會話沒有 SessionStarted 事件時，只有單一會話的檔案才有摘要
+        if len(session_threads) == 1:
+            return next(iter(session_threads.values()))
+        return {}
+    
+    def _collect_session_line_nums(self, session_id: str, related_thread_ids: set,
+                                   session_start_time: Optional[int], session_end_time: Optional[int]) -> Optional[List[int]]:
+        """
+        收集會話日誌行號：包含SessionId的行，加上相關線程在時間範圍內的行
+        行數不足（少於50行）時返回 None，由呼叫端回退到增強搜索
+        """
+        # 方法1: 直接包含SessionId的行
+        session_line_nums = set(self._session_line_numbers(session_id))
+        
+        # 方法2: 屬於相關線程且在時間範圍內的行（只走訪相關線程的倒排索引）
+        if session_start_time is not None and session_end_time is not None:
+            timestamps = self.line_index.timestamps
+            window_start = session_start_time - 10000  # 擴大時間緩衝到10秒
+            window_end = session_end_time + 10000
+            for thread_id in related_thread_ids:
+                for i in self.line_index.lines_for_thread(thread_id):
+                    line_time = timestamps[i]
+                    if line_time != MISSING and window_start <= line_time <= window_end:
+                        session_line_nums.add(i)
+        
+        if len(session_line_nums) < 50:
+            return None
+        
+        # 按時間戳排序（如果有的話），時間戳相同時保持原始行順序
+        session_line_nums = sorted(session_line_nums)
+        session_line_nums.sort(key=self._timestamp_sort_key)
+        return session_line_nums
+    
+    def _route_lines_to_windows(self, windows: Dict[str, tuple]):
+        """
+        依時間窗口將行分派給會話
+        產生 (行號, 時間窗口包含該行時間戳的會話ID列表)，只掃描一次時間戳欄位
+        """
+        buckets = {}
+        for sid, (window_start, window_end) in windows.items():
+            for bucket in range(window_start // SESSION_WINDOW_BUCKET_MS, window_end // SESSION_WINDOW_BUCKET_MS + 1):
+                buckets.setdefault(bucket, []).append((sid, window_start, window_end))
+        if not buckets:
+            return
+        
+        for i, line_time in enumerate(self.line_index.timestamps):
+            if line_time == MISSING:
+                continue
+            bucket = buckets.get(line_time // SESSION_WINDOW_BUCKET_MS)
+            if bucket:
+                session_candidates = [sid for sid, window_start, window_end in bucket
+                                      if window_start <= line_time <= window_end]
+                if session_candidates:
+                    yield i, session_candidates
     
     def _simple_session_search(self, session_id: str) -> str:
         """簡單的會話搜索（回退方法）"""
-        session_lines = []
-        for line in self.lines:
-            if session_id in line:
-                session_lines.append(line.rstrip())
-        return '\n'.join(session_lines)
+        return '\n'.join(self.lines[i].rstrip() for i in self._session_line_numbers(session_id))
     
     def _get_session_time_range(self, session_id: str) -> tuple:
         """獲取會話的開始和結束時間"""
-        session_times = []
-        timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
-        
-        for line in self.lines:
-            if session_id in line:
-                match = timestamp_pattern.match(line.strip())
-                if match:
-                    session_times.append(int(match.group(2)))
+        timestamps = self.line_index.timestamps
+        session_times = [
+            timestamps[i] for i in self._session_line_numbers(session_id)
+            if timestamps[i] != MISSING
+        ]
         
         if session_times:
             return min(session_times), max(session_times)
@@ -980,131 +1665,142 @@ class LogParser:
     
     def _extract_timestamp(self, line: str) -> int:
         """從日誌行中提取時間戳"""
-        match = re.match(r'^\[(\d+)\]:\s*(\d+)ms', line)
+        match = TIMESTAMP_SEARCH_PATTERN.match(line)
         return int(match.group(2)) if match else 0
+    
+    def _timestamp_sort_key(self, line_index: int) -> int:
+        """以行號取得排序用的時間戳（無時間戳時為 0）"""
+        timestamp = self.line_index.timestamps[line_index]
+        return timestamp if timestamp != MISSING else 0
 
     def _find_additional_session_threads(self, session_id: str, session_start_time: int, session_end_time: int) -> set:
         """找出更多可能與會話相關的線程ID"""
-        additional_threads = set()
-        timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
+        timestamps = self.line_index.timestamps
+        thread_ids = self.line_index.thread_ids
         
         # 如果沒有時間範圍，無法進行額外搜索
         if session_start_time is None or session_end_time is None:
-            return additional_threads
+            return set()
         
         # 擴展時間範圍來尋找可能的相關線程
         extended_start = session_start_time - 30000  # 開始前30秒
         extended_end = session_end_time + 30000      # 結束後30秒
         
-        # 查找包含常見 Speech SDK 關鍵字的行
-        sdk_keywords = [
-            'SPX_', 'CognitiveSpeech', 'AudioConfig', 'SpeechConfig', 
-            'RecognitionResult', 'StartRecognition', 'StopRecognition',
-            'WebSocket', 'speech.', 'turn.', 'AudioInputStream',
-            'CSpx', 'ISpx', 'speechsdk'
-        ]
-        
         thread_activity = {}  # 統計每個線程在時間範圍內的活動
         
-        for line in self.lines:
-            thread_match = timestamp_pattern.match(line.strip())
-            if thread_match:
-                thread_id = thread_match.group(1)
-                line_time = int(thread_match.group(2))
-                
-                # 檢查是否在擴展時間範圍內
-                if extended_start <= line_time <= extended_end:
-                    # 檢查是否包含 SDK 相關關鍵字
-                    for keyword in sdk_keywords:
-                        if keyword in line:
-                            if thread_id not in thread_activity:
-                                thread_activity[thread_id] = 0
-                            thread_activity[thread_id] += 1
-                            break
-        
-        # 選擇活動度較高的線程
-        for thread_id, activity_count in thread_activity.items():
-            if activity_count >= 3:  # 至少有3行相關活動
-                additional_threads.add(thread_id)
+        for i, line_time in enumerate(timestamps):
+            # 檢查是否在擴展時間範圍內（無時間戳的行為 MISSING，不會落入範圍）
+            if line_time != MISSING and extended_start <= line_time <= extended_end:
+                # 查找包含常見 Speech SDK 關鍵字的行
+                if self._has_sdk_keyword(self.lines[i]):
+                    thread_code = thread_ids[i]
+                    thread_activity[thread_code] = thread_activity.get(thread_code, 0) + 1
         
-        return additional_threads
+        return self._active_threads(thread_activity)
+    
+    def _active_threads(self, thread_activity: Dict[int, int]) -> set:
+        """選擇活動度較高的線程（至少有3行相關活動）"""
+        return {
+            self.line_index.thread_table[thread_code]
+            for thread_code, activity_count in thread_activity.items()
+            if activity_count >= 3
+        }
+    
+    @staticmethod
+    def _has_sdk_keyword(line: str) -> bool:
+        """行中是否包含 Speech SDK 關鍵字"""
+        for keyword in SDK_KEYWORDS:
+            if keyword in line:
+                return True
+        return False
+    
+    @staticmethod
+    def _has_sdk_pattern(line: str) -> bool:
+        """行中是否包含 SDK 相關內容（增強搜索用）"""
+        for pattern in SDK_ACTIVITY_PATTERNS:
+            if pattern.search(line):
+                return True
+        return False
 
     def _enhanced_session_search(self, session_id: str) -> str:
         """增強的會話搜索（當智能分析失敗時使用）"""
-        session_lines = []
-        timestamp_pattern = re.compile(r'^\[(\d+)\]:\s*(\d+)ms', re.IGNORECASE)
+        return '\n'.join(self.lines[i].rstrip() for i in self._enhanced_session_line_nums(session_id))
+    
+    def _enhanced_session_line_nums(self, session_id: str) -> List[int]:
+        """增強搜索的會話日誌行號（0-based，已按時間戳排序）"""
+        session_line_nums, window, session_thread_codes = self._enhanced_session_scope(session_id)
+        if window is None:
+            return session_line_nums
+        
+        # 步驟3: 找出可能相關的其他線程
+        window_start, window_end = window
+        timestamps = self.line_index.timestamps
+        thread_ids = self.line_index.thread_ids
+        session_line_set = set(session_line_nums)
+        additional_line_nums = []
+        for i, line_time in enumerate(timestamps):
+            # 檢查時間範圍
+            if line_time != MISSING and window_start <= line_time <= window_end:
+                if i in session_line_set:  # 避免重複添加
+                    continue
+                # 檢查是否為已知相關線程，或是否包含 SDK 相關內容
+                if thread_ids[i] in session_thread_codes or self._has_sdk_pattern(self.lines[i]):
+                    additional_line_nums.append(i)
+        
+        return self._merge_enhanced_line_nums(session_line_nums, additional_line_nums)
+    
+    def _enhanced_session_scope(self, session_id: str) -> tuple:
+        """
+        增強搜索的範圍：(包含SessionId的行號, 時間窗口, 會話線程編碼)
+        沒有帶時間戳的會話行時，時間窗口為 None
+        """
+        session_line_nums = list(self._session_line_numbers(session_id))
+        timestamps = self.line_index.timestamps
+        thread_ids = self.line_index.thread_ids
         
         # 步驟1: 找到包含SessionId的所有行並獲取時間範圍
         session_times = []
-        session_thread_ids = set()
+        session_thread_codes = set()
         
-        for line in self.lines:
-            if session_id in line:
-                session_lines.append(line.rstrip())
-                # 提取時間戳和線程ID
-                match = timestamp_pattern.match(line.strip())
-                if match:
-                    session_times.append(int(match.group(2)))
-                    session_thread_ids.add(match.group(1))
+        for i in session_line_nums:
+            # 提取時間戳和線程ID
+            if timestamps[i] != MISSING:
+                session_times.append(timestamps[i])
+                session_thread_codes.add(thread_ids[i])
         
         if not session_times:
-            return '\n'.join(session_lines)
+            return session_line_nums, None, session_thread_codes
         
         # 步驟2: 確定時間範圍
         start_time = min(session_times)
         end_time = max(session_times)
         time_buffer = min(60000, (end_time - start_time) * 2)  # 最多60秒緩衝
         
-        # 步驟3: 找出可能相關的其他線程
-        sdk_patterns = [
-            r'SPX_[A-Z_]+',
-            r'CognitiveSpeech',
-            r'speech\.[a-zA-Z]+',
-            r'turn\.[a-zA-Z]+',
-            r'RecognitionResult',
-            r'AudioConfig',
-            r'SpeechConfig',
-            r'WebSocket',
-            r'StartRecognition',
-            r'StopRecognition'
-        ]
-        
-        additional_lines = []
-        for line in self.lines:
-            if session_id not in line:  # 避免重複添加
-                match = timestamp_pattern.match(line.strip())
-                if match:
-                    line_time = int(match.group(2))
-                    thread_id = match.group(1)
-                    
-                    # 檢查時間範圍
-                    if (start_time - time_buffer) <= line_time <= (end_time + time_buffer):
-                        # 檢查是否為已知相關線程
-                        if thread_id in session_thread_ids:
-                            additional_lines.append(line.rstrip())
-                        else:
-                            # 檢查是否包含 SDK 相關內容
-                            for pattern in sdk_patterns:
-                                if re.search(pattern, line, re.IGNORECASE):
-                                    additional_lines.append(line.rstrip())
-                                    break
-        
-        # 步驟4: 合併並排序所有行
-        all_lines = session_lines + additional_lines
-        all_lines.sort(key=lambda x: self._extract_timestamp(x) or 0)
-        
-        return '\n'.join(all_lines)
+        return session_line_nums, (start_time - time_buffer, end_time + time_buffer), session_thread_codes
+    
+    def _merge_enhanced_line_nums(self, session_line_nums: List[int], additional_line_nums: List[int]) -> List[int]:
+        """步驟4: 合併並排序所有行"""
+        all_line_nums = session_line_nums + additional_line_nums
+        all_line_nums.sort(key=self._timestamp_sort_key)
+        return all_line_nums
 
     def get_thread_log_content(self, thread_id: str) -> str:
         """獲取特定線程的完整日誌內容"""
-        thread_lines = []
-        thread_pattern = re.compile(rf'^\[{re.escape(thread_id)}\]:', re.IGNORECASE)
-        
-        for line in self.lines:
-            if thread_pattern.match(line.strip()):
-                thread_lines.append(line.rstrip())
-        
-        return '\n'.join(thread_lines)
+        return '\n'.join(self.iter_thread_log(thread_id))
+    
+    def _thread_content_lines(self, thread_id: str):
+        """依序產生特定線程的每一行（走訪線程倒排索引）"""
+        for i in self.line_index.lines_for_thread(thread_id):
+            yield self.lines[i]
+    
+    def iter_thread_log(self, thread_id: str):
+        """逐行產生線程日誌（已去除行尾空白），供串流下載使用"""
+        for line in self._thread_content_lines(thread_id):
+            yield line.rstrip()
+    
+    def get_thread_line_count(self, thread_id: str) -> int:
+        """獲取特定線程的日誌行數（直接取自線程倒排索引，不需備忘錄）"""
+        return len(self.line_index.lines_for_thread(thread_id))
 
     def get_all_session_threads(self, session_id: str) -> Dict[str, str]:
         """獲取會話的所有線程ID和名稱映射"""
@@ -1136,16 +1832,754 @@ class LogParser:
             return {}
 
 
+
+class StreamingSessionState:
+    """串流解析中單一會話的有界狀態（只保存累計值，不保存日誌行）"""
+    
+    def __init__(self, session_id: str, start_line: int):
+        self.session_id = session_id
+        self.start_line = start_line
+        self.end_line = start_line
+        self.line_count = 0
+        self.start_time = None
+        self.end_time = None
+        self.error_count = 0
+        self.threads = {}  # 線程ID → 線程摘要欄位（未知角色為 None）
+        self.addresses = set()  # 會話線程上出現過的 SDK 物件地址
+        self.recognition_config = {'audio': {}, 'recognition': {}, 'system': {}}
+        self.metrics = PerformanceMetricsAccumulator()
+    
+    def add_line(self, line_num: int, line: str, timestamp: Optional[int]):
+        self.end_line = line_num
+        self.line_count += 1
+        if timestamp is not None:
+            if self.start_time is None:
+                self.start_time = timestamp
+            self.end_time = timestamp
+        if search_log_pattern('error_message', line):
+            self.error_count += 1
+        update_recognition_config(self.recognition_config, line)
+        self.metrics.add_line(line)
+    
+    def thread_summary(self) -> Dict[str, Any]:
+        """依串流中觀察到的線程角色建立線程摘要"""
+        summary = {}
+        for thread_id, role in self.threads.items():
+            if role and role not in summary:
+                summary[role] = thread_id
+        return summary
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'start_line': self.start_line,
+            'end_line': self.end_line,
+            'line_count': self.line_count,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'thread_ids': list(self.threads),
+            'thread_summary': self.thread_summary(),
+            'error_count': self.error_count,
+            'recognition_config': self.recognition_config,
+            'performance_metrics': self.metrics.result(),
+            'has_detailed_analysis': True
+        }
+
+
+class StreamingLogParser(LogParser):
+    """
+    串流式SDK日誌解析器
+    以固定大小的區塊讀取檔案並逐行將日誌分派給會話，只保留開啟中會話的累計狀態，
+    會話閒置逾時、開啟數超過上限或檔案結束時即產生其摘要與指標，記憶體用量與檔案大小無關。
+    
+    行的歸屬規則（依序）：
+    1. 行中的 "SessionId:" 宣告（新的會話ID會開啟新會話）
+    2. 行中出現開啟中會話的 GUID
+    3. 該線程最近一次歸屬的會話（"Started thread X with ID [N]" 會把子線程綁定到目前會話）
+    
+    與 LogParser 相同的公開方法均可使用，但需要全檔隨機存取的部分改為重新串流一次檔案，
+    線程分析只提供串流中觀察到的線程角色。
+    """
+    
+    def __init__(self, filepath, chunk_size: int = 1024 * 1024, idle_timeout_ms: int = 120000,
+                 max_open_sessions: int = 256, recent_sessions: int = 4096, cache=None, progress=None,
+                 member: str = None, cache_key: str = None, content_digest: str = None):
+        """
+        初始化串流解析器（不讀取檔案內容）
+        提供 cache 時會話摘要會保存在磁碟緩存；提供 progress 時，parse() 期間定期以
+        (已處理位元組數, 新結束的會話摘要列表) 呼叫；
+        壓縮檔（zip 以 member 指定成員）每次串流時重新解壓；cache_key 為已知的會話摘要磁碟緩存鍵，
+        content_digest 為已知的檔案內容 SHA-256（省去計算緩存鍵時重新讀取檔案）
+        """
+        self.filepath = filepath
+        self.member = member
+        self._cache = cache
+        self._cache_key = cache_key
+        self._content_digest = content_digest
+        self._progress = progress
+        self._reporting = False
+        self.chunk_size = chunk_size
+        self.idle_timeout_ms = idle_timeout_ms
+        self.max_open_sessions = max_open_sessions
+        self.recent_sessions = recent_sessions
+        
+        self.session_id_pattern = SESSION_ID_PATTERN
+        self.patterns = LOG_PATTERNS
+        
+        self.file_size = uncompressed_size(filepath, member)
+        self.bytes_processed = 0
+        self._summaries = None
+        self._thread_line_counts = None  # 線程ID → 行數（parse() 完整串流一次時順便統計）
+        self._memo = {}
+        self._flight = SingleFlight()
+    
+    def invalidate_memo(self, session_id: str = None):
+        """清除保存的會話摘要（下次查詢時重新串流檔案）"""
+        self._memo.clear()
+        self._summaries = None
+        self._thread_line_counts = None
+    
+    def close(self):
+        """串流解析器不持有檔案資源"""
+        pass
+    
+    def memory_size(self) -> int:
+        """近似常駐位元組數（只保存會話摘要及備忘錄中的分析結果）"""
+        return (len(self._summaries or ()) + len(self._memo)) * ANALYSIS_ENTRY_BYTES
+    
+    def spill(self) -> Optional[Dict[str, Any]]:
+        """確保會話摘要已寫入磁碟緩存，返回之後從緩存重新建立解析器的記錄；摘要尚未完成或沒有磁碟緩存時返回 None"""
+        if self._cache is None or self._cache_key is None or self._summaries is None:
+            return None
+        if not self._cache.contains(self._cache_key):
+            self._cache.store(self._cache_key, self._summaries)
+        return {
+            'kind': 'stream',
+            'filepath': self.filepath,
+            'member': self.member,
+            'cache_key': self._cache_key,
+            'chunk_size': self.chunk_size,
+            'idle_timeout_ms': self.idle_timeout_ms,
+            'max_open_sessions': self.max_open_sessions,
+            'recent_sessions': self.recent_sessions
+        }
+    
+    def _iter_lines(self, stream=None):
+        """逐行產生 (1-based 行號, 行內容)，同時更新已處理位元組數；未指定 stream 時讀取檔案"""
+        self.bytes_processed = 0
+        if stream is not None:
+            yield from self._iter_stream(stream)
+            return
+        try:
+            handle = open_log_stream(self.filepath, self.member)
+        except Exception as e:
+            raise Exception(f"無法讀取檔案 {self.filepath}: {str(e)}")
+        with handle:
+            yield from self._iter_stream(handle)
+    
+    def _iter_stream(self, stream):
+        for line_num, (line, size) in enumerate(iter_stream_lines(stream, self.chunk_size), 1):
+            self.bytes_processed += size
+            if self._reporting and line_num % PROGRESS_INTERVAL_LINES == 0:
+                self._progress(self.bytes_processed, [])
+            yield line_num, line
+    
+    def _iter_routed(self, stream=None, thread_line_counts: Dict[str, int] = None):
+        """
+        將每一行分派給會話
+        產生 (會話狀態, 行號, 行內容, 時間戳)；會話結束時產生 (會話狀態, None, None, None)
+        提供 thread_line_counts 時同時累計各線程的行數（呼叫端提前中止時只包含已讀取的部分，
+        由 _parse 在完整串流後才保存）
+        """
+        open_sessions = {}
+        thread_sessions = {}
+        address_sessions = {}
+        pending_threads = {}  # 尚未歸屬任何會話的 "Started thread" 事件：線程ID → 摘要欄位
+        recently_closed = set()
+        closed_order = deque()
+        current_time = None
+        
+        def close_session(state):
+            del open_sessions[state.session_id]
+            for thread_id in state.threads:
+                if thread_sessions.get(thread_id) == state.session_id:
+                    del thread_sessions[thread_id]
+            for address in state.addresses:
+                if address_sessions.get(address) == state.session_id:
+                    del address_sessions[address]
+            recently_closed.add(state.session_id)
+            closed_order.append(state.session_id)
+            if len(closed_order) > self.recent_sessions:
+                recently_closed.discard(closed_order.popleft())
+            return state, None, None, None
+        
+        for line_num, line in self._iter_lines(stream):
+            stripped = line.lstrip()
+            prefix = LINE_PREFIX_PATTERN.match(stripped)
+            thread_id = prefix.group(1) if prefix else None
+            timestamp = int(prefix.group(2)) if prefix and prefix.group(2) else None
+            if timestamp is not None:
+                current_time = timestamp
+            if thread_id is not None and thread_line_counts is not None:
+                thread_line_counts[thread_id] = thread_line_counts.get(thread_id, 0) + 1
+            
+            state = None
+            session_match = search_session_id(line)
+            if session_match:
+                session_id = session_match.group(1)
+                state = open_sessions.get(session_id)
+                if state is None and session_id not in recently_closed:
+                    if len(open_sessions) >= self.max_open_sessions:
+                        # 超過開啟上限時先結束最久未活動的會話
+                        yield close_session(min(open_sessions.values(), key=lambda s: s.end_line))
+                    state = open_sessions[session_id] = StreamingSessionState(session_id, line_num)
+                    if thread_id is not None and 'Firing SessionStarted event' in line:
+                        # 觸發 SessionStarted 的線程即會話的後台線程
+                        state.threads[thread_id] = 'background_thread'
+            
+            if state is None and open_sessions:
+                for token in GUID_TOKEN_PATTERN.findall(line):
+                    state = open_sessions.get(token)
+                    if state is not None:
+                        break
+            
+            if state is None and thread_id is not None:
+                session_id = thread_sessions.get(thread_id)
+                if session_id is not None:
+                    state = open_sessions[session_id]
+            
+            address_match = STREAMING_OBJECT_ADDRESS_PATTERN.search(line) if 'CSpx' in line else None
+            if state is None and address_match:
+                session_id = address_sessions.get(address_match.group(1))
+                if session_id is not None:
+                    state = open_sessions[session_id]
+                    if thread_id is not None and address_match.group(2) == 'CSpxAudioPump':
+                        state.threads.setdefault(thread_id, 'audio_thread')
+            
+            started = self.patterns['thread_started'].search(line) if 'Started thread' in line else None
+            
+            if state is not None:
+                if thread_id is not None:
+                    thread_sessions[thread_id] = state.session_id
+                    if thread_id in pending_threads:
+                        state.threads.setdefault(thread_id, pending_threads.pop(thread_id))
+                    else:
+                        state.threads.setdefault(thread_id, None)
+                if address_match and address_match.group(1) not in address_sessions:
+                    address_sessions[address_match.group(1)] = state.session_id
+                    state.addresses.add(address_match.group(1))
+                if started:
+                    thread_sessions[started.group(2)] = state.session_id
+                    state.threads[started.group(2)] = STREAMING_THREAD_ROLES.get(started.group(1))
+                state.add_line(line_num, line, timestamp)
+                yield state, line_num, line, timestamp
+            elif started and started.group(1) in STREAMING_THREAD_ROLES:
+                # 會話宣告前啟動的線程（如後台線程）：記住其角色，待線程歸屬會話時套用
+                pending_threads[started.group(2)] = STREAMING_THREAD_ROLES[started.group(1)]
+                if len(pending_threads) > STREAMING_PENDING_THREADS:
+                    del pending_threads[next(iter(pending_threads))]
+            
+            if line_num % STREAMING_IDLE_CHECK_INTERVAL == 0 and current_time is not None:
+                # 時間戳倒退（程序重啟）同樣視為閒置
+                idle = [s for s in open_sessions.values()
+                        if s.end_time is not None and abs(current_time - s.end_time) > self.idle_timeout_ms]
+                for s in idle:
+                    yield close_session(s)
+        
+        for state in list(open_sessions.values()):
+            yield close_session(state)
+    
+    def iter_sessions(self, stream=None, thread_line_counts: Dict[str, int] = None):
+        """
+        逐一產生已結束會話的摘要（依結束順序）；可指定二進位串流代替檔案（如上傳中的請求本文）；
+        提供 thread_line_counts 時同時累計各線程的行數
+        """
+        for state, line_num, line, timestamp in self._iter_routed(stream, thread_line_counts):
+            if line_num is None:
+                yield state.summary()
+    
+    def iter_session_lines(self, session_id: str):
+        """重新串流檔案，依序產生歸屬於指定會話的 (1-based 行號, 行內容)"""
+        for state, line_num, line, timestamp in self._iter_routed():
+            if state.session_id != session_id:
+                continue
+            if line_num is None:
+                break
+            yield line_num, line
+    
+    def parse(self, stream=None, digest=None) -> List[Dict[str, Any]]:
+        """
+        完整串流一次，返回依起始行排序的會話摘要（結果會被保存）
+        stream 為內容與檔案相同的二進位串流（如邊接收邊寫入檔案的上傳本文），會被讀取到結尾；
+        digest 為讀取 stream 時同步更新的 hashlib 物件，讀完後以其內容雜湊寫入磁碟緩存；
+        並行呼叫時只串流一次
+        """
+        summaries = self._summaries
+        if summaries is None:
+            summaries = self._flight.do(('parse', None), lambda: self._parse(stream, digest))
+        return summaries
+    
+    def _parse(self, stream=None, digest=None) -> List[Dict[str, Any]]:
+        if self._summaries is None:
+            cached = None
+            cache_key = None
+            if self._cache is not None and stream is None:
+                cache_key = self._cache_key or \
+                    self._cache.key_for(self.filepath, PARSER_VERSION, self._content_digest, self.member) + '-stream'
+                cached = self._cache.load(cache_key)
+            if cached is not None:
+                self._summaries = cached
+                if self._progress is not None:
+                    self._progress(self.file_size, list(self._summaries))
+            else:
+                summaries = []
+                thread_line_counts = {}
+                self._reporting = self._progress is not None
+                try:
+                    for summary in self.iter_sessions(stream, thread_line_counts):
+                        summaries.append(summary)
+                        if self._reporting:
+                            self._progress(self.bytes_processed, [summary])
+                finally:
+                    self._reporting = False
+                self._summaries = sorted(summaries, key=lambda s: s['start_line'])
+                # 只有完整串流到結尾後才保存各線程行數（部分串流的統計不完整）
+                self._thread_line_counts = thread_line_counts
+                if stream is not None:
+                    self.file_size = self.bytes_processed
+                if self._cache is not None and cache_key is None and digest is not None:
+                    cache_key = self._cache.key_for(self.filepath, PARSER_VERSION, digest.hexdigest(),
+                                                    self.member) + '-stream'
+                if cache_key is not None:
+                    self._cache.store(cache_key, self._summaries)
+            self._cache_key = cache_key
+        return self._summaries
+    
+    def _find_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        for summary in self.parse():
+            if summary['session_id'] == session_id:
+                return summary
+        return None
+    
+    def get_sessions_summary(self):
+        """獲取會話摘要列表（含串流累計的指標）"""
+        return self.parse()
+    
+    def get_session_details(self, session_id: str) -> Dict[str, Any]:
+        """重新串流檔案，只保留指定會話的日誌行進行詳細分析（結果保存在備忘錄中）"""
+        return self._memoized('session_details', session_id, lambda: self._stream_session_details(session_id))
+    
+    def _stream_session_details(self, session_id: str) -> Dict[str, Any]:
+        try:
+            session_lines = []
+            simple_session_lines = []
+            for i, (line_num, line) in enumerate(self.iter_session_lines(session_id), 1):
+                line = line.strip()
+                if line:
+                    session_lines.append((i, line))
+                    if session_id in line:
+                        simple_session_lines.append((line_num, line))
+            return self._details_from_session_lines(session_id, session_lines, simple_session_lines)
+        except Exception as e:
+            return self._session_details_error(e)
+    
+    def analyze_all_sessions(self) -> Dict[str, Dict[str, Any]]:
+        """串流模式只提供各會話的累計摘要與指標"""
+        return {summary['session_id']: summary for summary in self.parse()}
+    
+    def completed_session_analysis(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """串流完成後的各會話累計摘要，尚未串流時返回 None（不觸發串流）"""
+        summaries = self._summaries
+        if summaries is None:
+            return None
+        return {summary['session_id']: summary for summary in summaries}
+    
+    def intelligent_thread_analysis(self, session_id: str = None) -> Dict[str, Any]:
+        """串流模式的線程分析：返回串流中觀察到的會話線程"""
+        try:
+            summaries = self.parse()
+            if session_id:
+                summaries = [s for s in summaries if s['session_id'] == session_id]
+            if not summaries:
+                return {'error': '未找到SessionStarted事件，無法進行線程分析'}
+            
+            results = {
+                'session_threads': {s['session_id']: s['thread_summary'] for s in summaries},
+                'analysis_status': 'streaming'
+            }
+            if len(summaries) == 1:
+                results['primary_session'] = summaries[0]['session_id']
+                results['thread_summary'] = summaries[0]['thread_summary']
+            return results
+        except Exception as e:
+            return {'error': f'線程分析時發生錯誤: {str(e)}'}
+    
+    def get_session_log_content(self, session_id: str) -> str:
+        """獲取會話的日誌內容（串流中歸屬於該會話的行）"""
+        return '\n'.join(line.rstrip() for line in self._session_content_lines(session_id))
+    
+    def _session_content_lines(self, session_id: str):
+        for line_num, line in self.iter_session_lines(session_id):
+            yield line
+    
+    def get_session_log_page(self, session_id: str, from_line: int = 0, limit: int = DEFAULT_LOG_PAGE_LINES,
+                             start_time: Optional[int] = None, end_time: Optional[int] = None) -> Dict[str, Any]:
+        """
+        會話日誌的一頁（重新串流檔案，只保留該頁的行）
+        串流模式的會話日誌依檔案順序排列，時間範圍以逐行比對時間戳過濾（無時間戳的行視為 0）
+        """
+        entries = []
+        total = 0
+        next_from_line = None
+        for position, (line_num, line) in enumerate(self.iter_session_lines(session_id)):
+            total += 1
+            if position < from_line or next_from_line is not None:
+                continue
+            prefix = LINE_PREFIX_PATTERN.match(line.lstrip())
+            timestamp = int(prefix.group(2)) if prefix and prefix.group(2) else MISSING
+            sort_key = timestamp if timestamp != MISSING else 0
+            if (start_time is not None and sort_key < start_time) or (end_time is not None and sort_key > end_time):
+                continue
+            if len(entries) >= limit:
+                next_from_line = position
+                continue
+            entries.append(self._log_page_entry(position, line_num, line, timestamp))
+        return {
+            'total_lines': total,
+            'from_line': entries[0]['index'] if entries else max(from_line, 0),
+            'next_from_line': next_from_line,
+            'lines': entries
+        }
+    
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               thread_id: str = None, session_id: str = None,
+               start_time: Optional[int] = None, end_time: Optional[int] = None,
+               offset: int = 0, limit: int = DEFAULT_SEARCH_RESULTS, context: int = 0) -> Dict[str, Any]:
+        """
+        全文搜尋（重新串流檔案逐行比對，不建立詞彙索引以維持固定的記憶體用量）
+        限定會話時在會話的串流日誌中搜尋，前後文也取自會話的串流日誌
+        """
+        pattern = compile_search(query, regex, case_sensitive)
+        thread_id = str(thread_id) if thread_id is not None else None
+        lines = self.iter_session_lines(session_id) if session_id is not None else self._iter_lines()
+        
+        total = 0
+        results = []
+        pending = []  # 尚未收集完後文的結果
+        previous = deque(maxlen=context)
+        for line_num, line in lines:
+            text = line.rstrip()
+            neighbour = {'line_number': line_num, 'text': text}
+            for result in pending:
+                result['after'].append(neighbour)
+            pending = [result for result in pending if len(result['after']) < context]
+            
+            if pattern.search(line) and self._search_accepts(line, thread_id, start_time, end_time):
+                total += 1
+                if offset < total <= offset + limit:
+                    prefix = LINE_PREFIX_PATTERN.match(line.lstrip())
+                    result = {
+                        'line_number': line_num,
+                        'thread_id': prefix.group(1) if prefix else None,
+                        'timestamp': int(prefix.group(2)) if prefix and prefix.group(2) else None,
+                        'text': text,
+                        'spans': match_spans(pattern, text),
+                        'before': list(previous),
+                        'after': []
+                    }
+                    results.append(result)
+                    if context:
+                        pending.append(result)
+            previous.append(neighbour)
+        
+        return {'total_matches': total, 'offset': offset, 'results': results}
+    
+    @staticmethod
+    def _search_accepts(line: str, thread_id: Optional[str], start_time: Optional[int], end_time: Optional[int]) -> bool:
+        """行是否符合線程及時間範圍的篩選條件"""
+        if thread_id is None and start_time is None and end_time is None:
+            return True
+        prefix = LINE_PREFIX_PATTERN.match(line.lstrip())
+        if prefix is None:
+            return False
+        if thread_id is not None and prefix.group(1) != thread_id:
+            return False
+        if start_time is not None or end_time is not None:
+            if not prefix.group(2):
+                return False
+            line_time = int(prefix.group(2))
+            if (start_time is not None and line_time < start_time) or (end_time is not None and line_time > end_time):
+                return False
+        return True
+    
+    def _thread_content_lines(self, thread_id: str):
+        thread_id = str(thread_id)
+        for line_num, line in self._iter_lines():
+            prefix = LINE_PREFIX_PATTERN.match(line.lstrip())
+            if prefix and prefix.group(1) == thread_id:
+                yield line
+    
+    def get_thread_log_content(self, thread_id: str) -> str:
+        """獲取特定線程的日誌內容（重新串流檔案）"""
+        return '\n'.join(self.iter_thread_log(thread_id))
+    
+    def get_thread_line_count(self, thread_id: str) -> int:
+        """
+        獲取特定線程的行數：使用完整串流時統計的各線程行數，
+        會話摘要由磁碟緩存載入而尚未串流時，重新串流一次統計所有線程（結果保存在備忘錄中）
+        """
+        counts = self._thread_line_counts
+        if counts is None:
+            counts = self._memoized('thread_line_counts', None, self._count_thread_lines)
+        return counts.get(str(thread_id), 0)
+    
+    def _count_thread_lines(self) -> Dict[str, int]:
+        counts = {}
+        for line_num, line in self._iter_lines():
+            prefix = LINE_PREFIX_PATTERN.match(line.lstrip())
+            if prefix:
+                counts[prefix.group(1)] = counts.get(prefix.group(1), 0) + 1
+        return counts
+
+
+def parser_from_record(record: Dict[str, Any], cache=None) -> LogParser:
+    """依 spill() 返回的記錄從磁碟緩存（cache）重新建立解析器，記錄格式不符時拋出 ValueError"""
+    kind = record.get('kind')
+    if kind == 'log':
+        return LogParser(str(record['filepath']), cache=cache, member=record.get('member'),
+                         cache_key=str(record['cache_key']))
+    if kind == 'stream':
+        return StreamingLogParser(str(record['filepath']), chunk_size=int(record['chunk_size']),
+                                  idle_timeout_ms=int(record['idle_timeout_ms']),
+                                  max_open_sessions=int(record['max_open_sessions']),
+                                  recent_sessions=int(record['recent_sessions']), cache=cache,
+                                  member=record.get('member'), cache_key=str(record['cache_key']))
+    raise ValueError(f"Unknown parser record kind: {kind}")
+
+
+def _holding_state_lock(method):
+    """在解析器的狀態鎖內執行方法（FollowingLogParser.poll() 更新行索引與備忘錄時持有同一個鎖）"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._state_lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class FollowingLogParser(LogParser):
+    """
+    追蹤模式解析器：用於持續寫入中的日誌檔案（如 SPEECH-LogFilename 指定的檔案）
+    
+    記錄已索引到的檔案位置，poll() 只解析新附加的完整行並附加到既有的行索引；
+    只有受新行影響的會話（會話ID出現在新行中，或新行時間戳落在會話的時間窗口內）
+    才清除其會話詳情與線程分析的備忘錄，其餘會話保留既有結果。
+    檔案被截斷或替換（輪替）時重新解析整個檔案。
+    
+    poll() 在 Server-Sent Events 線程中執行，請求線程同時讀取同一個解析器：
+    更新行索引、映射與備忘錄時持有狀態鎖，公開的查詢方法也在同一個鎖內執行，
+    因此請求不會看到只更新一半的索引，也不會把以舊行數計算的結果存入備忘錄
+    """
+    
+    def __init__(self, filepath):
+        """初始化並解析目前的檔案內容（結尾不完整的行等下次 poll() 再處理；內容持續變動，不使用磁碟緩存）"""
+        if detect_compression(filepath) is not None:
+            raise Exception("追蹤模式只支援未壓縮的日誌檔案")
+        self._follow_lock = threading.Lock()
+        self._state_lock = threading.RLock()
+        self._generation = 0
+        self._retired_lines = None
+        self._identity = self._file_identity(os.stat(filepath))
+        super().__init__(filepath)
+    
+    @staticmethod
+    def _file_identity(stat) -> tuple:
+        return stat.st_dev, stat.st_ino
+    
+    def _read_lines(self, offsets: array = None, buffer: bytes = None):
+        return super()._read_lines(offsets, buffer).drop_partial_line()
+    
+    # 讀取行索引、映射或備忘錄的公開方法都與 poll() 的更新互斥
+    get_sessions_summary = _holding_state_lock(LogParser.get_sessions_summary)
+    get_session_details = _holding_state_lock(LogParser.get_session_details)
+    analyze_all_sessions = _holding_state_lock(LogParser.analyze_all_sessions)
+    intelligent_thread_analysis = _holding_state_lock(LogParser.intelligent_thread_analysis)
+    get_session_series_arrays = _holding_state_lock(LogParser.get_session_series_arrays)
+    get_session_metric_series = _holding_state_lock(LogParser.get_session_metric_series)
+    get_session_log_content = _holding_state_lock(LogParser.get_session_log_content)
+    get_session_log_page = _holding_state_lock(LogParser.get_session_log_page)
+    search = _holding_state_lock(LogParser.search)
+    get_thread_log_content = _holding_state_lock(LogParser.get_thread_log_content)
+    get_thread_line_count = _holding_state_lock(LogParser.get_thread_line_count)
+    get_all_session_threads = _holding_state_lock(LogParser.get_all_session_threads)
+    memory_size = _holding_state_lock(LogParser.memory_size)
+    
+    def _session_content_lines(self, session_id: str):
+        with self._state_lock:
+            line_nums = self._session_content_line_nums(session_id)
+        return self._iter_current_lines(line_nums)
+    
+    def _thread_content_lines(self, thread_id: str):
+        with self._state_lock:
+            line_nums = list(self.line_index.lines_for_thread(thread_id))
+        return self._iter_current_lines(line_nums)
+    
+    def _iter_current_lines(self, line_nums):
+        """
+        依行號逐行讀取目前的映射（串流下載在鎖外逐步取用）：附加新行不影響既有行號，
+        檔案被截斷或替換而重新解析後行號失效，此時停止
+        """
+        generation = self._generation
+        for i in line_nums:
+            with self._state_lock:
+                if self._generation != generation:
+                    return
+                line = self.lines[i]
+            yield line
+    
+    def close(self):
+        with self._state_lock:
+            super().close()
+            if self._retired_lines is not None:
+                self._retired_lines.close()
+                self._retired_lines = None
+    
+    def _retire_lines(self, lines):
+        """
+        換上新的映射；舊映射延到下一次更新時才釋放，
+        讓其他請求中正在讀取舊映射的分析可以完成
+        """
+        if self._retired_lines is not None:
+            self._retired_lines.close()
+        self._retired_lines = self.lines
+        self.lines = lines
+    
+    def poll(self) -> Optional[Dict[str, Any]]:
+        """
+        檢查檔案是否有新附加的完整行並更新索引
+        沒有新行時返回 None，否則返回
+        {'reset': 是否重新解析整個檔案, 'new_sessions': 新會話摘要, 'updated_sessions': 需重新查詢的會話ID,
+         'line_count': 目前行數, 'file_size': 檔案大小}
+        """
+        with self._follow_lock:
+            try:
+                stat = os.stat(self.filepath)
+            except FileNotFoundError:
+                # 輪替期間檔案可能暫時不存在
+                return None
+            
+            identity = self._file_identity(stat)
+            if identity != self._identity or stat.st_size < self.lines.buffer_size:
+                self._identity = identity
+                return self._reload(stat.st_size)
+            if stat.st_size == self.lines.buffer_size:
+                return None
+            
+            # 映射新內容不改動既有狀態，在鎖外進行
+            appended_lines = self.lines.reopen_appended(self.filepath)
+            start_line = len(self.lines)
+            
+            with self._state_lock:
+                self._retire_lines(appended_lines)
+                if len(self.lines) == start_line:
+                    return None
+                session_count = len(self.line_index.session_starts)
+                for line_num in range(start_line, len(self.lines)):
+                    self.line_index.add_line(self.lines[line_num])
+                with self._token_index_lock:
+                    if self._token_index is not None:
+                        self._token_index.extend(self.lines[line_num]
+                                                 for line_num in range(start_line, len(self.lines)))
+                
+                new_sessions = list(islice(self.line_index.session_starts.items(), session_count, None))
+                new_session_ids = {session_id for session_id, line_num in new_sessions}
+                updated_sessions = [
+                    session_id for session_id in self._touched_sessions(start_line)
+                    if session_id not in new_session_ids
+                ]
+                
+                # 全檔案層級的結果（如不指定會話的線程分析）一律重新計算
+                for key in [key for key in self._memo if key[1] is None]:
+                    del self._memo[key]
+                for session_id in updated_sessions:
+                    self.invalidate_memo(session_id)
+                self._session_analysis = None
+                
+                return {
+                    'reset': False,
+                    'new_sessions': [self._session_summary(session_id, line_num)
+                                     for session_id, line_num in new_sessions],
+                    'updated_sessions': updated_sessions,
+                    'line_count': len(self.lines),
+                    'file_size': stat.st_size
+                }
+    
+    def _reload(self, file_size: int) -> Dict[str, Any]:
+        """檔案被截斷或替換時重新解析整個檔案"""
+        print(f"[追蹤模式] {self.filepath} 已被截斷或替換，重新解析")
+        # 新的映射與索引先在鎖外建立，再一次換上
+        lines = self._read_lines()
+        line_index = LineIndex.build(lines)
+        with self._state_lock:
+            self._retire_lines(lines)
+            self.line_index = line_index
+            self._generation += 1
+            self._memo.clear()
+            self._session_analysis = None
+            with self._token_index_lock:
+                self._token_index = None
+            return {
+                'reset': True,
+                'new_sessions': self.get_sessions_summary(),
+                'updated_sessions': [],
+                'line_count': len(self.lines),
+                'file_size': file_size
+            }
+    
+    def _touched_sessions(self, start_line: int) -> List[str]:
+        """會話ID出現在新行中，或新行時間戳落在會話時間窗口內的既有會話"""
+        timestamps = self.line_index.timestamps
+        new_times = [timestamps[i] for i in range(start_line, len(timestamps)) if timestamps[i] != MISSING]
+        earliest = min(new_times) if new_times else None
+        
+        touched = []
+        for session_id in self.line_index.session_starts:
+            line_nums = self._session_line_numbers(session_id)
+            if len(line_nums) and line_nums[-1] >= start_line:
+                touched.append(session_id)
+                continue
+            if earliest is None:
+                continue
+            start_time, end_time = self._get_session_time_range(session_id)
+            if end_time is not None and earliest <= end_time + FOLLOW_SESSION_WINDOW_MS:
+                touched.append(session_id)
+        return touched
+
+
 # 主要執行程式碼（僅在直接執行時使用）
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) > 1:
-        filepath = sys.argv[1]
-        parser = LogParser(filepath)
-        sessions_summary = parser.get_sessions_summary()
-        
-        print("會話摘要:")
-        for session in sessions_summary:
-            print(f"Session ID: {session['session_id']}, Start Line: {session['start_line']}")
+    args = sys.argv[1:]
+    streaming = '--stream' in args
+    args = [arg for arg in args if arg != '--stream']
+    if args:
+        filepath = args[0]
+        # zip 壓縮檔逐一解析其中的日誌成員
+        members = archive_members(filepath) if detect_compression(filepath) == 'zip' else [None]
+        for member in members:
+            if member is not None:
+                print(f"== {member} ==")
+            if streaming:
+                # 串流模式：會話結束時立即輸出摘要
+                print("會話摘要（串流）:")
+                for session in StreamingLogParser(filepath, member=member).iter_sessions():
+                    print(f"Session ID: {session['session_id']}, Start Line: {session['start_line']}, "
+                          f"Lines: {session['line_count']}, Errors: {session['error_count']}")
+            else:
+                parser = LogParser(filepath, member=member)
+                sessions_summary = parser.get_sessions_summary()
+                
+                print("會話摘要:")
+                for session in sessions_summary:
+                    print(f"Session ID: {session['session_id']}, Start Line: {session['start_line']}")
     else:
-        print("用法: python log_parser.py <日誌文件路徑>")
+        print("用法: python log_parser.py [--stream] <日誌文件路徑>")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 解析結果磁碟緩存
+以「檔案內容雜湊 + 解析器版本」為鍵，把行偏移、行索引及會話分析結果序列化保存在上傳目錄下，
+重新啟動或重複上傳同一份日誌時只需計算雜湊並載入，不必重新解析；
+緩存目錄總大小超過上限時，依最後使用時間淘汰最舊的項目。
+
+緩存目錄可能由多個 worker 程序共用，載入前先以每個部署各自的金鑰驗證 HMAC：
+沒有金鑰的人寫入或竄改的項目一律視為未命中，不會被反序列化
+"""
+
+import os
+import hmac
+import time
+import pickle
+import hashlib
+import secrets
+import threading
+from typing import Any, Optional
+
+# 緩存檔案副檔名
+CACHE_SUFFIX = '.pickle'
+
+# 緩存檔案開頭的格式標記，之後是 HMAC-SHA256（32 位元組）及序列化的內容
+CACHE_MAGIC = b'SDKLA-CACHE-1\n'
+MAC_BYTES = hashlib.sha256().digest_size
+
+# 自動產生的驗證金鑰長度（位元組）
+SECRET_BYTES = 32
+
+
+def content_hash(filepath: str, chunk_size: int = 1024 * 1024) -> str:
+    """以固定大小區塊計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_secret(secret: str = '', key_file: str = None) -> bytes:
+    """
+    緩存驗證金鑰：優先使用設定的字串，否則讀取 key_file；
+    金鑰檔不存在時產生隨機金鑰，以只有擁有者可讀寫的權限建立（多個程序同時建立時使用先建立者的金鑰）
+    """
+    if secret:
+        return secret.encode('utf-8')
+    try:
+        with open(key_file, 'rb') as f:
+            key = f.read()
+        if len(key) >= SECRET_BYTES:
+            return key
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(key_file)), exist_ok=True)
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # 其他程序正在建立金鑰檔：等待其寫入完成
+        for _ in range(100):
+            with open(key_file, 'rb') as f:
+                key = f.read()
+            if len(key) >= SECRET_BYTES:
+                return key
+            time.sleep(0.01)
+        raise Exception(f"緩存金鑰檔不完整: {key_file}")
+    key = secrets.token_bytes(SECRET_BYTES)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def sign(secret: bytes, name: str, data: bytes) -> bytes:
+    """以金鑰計算 (名稱, 內容) 的 HMAC-SHA256；名稱一併簽署，避免把某一項的內容換成另一項"""
+    return hmac.new(secret, name.encode('utf-8') + b'\0' + data, hashlib.sha256).digest()
+
+
+def verify(secret: bytes, name: str, data: bytes, mac: bytes) -> bool:
+    return hmac.compare_digest(sign(secret, name, data), mac)
+
+
+class ParseCache:
+    """
+    解析結果的磁碟緩存（任何讀寫錯誤都只會導致緩存未命中，不影響解析）
+    secret 為驗證緩存項目的金鑰（見 load_secret），同一部署的所有程序需使用同一金鑰
+    """
+
+    def __init__(self, directory: str, max_bytes: int, secret: bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.secret = secret
+
+    def key_for(self, filepath: str, version: str, digest: str = None, member: str = None) -> str:
+        """
+        緩存鍵：檔案內容雜湊 + 解析器版本（已知內容雜湊時不必重新讀取檔案）
+        zip 壓縮檔的各個成員另以成員名稱的雜湊區分
+        """
+        key = digest or content_hash(filepath)
+        if member is not None:
+            key += '-' + hashlib.sha256(member.encode('utf-8')).hexdigest()[:16]
+        return f"{key}-v{version}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        """緩存項目是否存在（不更新最後使用時間）"""
+        return os.path.exists(self._path(key))
+
+    def load(self, key: str) -> Optional[Any]:
+        """載入緩存項目，不存在、無法讀取或驗證失敗（非此部署寫入或已被竄改）時返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(len(CACHE_MAGIC) + MAC_BYTES)
+                data = f.read()
+            mac = header[len(CACHE_MAGIC):]
+            if not header.startswith(CACHE_MAGIC) or not verify(self.secret, key, data, mac):
+                print(f"[緩存管理] 解析緩存驗證失敗，略過: {key}")
+                return None
+            payload = pickle.loads(data)
+            # 更新修改時間作為最後使用時間（淘汰依據）
+            os.utime(path)
+            return payload
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[緩存管理] 無法讀取解析緩存 {key}: {str(e)}")
+            return None
+
+    def store(self, key: str, payload: Any):
+        """寫入緩存項目（先寫暫存檔再替換，避免留下不完整的檔案），並執行容量淘汰"""
+        path = self._path(key)
+        # 暫存檔名包含程序及線程ID：同一程序中多個線程並行寫入同一項目時互不覆寫
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(temp_path, 'wb') as f:
+                f.write(CACHE_MAGIC)
+                f.write(sign(self.secret, key, data))
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"[緩存管理] 無法寫入解析緩存 {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None):
+        """依最後使用時間由舊到新刪除緩存項目，直到總大小不超過上限"""
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(CACHE_SUFFIX):
+                    path = os.path.join(self.directory, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, name, path))
+        except FileNotFoundError:
+            return
+
+        total = sum(size for mtime, size, name, path in entries)
+        for mtime, size, name, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == (keep or '') + CACHE_SUFFIX:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                print(f"[緩存管理] 淘汰解析緩存: {name}")
+            except OSError:
+                pass
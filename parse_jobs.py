@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 背景解析工作
+上傳請求只儲存檔案並建立工作後立即返回工作ID，解析在工作池中執行；
+前端透過 /jobs/<id> 查詢進度（已處理位元組數、目前找到的會話）
+"""
+
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ParseJob:
+    """單一解析工作的狀態（由工作線程更新，由請求線程讀取）"""
+
+    def __init__(self, file_id: str, filename: str, bytes_total: int):
+        self.job_id = uuid.uuid4().hex
+        self.file_id = file_id
+        self.filename = filename
+        self.status = 'queued'  # queued → running → done / failed
+        self.bytes_total = bytes_total
+        self.bytes_processed = 0
+        self.sessions = []
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, bytes_processed: int, new_sessions: List[Dict[str, Any]]):
+        """解析器的進度回呼"""
+        with self._lock:
+            self.bytes_processed = bytes_processed
+            self.sessions.extend(new_sessions)
+
+    def finish(self, sessions: List[Dict[str, Any]], result: Any = None):
+        with self._lock:
+            self.status = 'done'
+            self.bytes_processed = self.bytes_total
+            self.sessions = list(sessions)
+            self.result = result
+            self.finished_at = datetime.now()
+
+    def fail(self, error: str):
+        with self._lock:
+            self.status = 'failed'
+            self.error = error
+            self.finished_at = datetime.now()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def to_dict(self, since: int = 0) -> Dict[str, Any]:
+        """工作狀態；since 指定時只返回第 since 個之後的會話（前端增量輪詢用）"""
+        with self._lock:
+            return {
+                'job_id': self.job_id,
+                'file_id': self.file_id,
+                'filename': self.filename,
+                'status': self.status,
+                'bytes_total': self.bytes_total,
+                'bytes_processed': self.bytes_processed,
+                'progress': round(self.bytes_processed / self.bytes_total, 4) if self.bytes_total else 1.0,
+                'sessions_found': len(self.sessions),
+                'sessions_offset': since,
+                'sessions': self.sessions[since:],
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None
+            }
+
+
+class ParseJobManager:
+    """背景解析工作池，保留最近 max_jobs 個工作的狀態"""
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='parse-job')
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_id: str, filename: str, bytes_total: int,
+               build_parser: Callable[[Callable], Any], on_done: Callable[[ParseJob, Any], None]) -> ParseJob:
+        """
+        建立並排入解析工作
+        build_parser(progress) 在工作線程中建立解析器並返回；成功後以 on_done(job, parser) 通知
+        """
+        job = ParseJob(file_id, filename, bytes_total)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._trim()
+        self.executor.submit(self._run, job, build_parser, on_done)
+        return job
+
+    def submit_task(self, file_id: str, filename: str, bytes_total: int,
+                    run: Callable[[ParseJob], Any]) -> ParseJob:
+        """
+        建立並排入不產生解析器的工作（如多檔案彙總分析）
+        run(job) 在工作線程中執行（可透過 job.report 回報進度），返回值保存在 job.result
+        """
+        job = ParseJob(file_id, filename, bytes_total)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._trim()
+        self.executor.submit(self._run_task, job, run)
+        return job
+
+    def start(self, file_id: str, filename: str, bytes_total: int) -> ParseJob:
+        """登記一個由呼叫端自行執行的解析工作（如邊接收上傳邊解析），狀態直接為 running"""
+        job = ParseJob(file_id, filename, bytes_total)
+        job.status = 'running'
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._trim()
+        return job
+
+    def _run(self, job: ParseJob, build_parser, on_done):
+        job.status = 'running'
+        try:
+            parser = build_parser(job.report)
+            on_done(job, parser)
+            job.finish(parser.get_sessions_summary())
+        except Exception as e:
+            print(f"[解析工作] {job.filename} 解析失敗: {str(e)}")
+            job.fail(f"Error parsing file: {str(e)}")
+
+    def _run_task(self, job: ParseJob, run):
+        job.status = 'running'
+        try:
+            job.finish([], run(job))
+        except Exception as e:
+            print(f"[解析工作] {job.filename} 執行失敗: {str(e)}")
+            job.fail(str(e))
+
+    def _trim(self):
+        """移除超出保留數量的已完成工作（由舊到新）"""
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished]:
+            if len(self.jobs) <= self.max_jobs:
+                break
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def active_job_for(self, file_id: str) -> Optional[ParseJob]:
+        """檔案目前尚未完成的解析工作"""
+        with self._lock:
+            for job in reversed(self.jobs.values()):
+                if job.file_id == file_id and not job.finished:
+                    return job
+        return None
+
+    def __len__(self):
+        return len(self.jobs)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 解析器記憶體緩存
+依最近使用順序保存已解析的檔案，除了項目數上限之外，以各解析器放入緩存時的近似常駐大小
+（行偏移、行索引、詞彙索引及分析結果）套用記憶體預算，並可讓閒置過久的項目過期；
+被淘汰的解析器把索引寫入磁碟解析緩存後只保留重新載入的記錄（溢出），
+之後再被查詢時以 loader 從磁碟緩存重新建立，不必重新上傳或重新解析。
+
+所有操作以鎖保護，可在多線程的伺服器中共用；鎖內只選出要淘汰的項目，溢出（寫入磁碟緩存）在鎖外進行，
+不會讓其他請求的緩存命中等待；同一檔案的重新載入只執行一次，並行請求等待同一個結果。
+指定 registry 目錄時，重新載入記錄另以檔案ID為鍵寫入該目錄的 JSON 檔（多個 worker 程序共用；
+只保存檔案路徑、壓縮檔成員、磁碟緩存鍵及解析器種類等資料，並以與磁碟緩存相同的金鑰簽署，驗證失敗的記錄不使用），
+任何程序都能從共用的磁碟解析緩存載入其他程序上傳的檔案；記錄被取代或刪除時，各程序記憶體中的舊解析器隨之失效
+"""
+
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from parse_cache import sign, verify
+from single_flight import SingleFlight
+
+# 最多保留的溢出項目數及共用登錄記錄數（每項只是一筆重新載入記錄）
+MAX_SPILLED_ENTRIES = 256
+
+# 共用登錄記錄的副檔名
+REGISTRY_SUFFIX = '.json'
+
+
+class ParserCache:
+    """
+    依大小及閒置時間淘汰的 LRU 解析器緩存（線程安全）
+    max_bytes 為 0 時不限制記憶體預算，ttl_seconds 為 0 時項目不過期；
+    最近加入或使用的項目即使單獨超過預算也會保留（至少緩存一個檔案）；
+    loader 以解析器 spill() 返回的記錄重新建立解析器，未提供時被淘汰的項目直接移除（不溢出）；
+    使用共用登錄時需提供 secret（簽署及驗證登錄記錄的金鑰）
+    """
+
+    def __init__(self, maxsize: int = 5, max_bytes: int = 0, ttl_seconds: float = 0, spill: bool = True,
+                 registry: str = None, loader: Callable[[Dict[str, Any]], Any] = None, secret: bytes = None):
+        if registry and not secret:
+            raise ValueError("共用登錄需提供簽署記錄的金鑰")
+        self.cache = OrderedDict()  # 鍵 → [解析器, 近似大小, 最後使用時間, 共用登錄記錄版本]
+        self.spilled = OrderedDict()  # 鍵 → 重新載入記錄（未使用共用登錄時）
+        self.spilling = {}  # 鍵 → (解析器, 近似大小, 共用登錄記錄版本)：已移出、正在鎖外溢出的項目
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_enabled = spill and loader is not None
+        self.loader = loader
+        self.registry = registry
+        self.secret = secret
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spills = 0
+        self.reloads = 0
+        self._lock = threading.RLock()
+        self._loads = SingleFlight()
+
+    @staticmethod
+    def _measure(parser) -> int:
+        try:
+            return parser.memory_size()
+        except Exception:
+            return 0
+
+    def get(self, key, count: bool = True):
+        """
+        獲取緩存項並標記為最近使用；已溢出或只存在於共用登錄的項目從磁碟緩存重新載入
+        count 為 False 時不計入命中/未命中（如追蹤模式定期確認解析器是否仍在緩存中）
+        """
+        with self._lock:
+            victims = self._expire()
+            entry = self.cache.get(key)
+            if entry is not None and not self._is_current(key, entry):
+                # 其他程序已取代或移除此檔案
+                self._discard(key)
+                entry = None
+            if entry is not None:
+                if count:
+                    self.hits += 1
+                self.cache.move_to_end(key)
+                entry[2] = time.monotonic()
+        self._spill(victims)
+        if entry is not None:
+            return entry[0]
+
+        parser = self._loads.do(key, lambda: self._reload(key))
+        if count:
+            with self._lock:
+                if parser is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return parser
+
+    def set(self, key, value):
+        """
+        設置緩存項（取代同鍵的舊項目、溢出記錄及共用登錄記錄），
+        超過項目數或記憶體預算時淘汰最舊的項目；估算大小及寫入共用登錄都在鎖外進行
+        """
+        size = self._measure(value)
+        version = self._write_record(key, value) if self.registry else None
+        with self._lock:
+            self.spilled.pop(key, None)
+            self.spilling.pop(key, None)
+            victims = self._insert(key, value, size, version)
+        self._spill(victims)
+
+    def pop(self, key):
+        """移除並返回緩存項（一併移除溢出記錄及共用登錄記錄），不存在或已溢出時返回 None"""
+        with self._lock:
+            self.spilled.pop(key, None)
+            spilling = self.spilling.pop(key, None)
+            if self.registry:
+                self._remove_record(key)
+            parser = self._discard(key)
+            return parser if parser is not None or spilling is None else spilling[0]
+
+    def _insert(self, key, value, size: int, version) -> list:
+        """放入緩存（呼叫端持有鎖），返回被淘汰、待溢出的項目"""
+        previous = self.cache.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[1]
+        self.cache[key] = [value, size, time.monotonic(), version]
+        self.total_bytes += size
+        return self._expire() + self._enforce_limits()
+
+    def _discard(self, key):
+        """只從記憶體移除（不溢出、不計入淘汰），返回被移除的解析器"""
+        entry = self.cache.pop(key, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry[1]
+        return entry[0]
+
+    def _reload(self, key):
+        """
+        從磁碟緩存重新建立已溢出（或其他程序登錄）的解析器並放回緩存，
+        沒有可用的記錄或載入失敗（如檔案已刪除）時返回 None；載入期間不持有鎖
+        """
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                # 等待鎖期間已由其他線程載入
+                return entry[0]
+            spilling = self.spilling.pop(key, None)
+            victims = []
+            if spilling is not None:
+                # 仍在溢出中：直接放回原本的解析器
+                parser, size, version = spilling
+                victims = self._insert(key, parser, size, version)
+            record = self.spilled.pop(key, None)
+        if spilling is not None:
+            self._spill(victims)
+            return parser
+
+        version = None
+        if record is None and self.registry:
+            record, version = self._read_record(key)
+        if record is None or self.loader is None:
+            return None
+        try:
+            parser = self.loader(record)
+            parser.get_sessions_summary()
+        except Exception as e:
+            print(f"[緩存管理] 無法重新載入溢出的緩存 {key}: {str(e)}")
+            return None
+        print(f"[緩存管理] 從磁碟重新載入: {key}")
+        size = self._measure(parser)
+        with self._lock:
+            self.reloads += 1
+            victims = self._insert(key, parser, size, version)
+        self._spill(victims)
+        return parser
+
+    def _expire(self) -> list:
+        """淘汰閒置超過 ttl_seconds 的項目（呼叫端持有鎖），返回待溢出的項目"""
+        if not self.ttl_seconds:
+            return []
+        deadline = time.monotonic() - self.ttl_seconds
+        victims = []
+        for key in [key for key, entry in self.cache.items() if entry[2] < deadline]:
+            self.expirations += 1
+            victims.append(self._evict(key, '過期'))
+        return victims
+
+    def _enforce_limits(self) -> list:
+        """
+        依最近使用順序淘汰最舊的項目，直到項目數與總大小都不超過上限（保留最新的一項）；
+        呼叫端持有鎖，返回待溢出的項目
+        """
+        victims = []
+        while len(self.cache) > 1 and (len(self.cache) > self.maxsize
+                                       or (self.max_bytes and self.total_bytes > self.max_bytes)):
+            victims.append(self._evict(next(iter(self.cache)), '超過上限'))
+        return victims
+
+    def _evict(self, key, reason: str) -> tuple:
+        """
+        移出緩存並暫存於溢出中的項目（呼叫端持有鎖），返回 (鍵, 解析器, 大小, 共用登錄記錄版本, 原因)；
+        實際溢出由 _spill() 在鎖外進行，溢出完成前同一鍵的查詢直接取回原本的解析器
+        """
+        parser, size, last_used, version = self.cache.pop(key)
+        self.total_bytes -= size
+        self.evictions += 1
+        self.spilling[key] = (parser, size, version)
+        return key, parser, size, version, reason
+
+    def _spill(self, victims: list):
+        """
+        在鎖外溢出被淘汰的解析器：可溢出的解析器改為保存重新載入記錄（使用共用登錄時登錄記錄已保存該記錄）
+        被移出的解析器不立即關閉（仍在處理中的請求可能正在使用，由垃圾回收釋放映射）
+        """
+        for key, parser, size, version, reason in victims:
+            record = None
+            if self.spill_enabled and hasattr(parser, 'spill'):
+                try:
+                    record = parser.spill()
+                except Exception as e:
+                    print(f"[緩存管理] 無法溢出緩存 {key}: {str(e)}")
+            with self._lock:
+                spilling = self.spilling.get(key)
+                if spilling is None or spilling[0] is not parser:
+                    # 溢出期間已被重新載入、取代或移除
+                    continue
+                del self.spilling[key]
+                if record is not None:
+                    self.spills += 1
+                    if version is None:
+                        self.spilled[key] = record
+                        while len(self.spilled) > MAX_SPILLED_ENTRIES:
+                            self.spilled.popitem(last=False)
+                action = '溢出到磁碟' if record is not None else '移除'
+                print(f"[緩存管理] {action}（{reason}）: {key} ({size / 1024 / 1024:.1f}MB, "
+                      f"當前緩存: {len(self.cache)}/{self.maxsize}, {self.total_bytes / 1024 / 1024:.1f}MB)")
+
+    def _record_path(self, key) -> str:
+        return os.path.join(self.registry, hashlib.sha256(str(key).encode('utf-8')).hexdigest() + REGISTRY_SUFFIX)
+
+    @staticmethod
+    def _record_version(path: str) -> Optional[tuple]:
+        """登錄記錄的版本（每次寫入都替換為新檔案），不存在時返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _is_current(self, key, entry) -> bool:
+        """記憶體中的項目是否仍對應共用登錄中的記錄（沒有登錄記錄的項目一律有效）"""
+        return entry[3] is None or self._record_version(self._record_path(key)) == entry[3]
+
+    def _write_record(self, key, parser) -> Optional[tuple]:
+        """把重新載入記錄及其簽章以 JSON 寫入共用登錄（先寫暫存檔再替換），無法溢出的解析器移除既有記錄"""
+        path = self._record_path(key)
+        record = None
+        if self.spill_enabled and hasattr(parser, 'spill'):
+            try:
+                record = parser.spill()
+            except Exception as e:
+                print(f"[緩存管理] 無法登錄緩存 {key}: {str(e)}")
+        if record is None:
+            self._remove_record(key)
+            return None
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.registry, exist_ok=True)
+            data = json.dumps(record, ensure_ascii=False, sort_keys=True)
+            signature = sign(self.secret, str(key), data.encode('utf-8')).hex()
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'record': data, 'signature': signature}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"[緩存管理] 無法寫入共用登錄 {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        self._prune_records()
+        return self._record_version(path)
+
+    def _read_record(self, key) -> tuple:
+        """
+        讀取共用登錄中的 (重新載入記錄, 記錄版本)，
+        不存在、無法讀取、簽章不符（非此部署寫入或已被竄改）或格式不符時返回 (None, None)
+        """
+        path = self._record_path(key)
+        version = self._record_version(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                signed = json.load(f)
+            data = signed['record']
+            if not verify(self.secret, str(key), data.encode('utf-8'), bytes.fromhex(signed['signature'])):
+                raise ValueError('signature mismatch')
+            record = json.loads(data)
+            if not isinstance(record, dict):
+                raise ValueError('record is not an object')
+            return record, version
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            print(f"[緩存管理] 無法讀取共用登錄 {key}: {str(e)}")
+            return None, None
+
+    def _remove_record(self, key):
+        try:
+            os.remove(self._record_path(key))
+        except OSError:
+            pass
+
+    def _prune_records(self):
+        """共用登錄記錄超過 MAX_SPILLED_ENTRIES 時刪除最舊的記錄"""
+        try:
+            records = [entry for entry in os.scandir(self.registry) if entry.name.endswith(REGISTRY_SUFFIX)]
+            if len(records) <= MAX_SPILLED_ENTRIES:
+                return
+            records.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in records[:len(records) - MAX_SPILLED_ENTRIES]:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """緩存狀態及命中/未命中/淘汰計數"""
+        with self._lock:
+            return {
+                'entries': len(self.cache),
+                'max_entries': self.maxsize,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'spilled': len(self.spilled),
+                'shared': self.registry is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'spills': self.spills,
+                'reloads': self.reloads
+            }
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __len__(self):
+        with self._lock:
+            victims = self._expire()
+            size = len(self.cache)
+        self._spill(victims)
+        return size
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 全文搜尋索引
+以詞彙（英數字與底線組成的字串，轉為小寫）為鍵建立 詞彙 → 行號 的倒排索引；
+查詢時先從索引取得一定包含查詢中詞彙的候選行，再以實際的比對確認，
+不必每次搜尋都掃描所有行
+"""
+
+import re
+from array import array
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from line_index import CONTAINER_ENTRY_BYTES, array_bytes
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# 詞彙的組成字元（索引與查詢使用相同的切分規則，候選行才不會遺漏）
+TOKEN_PATTERN = re.compile(r'[0-9A-Za-z_]+')
+
+# 短於此長度的詞彙及純數字詞彙（時間戳、線程ID等幾乎每行都不同）不建立索引
+MIN_TOKEN_LENGTH = 3
+
+# 每頁搜尋結果的預設及最大數量、前後文行數上限
+DEFAULT_SEARCH_RESULTS = 100
+MAX_SEARCH_RESULTS = 1000
+MAX_SEARCH_CONTEXT = 10
+
+
+def _indexable(token: str) -> bool:
+    return len(token) >= MIN_TOKEN_LENGTH and not token.isdigit()
+
+
+def compile_search(query: str, regex: bool = False, case_sensitive: bool = False):
+    """把查詢編譯為正則表達式（字面查詢先跳脫）；正則表達式無效時拋出 ValueError"""
+    if not query:
+        raise ValueError('Search query is empty')
+    flags = 0 if case_sensitive else re.IGNORECASE
+    try:
+        return re.compile(query if regex else re.escape(query), flags)
+    except re.error as e:
+        raise ValueError(f'Invalid regular expression: {e}')
+
+
+def text_fragments(text: str) -> List[Tuple[str, bool, bool]]:
+    """
+    一段必定出現在匹配行中的文字所包含的詞彙 [(小寫詞彙, 左側開放, 右側開放)]
+    位於文字開頭或結尾的詞彙可能只是行中某個較長詞彙的一部分，以「開放」標記
+    """
+    fragments = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if _indexable(token):
+            fragments.append((token, match.start() == 0, match.end() == len(text)))
+    return fragments
+
+
+def _required_literals(parsed) -> List[str]:
+    """正則表達式語法樹中每個匹配都必定包含的字面字串（只處理循序結構，分支及可省略的部分略過）"""
+    literals = []
+    current = []
+
+    def flush():
+        if current:
+            literals.append(''.join(current))
+            current.clear()
+
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            current.append(chr(av))
+        elif op == sre_parse.SUBPATTERN:
+            flush()
+            literals.extend(_required_literals(av[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT,
+                    getattr(sre_parse, 'POSSESSIVE_REPEAT', None)) and av[0] >= 1:
+            flush()
+            literals.extend(_required_literals(av[2]))
+        else:
+            flush()
+    flush()
+    return literals
+
+
+def query_fragments(query: str, regex: bool = False) -> List[Tuple[str, bool, bool]]:
+    """查詢中可用來縮小候選行的詞彙；無法分析的正則表達式返回空列表（需逐行掃描）"""
+    if not regex:
+        return text_fragments(query)
+    try:
+        literals = _required_literals(sre_parse.parse(query))
+    except Exception:
+        return []
+    return [fragment for literal in literals for fragment in text_fragments(literal)]
+
+
+class TokenIndex:
+    """詞彙 → 包含該詞彙的行號（0-based，遞增）的倒排索引，可隨檔案附加新行逐步擴充"""
+
+    def __init__(self):
+        self.postings = {}
+        self.line_count = 0
+
+    @classmethod
+    def build(cls, lines: Iterable[str]) -> 'TokenIndex':
+        index = cls()
+        index.extend(lines)
+        return index
+
+    def extend(self, lines: Iterable[str]):
+        """依序加入新行（行號接續目前的行數）"""
+        postings = self.postings
+        line_num = self.line_count
+        for line in lines:
+            for token in {token.lower() for token in TOKEN_PATTERN.findall(line)}:
+                if _indexable(token):
+                    posting = postings.get(token)
+                    if posting is None:
+                        posting = postings[token] = array('I')
+                    posting.append(line_num)
+            line_num += 1
+        self.line_count = line_num
+
+    def memory_size(self) -> int:
+        """近似常駐位元組數（詞彙表項目及行號陣列）"""
+        return sum(array_bytes(lines) for lines in self.postings.values()) \
+            + len(self.postings) * CONTAINER_ENTRY_BYTES
+
+    def _fragment_lines(self, token: str, left_open: bool, right_open: bool) -> set:
+        """可能包含此詞彙的行：兩側封閉時查詢完全相同的詞彙，否則比對詞彙表中的前綴/後綴/子字串"""
+        if not left_open and not right_open:
+            return set(self.postings.get(token, ()))
+        if left_open and right_open:
+            words = [word for word in self.postings if token in word]
+        elif left_open:
+            words = [word for word in self.postings if word.endswith(token)]
+        else:
+            words = [word for word in self.postings if word.startswith(token)]
+        return set().union(*(self.postings[word] for word in words))
+
+    def candidates(self, fragments: List[Tuple[str, bool, bool]]) -> Optional[List[int]]:
+        """同時可能包含所有詞彙的行號（遞增）；沒有可用的詞彙時返回 None（所有行都是候選）"""
+        result = None
+        # 封閉的詞彙直接查表，先處理以盡早縮小交集
+        for token, left_open, right_open in sorted(set(fragments), key=lambda f: (f[1] or f[2], -len(f[0]))):
+            lines = self._fragment_lines(token, left_open, right_open)
+            result = lines if result is None else result & lines
+            if not result:
+                return []
+        return sorted(result) if result is not None else None
+
+
+def match_spans(pattern, line: str) -> List[List[int]]:
+    """行中所有匹配的 [起始, 結束] 位置（供前端標示）"""
+    return [[match.start(), match.end()] for match in pattern.finditer(line) if match.end() > match.start()]
+
+
+def search_lines(candidates: Iterable[int], get_line: Callable[[int], str], pattern,
+                 accept: Callable[[int], bool] = None) -> List[int]:
+    """依序確認候選行，返回符合篩選條件且實際匹配的行號"""
+    search = pattern.search
+    return [i for i in candidates if (accept is None or accept(i)) and search(get_line(i))]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 時間序列降採樣
+圖表只需要數百到數千個點，長時間會話的指標序列先在伺服器端降採樣，
+回應大小只取決於要求的點數，與會話長度無關
+"""
+
+from typing import List, Sequence
+
+# 降採樣方式
+DOWNSAMPLE_MODES = ('lttb', 'minmax')
+
+# 每個序列回應的預設及最大點數
+DEFAULT_SERIES_POINTS = 1000
+MAX_SERIES_POINTS = 5000
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets：保留首尾兩點，其餘每個桶選出與前一個選中點及下一桶平均點
+    構成最大三角形面積的點，能在少量點數下保留序列的視覺形狀
+    返回選中點的索引（遞增）
+    """
+    count = len(ys)
+    threshold = max(threshold, 3)
+    if threshold >= count:
+        return list(range(count))
+
+    selected = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # 下一桶的平均點（最後一桶以最後一點代替）
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[count - 1], ys[count - 1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        prev_x, prev_y = xs[previous], ys[previous]
+        best_area = -1.0
+        best = start
+        for i in range(start, end):
+            area = abs((prev_x - avg_x) * (ys[i] - prev_y) - (prev_x - xs[i]) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best = i
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
+
+
+def minmax_indices(ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    最小/最大值分桶：把序列切成 threshold // 2 個桶，每桶保留最小值與最大值兩點（依原順序），
+    確保尖峰不會在降採樣中消失
+    """
+    count = len(ys)
+    buckets = max(threshold // 2, 1)
+    if count <= threshold:
+        return list(range(count))
+
+    selected = []
+    bucket_size = count / buckets
+    for bucket in range(buckets):
+        start = int(bucket * bucket_size)
+        end = int((bucket + 1) * bucket_size) if bucket < buckets - 1 else count
+        if start >= end:
+            continue
+        low = high = start
+        for i in range(start + 1, end):
+            if ys[i] < ys[low]:
+                low = i
+            elif ys[i] > ys[high]:
+                high = i
+        selected.extend(sorted({low, high}))
+    return selected
+
+
+def downsample_indices(xs: Sequence[float], ys: Sequence[float], points: int, mode: str = 'lttb') -> List[int]:
+    """依指定方式選出最多 points 個點的索引"""
+    if mode == 'minmax':
+        return minmax_indices(ys, points)
+    if mode == 'lttb':
+        return lttb_indices(xs, ys, points)
+    raise ValueError(f"未知的降採樣方式: {mode}")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SDK日誌分析器 - 單次執行（single-flight）
+同一個鍵的計算同時被多個請求線程觸發時只執行一次，其餘線程等待並共用同一個結果（或例外），
+避免並行請求對同一檔案/會話重複解析或分析
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """以鍵區分的進行中計算表（計算結束後即移除，不保存結果）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """執行 compute 並返回結果；同一鍵已有計算進行中時等待該計算的結果"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -2,6 +2,10 @@
 
 let currentFileId = null;
 let currentSessions = [];
+// zip 壓縮檔中的日誌檔案列表（[{file_id, filename}]）
+let currentFiles = [];
+// 追蹤模式的 Server-Sent Events 連線
+let followSource = null;
 
 // 阻止預設行為
 function preventDefaults(e) {
@@ -33,16 +37,17 @@ async function uploadFile(file) {
     const progressText = document.getElementById('progressText');
 
     // 檢查檔案類型
-    const allowedExtensions = ['.txt', '.log'];
+    const allowedExtensions = ['.txt', '.log', '.gz', '.zst', '.zip'];
     const fileName = file.name.toLowerCase();
     if (!allowedExtensions.some(ext => fileName.endsWith(ext))) {
-        showError('Only .txt and .log file formats are supported');
+        showError('Only .txt, .log, .gz, .zst and .zip file formats are supported');
         return;
     }
 
-    // 檢查檔案大小 (100MB)
-    if (file.size > 100 * 1024 * 1024) {
-        showError('File size cannot exceed 100MB');
+    // 檢查檔案大小（上限由伺服器設定）
+    const maxUploadMB = window.MAX_UPLOAD_MB || 100;
+    if (file.size > maxUploadMB * 1024 * 1024) {
+        showError(`File size cannot exceed ${maxUploadMB}MB`);
         return;
     }
 
@@ -50,35 +55,180 @@ async function uploadFile(file) {
     uploadProgress.style.display = 'block';
     progressText.textContent = 'Uploading and parsing file...';
 
-    const formData = new FormData();
-    formData.append('file', file);
+    stopFollow();
+    currentFileId = null;
+    currentSessions = [];
+    let uploading = true;
+    // 檔案ID在上傳完成後才由內容雜湊決定，上傳期間以隨機的上傳ID查詢解析進度
+    const uploadId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
 
     try {
-        const response = await fetch('/upload', {
-            method: 'POST',
-            body: formData
-        });
+        // 串流上傳：檔案內容直接作為請求本文，伺服器邊接收邊寫入磁碟並解析；
+        // 上傳期間輪詢解析工作，逐步顯示已找到的會話
+        const polling = pollParseJob(`/file/${uploadId}/job`, file.name, () => uploading);
+        let data;
+        try {
+            const response = await fetch(`/upload/stream?filename=${encodeURIComponent(file.name)}&upload_id=${uploadId}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file
+            });
+            data = await response.json();
+        } finally {
+            uploading = false;
+            await polling;
+        }
 
-        const data = await response.json();
         uploadProgress.style.display = 'none';
         uploadArea.style.display = 'block';
 
         if (data.success) {
             currentFileId = data.file_id;
             currentSessions = data.sessions;
+            renderFileSelect(data.files || []);
             renderSessions(data.filename);
             showSessionsList();
         } else {
+            backToUpload();
             showError(data.error || 'Upload failed');
         }
     } catch (error) {
         uploadProgress.style.display = 'none';
         uploadArea.style.display = 'block';
+        backToUpload();
         showError('Network error or no response from server');
         console.error('Upload error:', error);
     }
 }
 
+// zip 壓縮檔包含多個日誌時顯示檔案選單
+function renderFileSelect(files) {
+    currentFiles = files;
+    const select = document.getElementById('archiveFileSelect');
+    if (!select) {
+        return;
+    }
+    select.style.display = files.length > 1 ? 'inline-block' : 'none';
+    select.innerHTML = files.map(f => `<option value="${f.file_id}">${f.filename}</option>`).join('');
+    select.value = currentFileId;
+}
+
+// 切換到壓縮檔中的另一個日誌檔案
+async function switchFile(fileId) {
+    try {
+        const response = await fetch(`/file/${encodeURIComponent(fileId)}/sessions`);
+        const data = await response.json();
+        if (!data.success) {
+            showError(data.error || 'Failed to load sessions');
+            return;
+        }
+        const file = currentFiles.find(f => f.file_id === fileId);
+        currentFileId = fileId;
+        currentSessions = data.sessions;
+        document.getElementById('searchResults').style.display = 'none';
+        renderSessions(file ? file.filename : fileId);
+        showSessionsList();
+    } catch (error) {
+        showError('Network error or no response from server');
+        console.error('Switch file error:', error);
+    }
+}
+
+// 開始追蹤持續寫入中的日誌檔案，新會話由 Server-Sent Events 推送
+async function startFollow() {
+    const path = document.getElementById('followPathInput').value.trim();
+    if (!path) {
+        showError('Log file path is empty');
+        return;
+    }
+
+    try {
+        const response = await fetch('/follow', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ path })
+        });
+        const data = await response.json();
+        if (!data.success) {
+            showError(data.error || 'Failed to follow file');
+            return;
+        }
+
+        stopFollow();
+        currentFileId = data.file_id;
+        currentSessions = data.sessions;
+        renderFileSelect([]);
+        const title = `${data.filename} (${t('followLive')})`;
+        renderSessions(title);
+        showSessionsList();
+
+        followSource = new EventSource(`/file/${encodeURIComponent(data.file_id)}/follow`);
+        followSource.addEventListener('update', event => {
+            const update = JSON.parse(event.data);
+            // 檔案被截斷或輪替時會話列表整個重建
+            currentSessions = update.reset ? update.new_sessions : currentSessions.concat(update.new_sessions);
+            if (currentFileId === data.file_id) {
+                renderSessions(title);
+            }
+        });
+        followSource.addEventListener('end', stopFollow);
+        followSource.addEventListener('error', event => {
+            if (event.data) {
+                showError(JSON.parse(event.data).error);
+                stopFollow();
+            }
+        });
+    } catch (error) {
+        showError('Network error or no response from server');
+        console.error('Follow error:', error);
+    }
+}
+
+// 停止追蹤
+function stopFollow() {
+    if (followSource) {
+        followSource.close();
+        followSource = null;
+    }
+}
+
+// 解析工作的輪詢間隔（毫秒）
+const JOB_POLL_INTERVAL_MS = 500;
+
+// 輪詢解析工作（/jobs/<id> 或 /file/<id>/job），解析期間逐步顯示已找到的會話；
+// isActive() 返回 false 或工作結束時停止，返回最後取得的工作狀態
+async function pollParseJob(jobUrl, filename, isActive = () => true) {
+    const progressText = document.getElementById('progressText');
+    let job = null;
+
+    while (isActive()) {
+        try {
+            const response = await fetch(`${jobUrl}?since=${currentSessions.length}`);
+            const data = await response.json();
+            // 工作尚未登記（上傳剛開始）時返回 404，繼續輪詢
+            if (data.success) {
+                job = data.job;
+                if (job.status === 'done' || job.status === 'failed') {
+                    return job;
+                }
+
+                currentSessions = currentSessions.concat(job.sessions);
+                const percent = Math.round(job.progress * 100);
+                progressText.textContent = `Uploading and parsing file... ${percent}% (${job.sessions_found} sessions found)`;
+                if (currentSessions.length > 0) {
+                    renderSessions(`${filename} (parsing ${percent}%)`);
+                    showSessionsList();
+                }
+            }
+        } catch (error) {
+            console.error('Parse job polling error:', error);
+        }
+
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    return job;
+}
+
 // 顯示會話列表
 function showSessionsList() {
     document.getElementById('uploadSection').style.display = 'none';
@@ -185,14 +335,134 @@ function displaySessionDetails(sessionId, sessionDetails, threadAnalysis) {
     detailSection.innerHTML = generateSessionDetailHTML(sessionId, sessionDetails, threadAnalysis);
     detailSection.style.display = 'block';
     
-    // 渲染延遲圖表（如果有數據）
-    const metrics = sessionDetails.performance_metrics || {};
-    if (metrics.latency_timeline && metrics.latency_timeline.length > 0) {
-        // 延遲渲染圖表，確保 canvas 元素已存在
-        setTimeout(() => renderLatencyChart(metrics.latency_timeline), 100);
+    // 渲染指標圖表（序列由伺服器降採樣後另行載入）
+    loadSeriesCharts(sessionId, sessionDetails.performance_metrics || {});
+    
+    // 載入會話日誌第一頁
+    loadSessionLogPage(sessionId, 0);
+}
+
+// 日誌檢視每頁行數（伺服器直接從行索引取出該頁）
+const SESSION_LOG_PAGE_LINES = 500;
+
+// 載入會話日誌的一頁
+async function loadSessionLogPage(sessionId, fromLine) {
+    const view = document.getElementById('sessionLogView');
+    if (!view) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`/session/${encodeURIComponent(currentFileId)}/${encodeURIComponent(sessionId)}/log?from_line=${fromLine}&limit=${SESSION_LOG_PAGE_LINES}`);
+        const data = await response.json();
+        if (!data.success) {
+            view.textContent = data.error || 'Unable to load session log';
+            return;
+        }
+
+        view.textContent = data.lines.map(line => line.text).join('\n');
+        view.scrollTop = 0;
+
+        const lastLine = data.lines.length > 0 ? data.lines[data.lines.length - 1].index + 1 : data.from_line;
+        document.getElementById('sessionLogRange').textContent =
+            `${data.lines.length > 0 ? data.from_line + 1 : 0} - ${lastLine} / ${data.total_lines} ${t('lines')}`;
+
+        const previousButton = document.getElementById('sessionLogPrevious');
+        previousButton.disabled = data.from_line === 0;
+        previousButton.onclick = () => loadSessionLogPage(sessionId, Math.max(data.from_line - SESSION_LOG_PAGE_LINES, 0));
+
+        const nextButton = document.getElementById('sessionLogNext');
+        nextButton.disabled = data.next_from_line === null;
+        nextButton.onclick = () => loadSessionLogPage(sessionId, data.next_from_line);
+    } catch (error) {
+        console.error('Session log page error:', error);
     }
 }
 
+// 圖表最多顯示的點數（伺服器端降採樣，回應大小與會話長度無關）
+const SERIES_CHART_POINTS = 1000;
+
+// 指標序列圖表：序列名稱 → canvas ID 及標題翻譯鍵（識別延遲使用既有的延遲圖表）
+const SERIES_CHARTS = {
+    'unacknowledged_audio_durations': { canvasId: 'unackAudioChart', labelKey: 'unackAudioChart' },
+    'queue_times': { canvasId: 'queueTimeChart', labelKey: 'queueTimeChart' },
+    'frame_durations': { canvasId: 'frameDurationChart', labelKey: 'frameDurationChart' }
+};
+
+// 指標序列是否有數值
+function hasSeries(metrics, key) {
+    const stats = (metrics.series_stats || {})[key];
+    return Boolean(stats && stats.count > 0);
+}
+
+// 取得降採樣後的指標序列
+async function fetchSeries(sessionId, metric) {
+    const response = await fetch(`/session/${encodeURIComponent(currentFileId)}/${encodeURIComponent(sessionId)}/series/${metric}?points=${SERIES_CHART_POINTS}`);
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.error || 'Unable to load metric series');
+    }
+    return data.points;
+}
+
+// 載入並渲染會話的所有指標圖表
+async function loadSeriesCharts(sessionId, metrics) {
+    try {
+        if (hasSeries(metrics, 'recognition_latencies')) {
+            const points = await fetchSeries(sessionId, 'recognition_latencies');
+            renderLatencyChart(points.map(p => ({ index: p.index, timestamp: p.timestamp, latency: p.value })));
+        }
+        for (const [metric, chart] of Object.entries(SERIES_CHARTS)) {
+            if (hasSeries(metrics, metric)) {
+                renderSeriesChart(chart.canvasId, t(chart.labelKey), await fetchSeries(sessionId, metric));
+            }
+        }
+    } catch (error) {
+        console.error('Series chart error:', error);
+    }
+}
+
+// 渲染一般指標序列圖表
+function renderSeriesChart(canvasId, label, points) {
+    const canvas = document.getElementById(canvasId);
+    if (!canvas) {
+        return;
+    }
+
+    new Chart(canvas.getContext('2d'), {
+        type: 'line',
+        data: {
+            labels: points.map(p => p.timestamp !== null ? `${p.timestamp} ms` : `#${p.index + 1}`),
+            datasets: [{
+                label: label,
+                data: points.map(p => p.value),
+                borderColor: 'rgb(54, 162, 235)',
+                borderWidth: 1.5,
+                fill: false,
+                tension: 0,
+                pointRadius: 0,
+                pointHoverRadius: 4
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: true,
+            animation: false,
+            interaction: {
+                mode: 'index',
+                intersect: false
+            },
+            plugins: {
+                legend: { display: true, position: 'top' }
+            },
+            scales: {
+                y: { beginAtZero: true },
+                x: { ticks: { maxTicksLimit: 10 } }
+            }
+        }
+    });
+}
+
 // 渲染延遲時間圖表
 function renderLatencyChart(latencyTimeline) {
     const canvas = document.getElementById('latencyChart');
@@ -375,13 +645,21 @@ function generateSessionDetailHTML(sessionId, sessionDetails, threadAnalysis) {
                 </div>
 
                 <!-- Latency Chart -->
-                ${metrics.latency_timeline && metrics.latency_timeline.length > 0 ? `
+                ${hasSeries(metrics, 'recognition_latencies') ? `
                 <div class="detail-card full-width">
                     <h3><i class="fas fa-chart-line"></i> <span data-i18n="latencyChart">${t('latencyChart')}</span></h3>
                     <canvas id="latencyChart" height="80"></canvas>
                 </div>
                 ` : ''}
 
+                <!-- Metric Series Charts -->
+                ${Object.entries(SERIES_CHARTS).filter(([metric]) => hasSeries(metrics, metric)).map(([metric, chart]) => `
+                <div class="detail-card full-width">
+                    <h3><i class="fas fa-chart-area"></i> <span data-i18n="${chart.labelKey}">${t(chart.labelKey)}</span></h3>
+                    <canvas id="${chart.canvasId}" height="80"></canvas>
+                </div>
+                `).join('')}
+
                 <!-- Recognition Results -->
                 ${recognitionResults.length > 0 ? `
                 <div class="detail-card full-width">
@@ -434,6 +712,21 @@ function generateSessionDetailHTML(sessionId, sessionDetails, threadAnalysis) {
                     </div>
                 </div>
                 ` : ''}
+
+                <!-- Paged Session Log -->
+                <div class="detail-card full-width">
+                    <h3><i class="fas fa-file-alt"></i> ${t('sessionLogViewer')}</h3>
+                    <div class="log-pager">
+                        <button class="btn-secondary" id="sessionLogPrevious" disabled>
+                            <i class="fas fa-chevron-left"></i> ${t('previousPage')}
+                        </button>
+                        <span id="sessionLogRange" class="log-pager-range"></span>
+                        <button class="btn-secondary" id="sessionLogNext" disabled>
+                            ${t('nextPage')} <i class="fas fa-chevron-right"></i>
+                        </button>
+                    </div>
+                    <pre id="sessionLogView" class="session-log-view"></pre>
+                </div>
             </div>
         </div>
     `;
@@ -820,6 +1113,9 @@ function backToUpload() {
     document.getElementById('uploadSection').style.display = 'block';
     currentFileId = null;
     currentSessions = [];
+    renderFileSelect([]);
+    stopFollow();
+    document.getElementById('searchResults').style.display = 'none';
     
     // 重置檔案輸入
     const fileInput = document.getElementById('fileInput');
@@ -828,6 +1124,59 @@ function backToUpload() {
     }
 }
 
+// 每次搜尋顯示的結果數量
+const SEARCH_RESULT_LIMIT = 100;
+
+// 以伺服器端詞彙索引搜尋目前檔案
+async function searchLog() {
+    const query = document.getElementById('searchInput').value;
+    const container = document.getElementById('searchResults');
+    if (!query || !currentFileId) {
+        container.style.display = 'none';
+        return;
+    }
+
+    const params = new URLSearchParams({ q: query, limit: SEARCH_RESULT_LIMIT });
+    if (document.getElementById('searchRegex').checked) {
+        params.set('regex', '1');
+    }
+
+    try {
+        const response = await fetch(`/file/${encodeURIComponent(currentFileId)}/search?${params}`);
+        const data = await response.json();
+        if (!data.success) {
+            showError(data.error || 'Search failed');
+            return;
+        }
+
+        container.innerHTML = `
+            <p class="search-summary">${data.total_matches} ${t('searchMatches')} (${data.elapsed_ms} ms)</p>
+            ${data.results.map(result => `
+                <div class="search-result">
+                    <span class="search-line">${t('line')} ${result.line_number}</span>
+                    <code>${highlightSpans(result.text, result.spans)}</code>
+                </div>
+            `).join('')}
+        `;
+        container.style.display = 'block';
+    } catch (error) {
+        showError('Network error occurred while searching');
+        console.error('Search error:', error);
+    }
+}
+
+// 以 <mark> 標示匹配位置（其餘文字先跳脫）
+function highlightSpans(text, spans) {
+    const escape = value => value.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    let html = '';
+    let position = 0;
+    for (const [start, end] of spans) {
+        html += escape(text.slice(position, start)) + '<mark>' + escape(text.slice(start, end)) + '</mark>';
+        position = end;
+    }
+    return html + escape(text.slice(position));
+}
+
 // 顯示載入遮罩
 function showLoading(message = 'Loading...') {
     let overlay = document.getElementById('loadingOverlay');
@@ -863,7 +1212,7 @@ const ERROR_SOLUTIONS = {
     },
     'File too large': {
         title: 'File too large',
-        solution: 'File exceeds 100MB limit. Suggested: Split log file and upload again'
+        solution: 'File exceeds the upload size limit. Suggested: Split log file or raise SDK_LOG_ANALYZER_MAX_UPLOAD_MB'
     },
     'Invalid format': {
         title: 'Invalid file format',
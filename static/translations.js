@@ -9,8 +9,15 @@ const translations = {
         'uploadTitle': '拖放日誌文件到此處',
         'uploadOr': '或',
         'uploadClick': '點擊選擇文件',
-        'uploadHint': '支援 .txt 和 .log 格式',
+        'uploadHint': '支援 .txt 和 .log 格式，以及 .gz / .zst / .zip 壓縮檔',
         'uploading': '正在上傳和解析檔案...',
+        'followPlaceholder': '持續寫入中的日誌檔案路徑（SPEECH-LogFilename）',
+        'followButton': '即時追蹤',
+        'followLive': '即時追蹤中',
+        'searchPlaceholder': '搜尋日誌（錯誤代碼、路徑、RESULT-* 屬性）',
+        'searchRegex': '正則表達式',
+        'searchButton': '搜尋',
+        'searchMatches': '個結果',
         
         // 會話列表
         'sessionsTitle': '檢測到的會話',
@@ -149,6 +156,14 @@ const translations = {
         // 圖表相關
         'latencyChart': '識別延遲時間圖',
         'recognitionLatency': '識別延遲 (ms)',
+        'unackAudioChart': '未確認音頻時長 (ms)',
+        'queueTimeChart': '佇列等待時間 (ms)',
+        'frameDurationChart': '音頻幀時長 (ms)',
+        
+        // 日誌分頁檢視
+        'sessionLogViewer': '會話日誌',
+        'previousPage': '上一頁',
+        'nextPage': '下一頁',
         
         // 新增：配置相關翻譯
         'recognitionConfig': '識別配置',
@@ -183,8 +198,15 @@ const translations = {
         'uploadTitle': '拖放日志文件到此处',
         'uploadOr': '或',
         'uploadClick': '点击选择文件',
-        'uploadHint': '支持 .txt 和 .log 格式',
+        'uploadHint': '支持 .txt 和 .log 格式，以及 .gz / .zst / .zip 压缩文件',
         'uploading': '正在上传和解析文件...',
+        'followPlaceholder': '持续写入中的日志文件路径（SPEECH-LogFilename）',
+        'followButton': '实时追踪',
+        'searchPlaceholder': '搜索日志（错误代码、路径、RESULT-* 属性）',
+        'searchRegex': '正则表达式',
+        'searchButton': '搜索',
+        'searchMatches': '个结果',
+        'followLive': '实时追踪中',
         
         // 会话列表
         'sessionsTitle': '检测到的会话',
@@ -323,6 +345,14 @@ const translations = {
         // 图表相关
         'latencyChart': '识别延迟时间图',
         'recognitionLatency': '识别延迟 (ms)',
+        'unackAudioChart': '未确认音频时长 (ms)',
+        'queueTimeChart': '队列等待时间 (ms)',
+        'frameDurationChart': '音频帧时长 (ms)',
+        
+        // 日志分页查看
+        'sessionLogViewer': '会话日志',
+        'previousPage': '上一页',
+        'nextPage': '下一页',
         
         // 新增：配置相关翻译
         'recognitionConfig': '识别配置',
@@ -357,8 +387,15 @@ const translations = {
         'uploadTitle': 'Drag and drop log file here',
         'uploadOr': 'or',
         'uploadClick': 'Click to select file',
-        'uploadHint': 'Supports .txt and .log formats',
+        'uploadHint': 'Supports .txt and .log formats, plus .gz / .zst / .zip archives',
         'uploading': 'Uploading and parsing file...',
+        'followPlaceholder': 'Path of a log file being written (SPEECH-LogFilename)',
+        'followButton': 'Follow live file',
+        'searchPlaceholder': 'Search the log (error codes, paths, RESULT-* properties)',
+        'searchRegex': 'Regex',
+        'searchButton': 'Search',
+        'searchMatches': 'matches',
+        'followLive': 'live',
         
         // Session List
         'sessionsTitle': 'Detected Sessions',
@@ -497,6 +534,14 @@ const translations = {
         // Chart Related
         'latencyChart': 'Recognition Latency Chart',
         'recognitionLatency': 'Recognition Latency (ms)',
+        'unackAudioChart': 'Unacknowledged Audio Duration (ms)',
+        'queueTimeChart': 'Time in Queue (ms)',
+        'frameDurationChart': 'Frame Duration (ms)',
+        
+        // Paged log viewer
+        'sessionLogViewer': 'Session Log',
+        'previousPage': 'Previous',
+        'nextPage': 'Next',
         
         // New: Configuration Related
         'recognitionConfig': 'Recognition Configuration',